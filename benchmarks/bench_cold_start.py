@@ -0,0 +1,86 @@
+"""
+Measures how long a new dashboard process takes to serve its first page, against the local
+stand-ins for the covid and news APIs.
+
+Each run starts a fresh Python process and times importing covid_data_handler, create_app and
+the first request to /index, which has to wait for the data. This is done with an empty data
+store, where the first page waits for the whole covid history, and with a data store saved by
+an earlier run, where it is shown from the saved data straight away.
+
+Run from the repository root with:
+python -m benchmarks.bench_cold_start --runs 5 --latency 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RUN = """
+import json, sys, time
+start = time.perf_counter()
+import covid_data_handler
+imported = time.perf_counter()
+from covid_data_store import CovidDataStore
+from benchmarks.fake_apis import FakeApis
+store, log, days, latency = sys.argv[1], sys.argv[2], int(sys.argv[3]), float(sys.argv[4])
+covid_data_handler.data_store = CovidDataStore(store)
+covid_data_handler.logging_path = log
+with FakeApis(days, [covid_data_handler.city], latency=latency):
+    ready = time.perf_counter()
+    app = covid_data_handler.create_app()
+    created = time.perf_counter()
+    status = app.test_client().get("/index").status_code
+    served = time.perf_counter()
+print(json.dumps({"status": status, "import": imported - start, "create_app": created - ready,
+    "first_request": served - created, "total": served - ready + imported - start}))
+"""
+
+def cold_start(store: str, log: str, days: int, latency: float) -> dict:
+    """
+    Starts a new process and times it serving its first page.
+
+    Arguments:
+    store: The path of the data store the process uses.
+    log: The path of the log file the process uses.
+    days: The number of days of covid history the fake API has.
+    latency: The number of seconds each fake API response is delayed by.
+
+    Returns:
+    The seconds taken by each step.
+    """
+    output = subprocess.run([sys.executable, "-c", RUN, store, log, str(days), str(latency)],
+        capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    assert timings["status"] == 200, "the first page was not served"
+    return timings
+
+def main() -> None:
+    """
+    Runs the cold starts with an empty and with a saved data store and prints the median times.
+    """
+    parser = argparse.ArgumentParser(description="Times the first page of a new process.")
+    parser.add_argument("--runs", type=int, default=5, help="processes started for each case")
+    parser.add_argument("--days", type=int, default=640, help="days of covid history")
+    parser.add_argument("--latency", type=float, default=0.0,
+        help="seconds each fake API response is delayed by")
+    arguments = parser.parse_args()
+    print(f"{'data store':<12} {'import (ms)':>12} {'create_app (ms)':>16} "
+        f"{'first page (ms)':>16} {'total (ms)':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        log = os.path.join(directory, "system.log")
+        saved = os.path.join(directory, "saved.db")
+        cold_start(saved, log, arguments.days, arguments.latency) # fills the saved data store
+        for case in ("empty", "saved"):
+            runs = [cold_start(os.path.join(directory, f"empty_{run}.db") if case == "empty"
+                else saved, log, arguments.days, arguments.latency)
+                for run in range(arguments.runs)]
+            medians = {step: statistics.median(run[step] for run in runs) * 1000
+                for step in ("import", "create_app", "first_request", "total")}
+            print(f"{case:<12} {medians['import']:>12.1f} {medians['create_app']:>16.1f} "
+                f"{medians['first_request']:>16.1f} {medians['total']:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmarks the numpy rolling window trends against working them out with Python loops.
+
+Run from the repository root with:
+python -m benchmarks.bench_covid_analytics
+"""
+import sys
+import timeit
+import numpy as np
+from covid_analytics import CovidSeries, rolling_sum, trends
+
+def looping_rolling_sum(values: list, window: int) -> list:
+    """
+    Adds up the window ending on each day by looping over the days of the window.
+    """
+    totals = []
+    for day in range(len(values)):
+        if day < window - 1:
+            totals.append(None)
+        else:
+            totals.append(sum(values[day - window + 1:day + 1]))
+    return totals
+
+def looping_trends(values: list) -> dict:
+    """
+    Works out the 7, 14 and 28 day totals and week on week growth with Python loops.
+    """
+    table = {f"cases_{window}day": looping_rolling_sum(values, window) for window in (7, 14, 28)}
+    weekly = table["cases_7day"]
+    table["week_on_week_growth"] = [None if day < 13 or not weekly[day - 7]
+        else weekly[day] / weekly[day - 7] - 1 for day in range(len(values))]
+    return table
+
+def main(repeats: int = 3) -> None:
+    """
+    Times both versions over histories of increasing length and prints the speedup.
+
+    Arguments:
+    repeats: The number of times each version is run per history length.
+    """
+    print(f"{'days':>8} {'loops (ms)':>12} {'numpy (ms)':>12} {'speedup':>9}")
+    for days in (638, 365 * 3, 365 * 10, 365 * 30):
+        values = [float((day * 7919) % 40000) for day in range(days)]
+        series = CovidSeries(np.datetime64("2020-01-30") + np.arange(days), np.array(values),
+            np.zeros(days), np.zeros(days))
+        assert np.allclose(rolling_sum(series.new_cases, 28)[27:],
+            looping_rolling_sum(values, 28)[27:])
+        looping = min(timeit.repeat(lambda: looping_trends(values),
+            number=1, repeat=repeats)) * 1000
+        vectorised = min(timeit.repeat(lambda: trends(series, 100_000),
+            number=1, repeat=repeats)) * 1000
+        print(f"{days:>8} {looping:>12.2f} {vectorised:>12.2f} {looping / vectorised:>8.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,74 @@
+"""
+Benchmarks reading a large csv export a chunk at a time against reading all of it into memory.
+
+A synthetic file in the same format as nation_2021-10-28.csv is written with one row per area
+per day, then both versions work out the three figures from it while the peak memory is traced.
+
+Run from the repository root with:
+python -m benchmarks.bench_covid_csv_stream [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from covid_data_handler import parse_csv_data, process_covid_csv_data
+from covid_csv_stream import process_covid_csv_file
+
+def write_synthetic_csv(csv_filename: str, rows: int, areas: int = 400) -> None:
+    """
+    Writes a csv file of rows for many areas, with the newest day first like the exports.
+
+    Arguments:
+    csv_filename: The name of the csv file to be written.
+    rows: The number of rows to write.
+    areas: The number of areas each day has a row for.
+    """
+    last_day = date(2021, 10, 28)
+    with open(csv_filename, "w", encoding="utf-8") as csv_file:
+        csv_file.write("areaCode,areaName,areaType,current_date,cumDailyNsoDeathsByDeathDate,"
+            "hospitalCases,newCasesBySpecimenDate\n")
+        for row in range(rows):
+            day = (last_day - timedelta(row // areas)).isoformat()
+            area = row % areas
+            csv_file.write(f"E{area:08d},Area {area},ltla,{day},{row % 997},{row % 89},"
+                f"{row % 131}\n")
+
+def measure(function, *args) -> tuple[float, float, object]:
+    """
+    Times a function, then runs it again while tracing its peak memory, as tracing slows it down.
+
+    Returns:
+    The seconds taken, the peak memory in MB and what the function returned.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return seconds, peak, result
+
+def main(rows: int = 2_000_000) -> None:
+    """
+    Writes the synthetic file and prints the time and peak memory of both versions.
+
+    Arguments:
+    rows: The number of rows in the synthetic file.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        csv_filename = os.path.join(directory, "ltla_2021-10-28.csv")
+        write_synthetic_csv(csv_filename, rows)
+        print(f"{rows} rows, {os.path.getsize(csv_filename) / 1e6:.0f} MB")
+        seconds, peak, streamed = measure(process_covid_csv_file, csv_filename)
+        print(f"streamed: {seconds:6.2f} s, peak memory {peak:8.1f} MB")
+        seconds, peak, in_memory = measure(
+            lambda: process_covid_csv_data(parse_csv_data(csv_filename)))
+        print(f"in memory: {seconds:6.2f} s, peak memory {peak:8.1f} MB")
+        print("same figures for the last area of each day:",
+            streamed[1:] == in_memory[1:])
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
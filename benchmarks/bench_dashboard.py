@@ -0,0 +1,304 @@
+"""
+Benchmarks the whole dashboard against local stand-ins for the covid and news APIs.
+
+Each scenario reports its throughput, its 50th and 99th percentile latency and the peak
+memory allocated by one run of it:
+
+* refresh (cold) - covid_API_request with an empty data store, then process_covid_data.
+* refresh (delta) - the same once the data store is up to date.
+* update_news - requesting and merging the news.
+* /index and /api/summary - many threads requesting the page while the data is refreshed.
+* scheduler - how late a burst of scheduled updates is run.
+
+Run from the repository root with, for example:
+python -m benchmarks.bench_dashboard --days 1000 --areas 20 --latency 0.05 --threads 8
+
+The results can be saved with --save and later runs compared against them with --compare,
+which exits with status 1 if any scenario got slower by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable
+import covid_data_handler
+from covid_data_handler import (app, city, covid_API_request, process_covid_data,
+    update_news, CovidDataStore)
+from update_scheduler import UpdateScheduler
+from benchmarks.fake_apis import FakeApis
+
+def percentile(latencies: list, fraction: float) -> float:
+    """
+    Finds a percentile of the latencies.
+
+    Arguments:
+    latencies: The latencies, in any order.
+    fraction: The percentile as a fraction, so 0.99 is the 99th percentile.
+
+    Returns:
+    The latency at that percentile.
+    """
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def peak_memory(operation: Callable) -> int:
+    """
+    Measures the most memory allocated at once by one run of an operation.
+
+    Arguments:
+    operation: The operation.
+
+    Returns:
+    The peak in bytes.
+    """
+    tracemalloc.start()
+    try:
+        operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_load(operation: Callable, threads: int, count: int) -> tuple[float, list]:
+    """
+    Runs an operation count times on each of a number of threads at once.
+
+    Arguments:
+    operation: The operation.
+    threads: The number of threads.
+    count: The number of times each thread runs the operation.
+
+    Returns:
+    The total number of seconds taken and the latency of every run.
+    """
+    latencies = []
+    lock = threading.Lock()
+    start_line = threading.Barrier(threads + 1)
+
+    def worker() -> None:
+        timings = []
+        start_line.wait()
+        for _ in range(count):
+            start = time.perf_counter()
+            operation()
+            timings.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(timings)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+def result(seconds: float, latencies: list, memory: int) -> dict:
+    """
+    Summarises the runs of a scenario.
+
+    Arguments:
+    seconds: The total number of seconds taken.
+    latencies: The latency of every run.
+    memory: The peak memory of one run in bytes.
+
+    Returns:
+    A dictionary of the throughput, the latency percentiles in milliseconds and the memory.
+    """
+    return {"runs": len(latencies), "throughput": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 0.5) * 1000, "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_kb": memory / 1024}
+
+def bench_refresh(repeats: int, directory: str) -> dict:
+    """
+    Times requesting and processing the covid data, first into an empty data store and then
+    once the data store only needs the newest days.
+
+    Arguments:
+    repeats: The number of runs of each.
+    directory: The folder the data stores are made in.
+
+    Returns:
+    The results of both scenarios.
+    """
+    def refresh() -> None:
+        process_covid_data(covid_API_request())
+
+    def empty_store() -> None:
+        covid_data_handler.data_store = CovidDataStore(os.path.join(directory,
+            f"covid_data_{time.perf_counter_ns()}.db"))
+
+    results = {}
+    latencies = []
+    for _ in range(repeats):
+        empty_store()
+        latencies.extend(run_load(refresh, 1, 1)[1])
+    empty_store()
+    results["refresh (cold)"] = result(sum(latencies), latencies, peak_memory(refresh))
+    seconds, latencies = run_load(refresh, 1, repeats)
+    results["refresh (delta)"] = result(seconds, latencies, peak_memory(refresh))
+    return results
+
+def bench_pages(threads: int, requests: int) -> dict:
+    """
+    Times many threads requesting the page and the JSON summary while the scheduler refreshes
+    all the data as often as it can.
+
+    Arguments:
+    threads: The number of threads requesting at once.
+    requests: The number of requests made by each thread.
+
+    Returns:
+    The results of both scenarios.
+    """
+    results = {}
+    covid_data_handler.dashboard_cache.refresh()
+    covid_data_handler.scheduler.schedule("Benchmark Refresh", "Every 0.1 seconds", 0,
+        covid_data_handler.dashboard_cache.refresh, {}, repeat_interval=0.1, listed=False)
+    try:
+        for name, url in (("/index", "/index"), ("/api/summary", "/api/summary")):
+            client = app.test_client()
+            assert client.get(url).status_code == 200, f"{url} did not load"
+            seconds, latencies = run_load(lambda url=url: app.test_client().get(url),
+                threads, requests)
+            results[name] = result(seconds, latencies,
+                peak_memory(lambda url=url: app.test_client().get(url)))
+    finally:
+        covid_data_handler.scheduler.cancel("Benchmark Refresh")
+    return results
+
+def bench_news(repeats: int) -> dict:
+    """
+    Times requesting the news and merging it into the shown news.
+
+    Arguments:
+    repeats: The number of runs.
+
+    Returns:
+    The results of the scenario.
+    """
+    seconds, latencies = run_load(update_news, 1, repeats)
+    return {"update_news": result(seconds, latencies, peak_memory(update_news))}
+
+def bench_scheduler(updates: int) -> dict:
+    """
+    Schedules a burst of updates for the same moment and times how late each one runs.
+
+    Arguments:
+    updates: The number of updates scheduled.
+
+    Parameters:
+    lateness: The number of seconds each update ran after it was due.
+    due: The time the burst was due.
+
+    Returns:
+    The results of the scenario, with the lateness as the latency.
+    """
+    scheduler = UpdateScheduler()
+    lateness = []
+    finished = threading.Event()
+
+    def action(update) -> None:
+        lateness.append(time.time() - update.run_at)
+        if len(lateness) == updates:
+            finished.set() # only the scheduler thread runs the updates so this is the last
+
+    def schedule_burst() -> None:
+        for number in range(updates):
+            kwargs = {}
+            kwargs["update"] = scheduler.schedule(f"update {number}", "Update at 00:00", 0.2,
+                action, kwargs)
+
+    memory = peak_memory(schedule_burst)
+    finished.wait(30)
+    lateness.clear()
+    finished.clear()
+    due = time.time() + 0.2
+    schedule_burst()
+    finished.wait(30)
+    return {"scheduler": result(max(time.time() - due, 1e-9), lateness, memory)}
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Finds the scenarios that got slower than the baseline.
+
+    Arguments:
+    results: The results of this run.
+    baseline: The saved results of an earlier run.
+    tolerance: How much slower a scenario may get, as a fraction.
+
+    Returns:
+    A list of descriptions of each regression.
+    """
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if now["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {before['p99_ms']:.2f} -> {now['p99_ms']:.2f} ms")
+        if now["throughput"] < before["throughput"] / (1 + tolerance):
+            regressions.append(f"{name}: throughput {before['throughput']:.1f} -> "
+                f"{now['throughput']:.1f}/s")
+        if now["peak_kb"] > before["peak_kb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {before['peak_kb']:.0f} -> "
+                f"{now['peak_kb']:.0f} KB")
+    return regressions
+
+def main() -> int:
+    """
+    Runs every scenario against the fake APIs and prints the results.
+
+    Returns:
+    The exit status, which is 1 if a scenario regressed against the baseline.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--days", type=int, default=640, help="days of covid history")
+    parser.add_argument("--areas", type=int, default=1, help="local areas served")
+    parser.add_argument("--articles", type=int, default=20, help="news articles returned")
+    parser.add_argument("--latency", type=float, default=0.0,
+        help="seconds each fake API response is delayed by")
+    parser.add_argument("--threads", type=int, default=8, help="threads requesting pages")
+    parser.add_argument("--requests", type=int, default=200, help="requests per thread")
+    parser.add_argument("--repeats", type=int, default=5, help="runs of the refresh scenarios")
+    parser.add_argument("--updates", type=int, default=1000, help="updates in the scheduler burst")
+    parser.add_argument("--save", help="file to save the results to")
+    parser.add_argument("--compare", help="file of saved results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+        help="how much slower a scenario may get before it counts as a regression")
+    arguments = parser.parse_args()
+
+    covid_data_handler.areas = [city] + [f"Area {number}" for number in range(1, arguments.areas)]
+    results = {}
+    with FakeApis(arguments.days, covid_data_handler.areas, arguments.articles,
+        arguments.latency) as fake, tempfile.TemporaryDirectory() as directory:
+        covid_data_handler.logging_path = os.path.join(directory, "dashboard.log")
+        covid_data_handler.configure_logging() # logs as the server does, without starting it
+        results.update(bench_refresh(arguments.repeats, directory))
+        results.update(bench_news(arguments.repeats * 10))
+        results.update(bench_pages(arguments.threads, arguments.requests))
+        results.update(bench_scheduler(arguments.updates))
+        print(f"{fake.requests} requests were made to the fake APIs.")
+
+    print(f"{'scenario':<18} {'runs':>6} {'per sec':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} "
+        f"{'peak (KB)':>10}")
+    for name, row in results.items():
+        print(f"{name:<18} {row['runs']:>6} {row['throughput']:>10.1f} {row['p50_ms']:>10.2f} "
+            f"{row['p99_ms']:>10.2f} {row['peak_kb']:>10.0f}")
+    if arguments.save:
+        with open(arguments.save, "w", encoding="utf-8") as results_file:
+            json.dump(results, results_file, indent=4)
+    if arguments.compare:
+        with open(arguments.compare, "r", encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), arguments.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Benchmarks ranking the news with news_ranking.NewsIndex.
+
+Thousands of made up articles are added to the index, about a quarter of which are copies of
+another story from a different paper. It times adding an article, ranking the news after the
+index has changed, and ranking it again when nothing has changed, as every request does.
+
+Run from the repository root with:
+python -m benchmarks.bench_news_ranking --articles 5000 --top 20
+"""
+import argparse
+import random
+import time
+from news_ranking import NewsIndex
+
+TOPICS = ("covid", "cases", "vaccine", "booster", "hospital", "lockdown", "football", "weather",
+    "election", "schools", "Exeter", "testing", "variant", "masks", "travel", "economy")
+PAPERS = ("BBC News", "The Guardian", "Sky News", "ITV News")
+VOCABULARY = TOPICS + tuple(f"word{number}" for number in range(5000))
+
+def made_up_articles(count: int) -> list:
+    """
+    Makes up articles from the topics and a large set of other words, with some stories told by
+    several papers.
+
+    Arguments:
+    count: The number of articles.
+
+    Returns:
+    A list of the title, description and source of each article.
+    """
+    generator = random.Random(0)
+    articles = []
+    while len(articles) < count:
+        story = " ".join(generator.sample(TOPICS, 2) + generator.sample(VOCABULARY, 6))
+        for paper in generator.sample(PAPERS, 1 if generator.random() < 0.75 else 3):
+            articles.append((f"{story} - {paper}", " ".join(generator.choices(VOCABULARY, k=30)),
+                paper))
+    return articles[:count]
+
+def main() -> None:
+    """
+    Fills an index with the made up articles and prints the time taken by each step.
+    """
+    parser = argparse.ArgumentParser(description="Times ranking the news.")
+    parser.add_argument("--articles", type=int, default=5000, help="articles in the index")
+    parser.add_argument("--top", type=int, default=20, help="stories shown")
+    parser.add_argument("--repeats", type=int, default=1000, help="rankings timed")
+    arguments = parser.parse_args()
+    articles = made_up_articles(arguments.articles)
+    index = NewsIndex("covid coronavirus Exeter")
+    start = time.perf_counter()
+    for title, description, source in articles:
+        index.add(title, description, source)
+    added = time.perf_counter() - start
+    start = time.perf_counter()
+    index.top(arguments.top)
+    ranked = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(arguments.repeats):
+        index.top(arguments.top)
+    cached = (time.perf_counter() - start) / arguments.repeats
+    print(f"{len(index)} articles in {len(index.clusters)} stories")
+    print(f"adding an article    {added / len(articles) * 1000:>10.3f} ms")
+    print(f"ranking after a change {ranked * 1000:>8.3f} ms")
+    print(f"ranking again        {cached * 1000:>10.4f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmarks the date-indexed covid data processing against the original scanning version.
+
+The national history in nation_2021-10-28.csv is repeated back in time to build
+multi-year histories, which are then processed in the same shape the API returns.
+
+Run from the repository root with:
+python -m benchmarks.bench_process_covid_data
+"""
+import sys
+import timeit
+from datetime import datetime, timedelta
+from covid_data_handler import process_covid_data, parse_csv_data
+
+def scanning_process_covid_data(covid_data: dict) -> tuple[int, int, int, int]:
+    """
+    The original version of process_covid_data, which scans the data once per day looked up.
+    """
+    local_last7days_cases = 0
+    national_last7days_cases = 0
+    local_covid_data = covid_data["local"]
+    national_covid_data = covid_data["national"]
+    for i in range(7):
+        for data in local_covid_data["data"]:
+            if data['date'] == (datetime.now() - timedelta(i+4)).strftime("%Y-%m-%d"):
+                local_last7days_cases += int(data['newCasesBySpecimenDate'])
+        for data in national_covid_data["data"]:
+            if data['date'] == (datetime.now() - timedelta(i+4)).strftime("%Y-%m-%d"):
+                national_last7days_cases += int(data['newCasesBySpecimenDate'])
+    for data in national_covid_data["data"]:
+        if data['date'] == (datetime.now() - timedelta(2)).strftime("%Y-%m-%d"):
+            current_hospital_cases = int(data['hospitalCases'])
+        if data['date'] == (datetime.now() - timedelta(14)).strftime("%Y-%m-%d"):
+            total_deaths = int(data['cumDailyNsoDeathsByDeathDate'])
+    return local_last7days_cases, national_last7days_cases, current_hospital_cases, total_deaths
+
+def build_history(days: int) -> dict:
+    """
+    Builds local and national data ending today by repeating the rows of the national csv file.
+
+    Arguments:
+    days: The number of days of history to build.
+
+    Returns:
+    A dictionary in the same format as covid_API_request returns.
+    """
+    lines = parse_csv_data("nation_2021-10-28.csv")[1:]
+    values = []
+    for line in lines:
+        columns = line.strip().split(",")
+        values.append((columns[4] or "0", columns[5] or "0", columns[6] or "0"))
+    today = datetime.now()
+    local, national = [], []
+    for day in range(days):
+        deaths, hospital, cases = values[day % len(values)]
+        date = (today - timedelta(day)).strftime("%Y-%m-%d")
+        local.append({"date": date, "areaName": "Exeter",
+            "newCasesBySpecimenDate": int(cases) // 100})
+        national.append({"date": date, "areaName": "United Kingdom",
+            "newCasesBySpecimenDate": int(cases),
+            "cumDailyNsoDeathsByDeathDate": int(deaths),
+            "hospitalCases": int(hospital)})
+    return {"local": {"data": local}, "national": {"data": national}}
+
+def main(repeats: int = 5) -> None:
+    """
+    Times both versions over histories of increasing length and prints the speedup.
+
+    Arguments:
+    repeats: The number of times each version is run per history length.
+    """
+    print(f"{'days':>8} {'scanning (ms)':>15} {'indexed (ms)':>14} {'speedup':>9}")
+    for days in (638, 365 * 3, 365 * 10, 365 * 30):
+        covid_data = build_history(days)
+        assert scanning_process_covid_data(covid_data) == process_covid_data(covid_data)
+        scanning = min(timeit.repeat(lambda: scanning_process_covid_data(covid_data),
+            number=1, repeat=repeats)) * 1000
+        indexed = min(timeit.repeat(lambda: process_covid_data(covid_data),
+            number=1, repeat=repeats)) * 1000
+        print(f"{days:>8} {scanning:>15.2f} {indexed:>14.2f} {scanning / indexed:>8.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,139 @@
+"""
+Measures the memory taken by the covid rows and the news history, as the dictionaries they
+used to be kept in and as the slotted records they are kept in now.
+
+The covid rows are the ones read back from the data store for the national history and every
+local area, and the news is a full history of articles with their titles remembered.
+
+Run from the repository root with:
+python -m benchmarks.bench_records --days 640 --areas 20 --articles 1000
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+from collections import OrderedDict
+from typing import Callable
+from covid_data_store import CovidDataStore, METRICS
+from covid_news_handling import NewsArticle
+from benchmarks.fake_apis import recorded_articles, recorded_covid_rows
+
+def retained_memory(build: Callable) -> tuple[int, object]:
+    """
+    Measures the memory still allocated once something has been built.
+
+    Arguments:
+    build: Builds the thing being measured.
+
+    Returns:
+    The memory in bytes and the thing built, which is kept alive until it has been measured.
+    """
+    tracemalloc.start()
+    try:
+        built = build()
+        return tracemalloc.get_traced_memory()[0], built
+    finally:
+        tracemalloc.stop()
+
+def dictionary_rows(store: CovidDataStore, areas: list) -> list:
+    """
+    Reads the rows as a dictionary for each row, as the data store used to.
+
+    Arguments:
+    store: The data store.
+    areas: The names of the local areas.
+
+    Returns:
+    The rows of the national history and of every area.
+    """
+    connection = store.connect()
+    try:
+        cursor = connection.execute(
+            "SELECT date, areaName, " + ", ".join(METRICS) + " FROM covid_data "
+            "WHERE (areaType = 'overview' AND areaName = 'United Kingdom') OR (areaType = 'ltla' "
+            "AND areaName IN (" + ", ".join("?" for _ in areas) + ")) ORDER BY areaName, date DESC",
+            areas)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+    finally:
+        connection.close()
+
+def record_rows(store: CovidDataStore, areas: list) -> list:
+    """
+    Reads the rows as CovidRow, as they are now.
+
+    Arguments:
+    store: The data store.
+    areas: The names of the local areas.
+
+    Returns:
+    The rows of the national history and of every area.
+    """
+    rows = store.rows("overview", "United Kingdom")
+    for area_rows in store.rows_by_area("ltla", areas).values():
+        rows.extend(area_rows)
+    return rows
+
+def dictionary_news(articles: list) -> tuple[OrderedDict, OrderedDict]:
+    """
+    Keeps the news as it used to be, as an ordered dictionary of a dictionary for each article
+    and a second ordered dictionary of the titles seen.
+
+    Arguments:
+    articles: The articles in the format of the news API.
+
+    Returns:
+    The news shown and the titles seen.
+    """
+    news = OrderedDict()
+    seen = OrderedDict()
+    for article in articles:
+        seen[article["title"]] = True
+        news[article["title"]] = {"title": article["title"], "content": article["description"]}
+    return news, seen
+
+def record_news(articles: list) -> tuple[dict, dict]:
+    """
+    Keeps the news as it is now, as plain dictionaries of NewsArticle and of the titles seen.
+
+    Arguments:
+    articles: The articles in the format of the news API.
+
+    Returns:
+    The news shown and the titles seen.
+    """
+    news = {}
+    seen = {}
+    for article in articles:
+        seen[article["title"]] = None
+        news[article["title"]] = NewsArticle(article["title"], article["description"])
+    return news, seen
+
+def main() -> None:
+    """
+    Fills a data store with the recorded covid history and prints the memory of each way of
+    keeping the rows and the news.
+    """
+    parser = argparse.ArgumentParser(description="Measures the memory of the covid rows and news.")
+    parser.add_argument("--days", type=int, default=640, help="days of covid history")
+    parser.add_argument("--areas", type=int, default=20, help="local areas stored")
+    parser.add_argument("--articles", type=int, default=1000, help="news articles remembered")
+    arguments = parser.parse_args()
+    areas = [f"Area {number}" for number in range(arguments.areas)]
+    articles = recorded_articles(arguments.articles)
+    with tempfile.TemporaryDirectory() as directory:
+        store = CovidDataStore(os.path.join(directory, "covid_data.db"))
+        for (area_type, _), rows in recorded_covid_rows(arguments.days, areas).items():
+            store.add_rows(area_type, rows)
+        cases = (
+            ("covid rows", lambda: dictionary_rows(store, areas), lambda: record_rows(store, areas)),
+            ("news", lambda: dictionary_news(articles), lambda: record_news(articles)))
+        print(f"{'data':<12} {'dictionaries (KB)':>18} {'records (KB)':>13} {'saved':>7}")
+        for name, dictionaries, records in cases:
+            before = retained_memory(dictionaries)[0]
+            after = retained_memory(records)[0]
+            print(f"{name:<12} {before / 1024:>18.0f} {after / 1024:>13.0f} "
+                f"{1 - after / before:>7.0%}")
+
+if __name__ == "__main__":
+    main()
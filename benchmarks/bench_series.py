@@ -0,0 +1,60 @@
+"""
+Measures the size and time of the /api/series replies against the raw rows the covid API returns.
+
+A data store is filled with the recorded history of the national data and one local area,
+then each kind of reply is requested once to make it and then many times from the cache.
+
+Run from the repository root with:
+python -m benchmarks.bench_series --days 640 --repeats 1000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from unittest.mock import patch
+import covid_data_handler
+from covid_data_handler import app, city, dashboard_cache, CovidDataStore
+from benchmarks.fake_apis import recorded_covid_rows
+
+QUERIES = (
+    ("daily, plain", "/api/series?encoding=plain", {}),
+    ("daily, delta", "/api/series", {}),
+    ("daily, delta, gzip", "/api/series", {"Accept-Encoding": "gzip"}),
+    ("weekly, delta, gzip", "/api/series?every=week", {"Accept-Encoding": "gzip"}),
+    ("90 days, delta, gzip", "/api/series?limit=90", {"Accept-Encoding": "gzip"}),
+)
+
+def main() -> None:
+    """
+    Prints the size of the raw rows and the size, first time and cached time of each reply.
+    """
+    parser = argparse.ArgumentParser(description="Measures the /api/series replies.")
+    parser.add_argument("--days", type=int, default=640, help="days of covid history")
+    parser.add_argument("--repeats", type=int, default=1000, help="cached requests timed")
+    arguments = parser.parse_args()
+    rows = recorded_covid_rows(arguments.days, [city])
+    raw = len(json.dumps({"data": [row for area_rows in rows.values() for row in area_rows]}))
+    print(f"{'raw API rows':<22} {raw / 1024:>8.1f} KB")
+    with tempfile.TemporaryDirectory() as directory:
+        store = CovidDataStore(os.path.join(directory, "covid_data.db"))
+        for (area_type, _), area_rows in rows.items():
+            store.add_rows(area_type, area_rows)
+        dashboard_cache.update(areas={city: 0}, national_7day_infections=0, hospital_cases=0,
+            deaths_total=0, news=[])
+        client = app.test_client()
+        print(f"{'reply':<22} {'size':>11} {'first (ms)':>11} {'cached (us)':>12}")
+        with patch.object(covid_data_handler, "data_store", store):
+            for name, url, headers in QUERIES:
+                start = time.perf_counter()
+                size = len(client.get(url, headers=headers).data)
+                first = time.perf_counter() - start
+                start = time.perf_counter()
+                for _ in range(arguments.repeats):
+                    client.get(url, headers=headers)
+                cached = (time.perf_counter() - start) / arguments.repeats
+                print(f"{name:<22} {size / 1024:>8.1f} KB {first * 1000:>11.2f} "
+                    f"{cached * 1e6:>12.0f}")
+
+if __name__ == "__main__":
+    main()
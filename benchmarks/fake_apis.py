@@ -0,0 +1,163 @@
+"""
+Local stand-ins for the covid API and the news API, so the benchmarks never touch the real ones.
+
+The covid API replays the national history recorded in nation_2021-10-28.csv, repeated back
+in time to the length wanted and shifted so it ends today, for the United Kingdom and any
+number of local areas. The news API returns a fixed set of recorded looking headlines.
+Every response can be delayed to stand in for the latency of the real APIs.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import newsapi.const
+from uk_covid19 import Cov19API
+from covid_data_handler import parse_csv_data
+
+PAGE_SIZE = 1000 # the rows in each page of the covid API
+
+def recorded_covid_rows(days: int, areas: list) -> dict:
+    """
+    Builds the rows the covid API returns for each area, newest first, from the recorded csv file.
+
+    Arguments:
+    days: The number of days of history for each area.
+    areas: The names of the local areas, which get a share of the national cases.
+
+    Parameters:
+    values: The deaths, hospital cases and new cases of each recorded day.
+
+    Returns:
+    A dictionary of the list of rows of each (area type, area name).
+    """
+    values = []
+    for line in parse_csv_data("nation_2021-10-28.csv")[1:]:
+        columns = line.strip().split(",")
+        values.append((int(columns[4] or 0), int(columns[5] or 0), int(columns[6] or 0)))
+    today = datetime.now()
+    rows = {("overview", "United Kingdom"): []}
+    rows.update({("ltla", area_name): [] for area_name in areas})
+    for day in range(days):
+        deaths, hospital, cases = values[day % len(values)]
+        date = (today - timedelta(day)).strftime("%Y-%m-%d")
+        rows[("overview", "United Kingdom")].append({"date": date, "areaName": "United Kingdom",
+            "newCasesBySpecimenDate": cases, "cumDailyNsoDeathsByDeathDate": deaths,
+            "hospitalCases": hospital})
+        for position, area_name in enumerate(areas):
+            rows[("ltla", area_name)].append({"date": date, "areaName": area_name,
+                "newCasesBySpecimenDate": cases // (100 + position)})
+    return rows
+
+def recorded_articles(count: int) -> list:
+    """
+    Builds the articles the news API returns.
+
+    Arguments:
+    count: The number of articles.
+
+    Returns:
+    A list of articles in the format of the news API.
+    """
+    return [{"title": f"Covid headline {number}",
+        "description": f"The story behind covid headline {number}.",
+        "url": f"https://example.com/news/{number}"} for number in range(count)]
+
+
+class FakeApis:
+    """
+    A local HTTP server that answers like the covid API and the news API.
+
+    Arguments:
+    days: The number of days of covid history for each area.
+    areas: The names of the local areas served.
+    articles: The number of news articles returned.
+    latency: The number of seconds each response is delayed by.
+    """
+
+    def __init__(self, days: int = 640, areas: list = None, articles: int = 20,
+        latency: float = 0.0) -> None:
+        self.rows = recorded_covid_rows(days, areas or [])
+        self.by_date = {key: {row["date"]: row for row in rows}
+            for key, rows in self.rows.items()}
+        self.news = json.dumps({"status": "ok", "totalResults": articles,
+            "articles": recorded_articles(articles)}).encode("utf-8")
+        self.latency = latency
+        self.requests = 0
+        self.server = None
+        self.saved_urls = None
+
+    def __enter__(self) -> "FakeApis":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """
+        Starts the server on a free port and points both API clients at it.
+        """
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                url = urlparse(self.path)
+                status, body = (fake.covid_page(parse_qs(url.query))
+                    if url.path.startswith("/v1/") else (HTTPStatus.OK, fake.news))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass # the benchmarks print their own results
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        address = f"http://127.0.0.1:{self.server.server_port}"
+        self.saved_urls = (Cov19API.endpoint, newsapi.const.TOP_HEADLINES_URL)
+        Cov19API.endpoint = f"{address}/v1/data"
+        newsapi.const.TOP_HEADLINES_URL = f"{address}/v2/top-headlines"
+
+    def stop(self) -> None:
+        """
+        Stops the server and points both API clients back at the real APIs.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        Cov19API.endpoint, newsapi.const.TOP_HEADLINES_URL = self.saved_urls
+
+    def covid_page(self, query: dict) -> tuple[int, bytes]:
+        """
+        Answers a request to the covid API.
+
+        Arguments:
+        query: The query string of the request.
+
+        Parameters:
+        filters: The filters of the request, such as areaType, areaName and date.
+
+        Returns:
+        The status and body of the response, which is 204 with no body after the last page.
+        """
+        filters = dict(item.split("=", 1) for item in query["filters"][0].split(";"))
+        page = int(query.get("page", ["1"])[0])
+        keys = [key for key in self.rows if key[0] == filters["areaType"]
+            and filters.get("areaName", key[1]) == key[1]]
+        if "date" in filters:
+            rows = [self.by_date[key][filters["date"]] for key in keys
+                if filters["date"] in self.by_date[key]]
+        else:
+            rows = [row for key in keys for row in self.rows[key]]
+        rows = rows[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        if not rows:
+            return HTTPStatus.NO_CONTENT, b""
+        return HTTPStatus.OK, json.dumps({"data": rows}).encode("utf-8")
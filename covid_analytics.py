@@ -0,0 +1,166 @@
+"""
+This module works out rolling totals, rates and growth over the whole covid history using numpy arrays.
+"""
+import csv
+from typing import NamedTuple
+import numpy as np
+
+class CovidSeries(NamedTuple):
+    """
+    The daily covid data of an area as arrays with one entry per day, oldest first.
+    Days with no data are NaN.
+
+    Arguments:
+    dates: The dates, as numpy datetime64 days.
+    new_cases: The new cases by specimen date.
+    hospital_cases: The number of people in hospital.
+    cum_deaths: The cumulative deaths by death date.
+    """
+    dates: np.ndarray
+    new_cases: np.ndarray
+    hospital_cases: np.ndarray
+    cum_deaths: np.ndarray
+
+def load_series(rows: list, date_key: str = "date") -> CovidSeries:
+    """
+    Loads rows of covid data into contiguous arrays covering every day from the first to the last.
+
+    Arguments:
+    rows: A list of dictionaries, each one being the data for one day, in any order.
+    date_key: The name of the column holding the date.
+
+    Parameters:
+    days: The number of days from the first date of each row.
+
+    Returns:
+    The series of the data.
+    """
+    if not rows:
+        empty = np.array([], dtype=float)
+        return CovidSeries(np.array([], dtype="datetime64[D]"), empty, empty, empty)
+    row_dates = np.array([row[date_key] for row in rows], dtype="datetime64[D]")
+    first_date = row_dates.min()
+    days = (row_dates - first_date).astype(int)
+    length = int(days.max()) + 1
+    columns = []
+    for metric in ("newCasesBySpecimenDate", "hospitalCases", "cumDailyNsoDeathsByDeathDate"):
+        column = np.full(length, np.nan)
+        column[days] = [to_number(row.get(metric)) for row in rows]
+        columns.append(column)
+    return CovidSeries(first_date + np.arange(length), *columns)
+
+def load_csv_series(csv_filename: str) -> CovidSeries:
+    """
+    Loads a csv file of covid data, such as nation_2021-10-28.csv, into a series.
+
+    Arguments:
+    csv_filename: The name of the csv file to be opened.
+
+    Returns:
+    The series of the data.
+    """
+    with open(csv_filename, encoding="utf-8", newline="") as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    return load_series(rows, "current_date")
+
+def to_number(value) -> float:
+    """
+    Converts a value from the API or a csv file to a number.
+
+    Arguments:
+    value: The value, which may be an int, a string, an empty string or None.
+
+    Returns:
+    The number, or NaN if there is no value.
+    """
+    if value is None or value == "":
+        return np.nan
+    return float(value)
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Adds up each day and the days before it over a window, using the differences of a cumulative sum.
+    Missing days count as 0.
+
+    Arguments:
+    values: The daily values.
+    window: The number of days in the window.
+
+    Returns:
+    The sum for the window ending on each day, with NaN until there are enough days.
+    """
+    totals = np.full(len(values), np.nan)
+    if len(values) < window:
+        return totals
+    cumulative = np.concatenate(([0.0], np.cumsum(np.nan_to_num(values))))
+    totals[window - 1:] = cumulative[window:] - cumulative[:-window]
+    return totals
+
+def rate_per_100k(values: np.ndarray, population: float) -> np.ndarray:
+    """
+    Converts numbers of cases into cases per 100,000 people.
+
+    Arguments:
+    values: The numbers of cases.
+    population: The population of the area.
+
+    Returns:
+    The cases per 100,000 people.
+    """
+    return values * (100_000 / population)
+
+def week_on_week_growth(values: np.ndarray) -> np.ndarray:
+    """
+    Works out how much the 7 day total has grown compared with the week before.
+
+    Arguments:
+    values: The daily values.
+
+    Parameters:
+    weekly: The 7 day totals.
+
+    Returns:
+    The growth for each day as a fraction, so 0.5 is 50% more than the week before.
+    """
+    weekly = rolling_sum(values, 7)
+    growth = np.full(len(values), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth[7:] = weekly[7:] / weekly[:-7] - 1
+    return growth
+
+def doubling_time(values: np.ndarray) -> np.ndarray:
+    """
+    Works out how many days the 7 day total takes to double at its current week on week growth.
+
+    Arguments:
+    values: The daily values.
+
+    Returns:
+    The doubling time in days for each day, or NaN where the total is not growing.
+    """
+    ratio = week_on_week_growth(values) + 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days = 7 * np.log(2) / np.log(ratio)
+    days[~(ratio > 1)] = np.nan
+    return days
+
+def trends(series: CovidSeries, population: float = None) -> dict:
+    """
+    Works out all the trends of the new cases for every day of the series.
+
+    Arguments:
+    series: The series of the data.
+    population: The population of the area, needed for the rates per 100,000 people.
+
+    Returns:
+    A dictionary of arrays with one entry per day of the series.
+    """
+    table = {"dates": series.dates}
+    for window in (7, 14, 28):
+        table[f"cases_{window}day"] = rolling_sum(series.new_cases, window)
+        if population:
+            table[f"rate_{window}day_per_100k"] = rate_per_100k(
+                table[f"cases_{window}day"], population)
+    table["week_on_week_growth"] = week_on_week_growth(series.new_cases)
+    table["doubling_time"] = doubling_time(series.new_cases)
+    return table
@@ -0,0 +1,108 @@
+"""
+This module reads large covid csv exports a chunk at a time, keeping only the columns that are needed.
+"""
+import csv
+from array import array
+from datetime import date as Date, timedelta
+from typing import Iterator
+import numpy as np
+
+CHUNK_ROWS = 65536 # the number of rows read into memory at once
+MISSING = -1 # stands in for an empty value in the integer columns
+COLUMNS = ("current_date", "newCasesBySpecimenDate", "hospitalCases",
+    "cumDailyNsoDeathsByDeathDate")
+
+def stream_csv_columns(csv_filename: str, area_name: str = None,
+    chunk_rows: int = CHUNK_ROWS) -> Iterator[tuple[array, array, array, array]]:
+    """
+    Reads the date, cases, hospital cases and deaths columns of a csv file in chunks.
+
+    Only one chunk of rows is held in memory at a time, as compact integer arrays rather than
+    a dictionary of strings for each row.
+
+    Arguments:
+    csv_filename: The name of the csv file to be opened.
+    area_name: The area to keep the rows of, or None to keep every row.
+    chunk_rows: The number of rows in each chunk.
+
+    Parameters:
+    positions: The position of each needed column in a row.
+
+    Returns:
+    An iterator of chunks, each one being arrays of the days since 0001-01-01 (as ordinals),
+    the new cases, the hospital cases and the cumulative deaths, with MISSING for empty values.
+    """
+    with open(csv_filename, encoding="utf-8", newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader)
+        positions = [header.index(column) for column in COLUMNS]
+        area_position = header.index("areaName") if area_name is not None else None
+        date_position, cases_position, hospital_position, deaths_position = positions
+        ordinals = {} # each date is repeated for every area, so is only converted once
+        chunk = new_chunk()
+        dates, cases, hospital, deaths = (column.append for column in chunk)
+        for row in reader:
+            if area_position is not None and row[area_position] != area_name:
+                continue
+            ordinal = ordinals.get(row[date_position])
+            if ordinal is None:
+                ordinal = ordinals[row[date_position]] = Date.fromisoformat(
+                    row[date_position]).toordinal()
+            dates(ordinal)
+            cases(int(row[cases_position]) if row[cases_position] else MISSING)
+            hospital(int(row[hospital_position]) if row[hospital_position] else MISSING)
+            deaths(int(row[deaths_position]) if row[deaths_position] else MISSING)
+            if len(chunk[0]) >= chunk_rows:
+                yield chunk
+                chunk = new_chunk()
+                dates, cases, hospital, deaths = (column.append for column in chunk)
+        if chunk[0]:
+            yield chunk
+
+def new_chunk() -> tuple[array, array, array, array]:
+    """
+    Creates the empty arrays for a chunk of rows.
+
+    Returns:
+    Four empty arrays of 64 bit integers.
+    """
+    return array("q"), array("q"), array("q"), array("q")
+
+def process_covid_csv_file(csv_filename: str, date: str = "2021-10-28",
+    area_name: str = None) -> tuple[int, int, int]:
+    """
+    Works out the same three figures as process_covid_csv_data from a csv file, one chunk at a time.
+
+    Arguments:
+    csv_filename: The name of the csv file to be opened.
+    date: The date the figures are for, in YYYY-MM-DD format.
+    area_name: The area to work out the figures for, or None to use every row.
+
+    Parameters:
+    case_days: The 7 days the cases are added up over, which end 2 days before the date.
+    hospital_day: The day the hospital cases are taken from.
+    deaths_day: The day the total deaths are taken from, 13 days before the date.
+
+    Returns:
+    The cases in the last 7 days, the current hospital cases and the total deaths, with None
+    for a figure whose day is not in the file.
+    """
+    day = Date.fromisoformat(date)
+    case_days = np.array([(day - timedelta(i+2)).toordinal() for i in range(7)])
+    hospital_day = day.toordinal()
+    deaths_day = (day - timedelta(13)).toordinal()
+    last7days_cases = 0
+    current_hospital_cases = None
+    total_deaths = None
+    for chunk in stream_csv_columns(csv_filename, area_name):
+        dates, cases, hospital, deaths = (np.frombuffer(column, dtype=np.int64)
+            for column in chunk)
+        in_window = np.isin(dates, case_days) & (cases != MISSING)
+        last7days_cases += int(cases[in_window].sum())
+        matches = np.flatnonzero((dates == hospital_day) & (hospital != MISSING))
+        if len(matches):
+            current_hospital_cases = int(hospital[matches[-1]])
+        matches = np.flatnonzero((dates == deaths_day) & (deaths != MISSING))
+        if len(matches):
+            total_deaths = int(deaths[matches[-1]])
+    return last7days_cases, current_hospital_cases, total_deaths
@@ -3,43 +3,106 @@ This module handles the covid data and displays it on a server using flask.
 """
 
 import csv
-import sched
-import time
+import cProfile
+import gzip
 import json
+import argparse
 import logging
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
 from datetime import datetime, timedelta
 from csv import DictReader
+from http import HTTPStatus
 from uk_covid19 import Cov19API
-from flask import Flask, render_template, request
+from uk_covid19.exceptions import FailedRequestError
+import requests
+from flask import Flask, Response, render_template, request, abort, g
 from covid_news_handling import delete_news
 from covid_news_handling import update_news
+from covid_news_handling import displayed_news
+from covid_news_handling import news_upstream
+from covid_news_handling import news_state, load_news_state
+from dashboard_cache import SnapshotCache
+from covid_data_store import CovidDataStore
+from upstream import run_concurrently, session, Upstream
+from update_scheduler import UpdateScheduler, ScheduledUpdate, CronSchedule
+from shared_state import SharedState
+from dashboard_metrics import timed, timer, observe, render_metrics, request_seconds
+from dashboard_logging import setup_logging
+from dashboard_config import load_config
+from static_export import area_slug, export_files
+from covid_series import (SERIES_METRICS, Series, daily_series, slice_series, weekly_series,
+    limit_series, encode_series)
 
 app = Flask(__name__)
-s = sched.scheduler(time.time, time.sleep)
-update = []
-update_reference = {}
+scheduler = UpdateScheduler()
+command_scheduler = UpdateScheduler() # makes the changes asked for by other workers, so they
+# are not held up by a slow update on the main scheduler
+rendered_pages = {} # the last page rendered for each area, with the versions it was made from
+news_changes = deque() # (version, "added" or "removed", article) for each change to the news
+news_changes_floor = 0 # changes in this version or before may have been forgotten
+REVISED_DAYS = 3 # the API can still change the data of the last few days
+MAX_DELTA_DAYS = 30 # stores further behind than this request the whole history again
+MAX_HISTORY_REQUESTS = 4 # more areas missing their history than this are requested together
+AUTOMATIC_REFRESH = "Automatic Refresh"
+SAVED_DATA = "Saved Data"
+NEWS_CHANGES_KEPT = 1000 # the number of news changes remembered for /api/news
+KEEPALIVE_SECONDS = 15 # how often /stream sends a comment so proxies keep the connection open
+RECONNECT_MILLISECONDS = 3000 # how long a browser waits before reconnecting to /stream
+FOLLOW_LEADER = "Follow Leader"
+STATIC_EXPORT = "Static Export"
+SERIES_CACHE_SIZE = 256 # the number of series and /api/series replies kept in memory
+dashboard_changes = threading.Condition() # notified whenever the dashboard or its updates change
+change_count = 0 # goes up whenever dashboard_changes is notified
+LOOKBACK_DAYS = 7 # how far back a missing day of hospital cases or deaths is filled from
+COVID_PARTS = ("areas", "national_7day_infections", "hospital_cases", "deaths_total")
+SHARED_COMMANDS = "Shared Commands"
+SHARED_POLL_SECONDS = 0.1 # how often the leader checks for changes asked for by other workers
+LEADER_CHECK_SECONDS = 5 # how often the other workers check whether the leader has exited
+COMMAND_TIMEOUT = 5 # how long a worker waits for the leader to make a change it asked for
+shared_state = None # shares the dashboard between workers, set by enable_shared_state
+shared_updates = (0, []) # the version and list of scheduled updates last read from the leader
+published_updates_version = -1 # the version of the scheduled updates the leader last saved
+last_leader_check = 0.0
+stream_refused = False # whether /stream has been refused for running on single threaded workers
 
-with open("config.json","r", encoding="utf-8") as information: # reads data from the config file
-    config = json.load(information)
-    city = config["city"]
-    title = config["title"]
-    logging_path = config["logging-path"]
+config = load_config() # reads data from the config file
+city = config["city"]
+title = config["title"]
+logging_path = config["logging-path"]
+logging_level = config.get("logging-level", "INFO")
+logging_max_bytes = config.get("logging-max-bytes", 1048576)
+logging_backups = config.get("logging-backups", 3)
+logging_format = config.get("logging-format", "text") # or "json" for one JSON object a line
+logging_background = config.get("logging-background", True)
+cache_ttl = config.get("cache-ttl", 300)
+upstream_timeouts = config.get("upstream-timeouts", {"covid": 10, "news": 10})
+retries = config.get("upstream-retries", {})
+data_store = CovidDataStore(config.get("data-store", "covid_data.db"))
+profiling = config.get("profiling", False)
+profile_path = config.get("profile-path", "profiles")
+export_path = config.get("export-path") # where the static pages are exported to, if anywhere
+areas = config.get("areas") or [city] # "all" serves every local authority
+if areas == "all":
+    areas = None
+elif city not in areas:
+    areas = [city] + areas
 
-FORMAT = '%(levelname)s: %(asctime)s: %(message)s' # format of the logging
-logging.basicConfig(filename=logging_path, filemode="w", format=FORMAT, level=logging.DEBUG)
+covid_upstream = Upstream("covid", upstream_timeouts.get("covid"), retries.get("attempts", 3),
+    retries.get("backoff", 0.5), retries.get("failure-threshold", 5),
+    retries.get("reset-timeout", 30), retry_on=(requests.RequestException, FailedRequestError))
 
 def add_scheduled_event(update_interval: str, update_name: str) -> None:
     """
-    Add scheduled event to the update list.
+    Records that an event has been added to the scheduled updates.
 
     Arguments:
     update_interval: The time the event will take place.
     update_name: The name of the scheduled update.
     """
-    update.append({
-        "title": update_name,
-        "content": (f"Update at {update_interval}")
-    }) # adds the new update to the list of already scheduled updates
     logging.info("Event: %s. Has been scheduled for %s.", update_name, update_interval)
 
 def schedule_covid_updates(update_interval: str, update_name: str, repeat: str,
@@ -55,117 +118,437 @@ def schedule_covid_updates(update_interval: str, update_name: str, repeat: str,
     updating_news: Whether the update will update the news.
 
     Parameters:
-    delay: The time in seconds until the update occurs.
+    delay: The time in seconds until the update occurs, which is the next day if the time has passed.
     """
     if updating_covid != "covid-data" and updating_news != "news":
         logging.warning("No data has been requested for an update.")
         return # returns to index if no update data has been requested
     logging.debug("Covid updates are being scheduled.")
-    delay = hhmm_to_seconds(update_interval) - hhmm_to_seconds(datetime.now().strftime("%H:%M"))
+    now = datetime.now()
+    delay = hhmm_to_seconds(update_interval) - hhmm_to_seconds(now.strftime("%H:%M"))
+    if delay < 0: # the time has already passed today
+        delay += 86400
+    delay = max(0.0, delay - now.second - now.microsecond / 1e6) # due on the minute
     if repeat == "repeat":
         update_name += " | Repeating"
     if updating_covid == "covid-data":
         update_name += " | Updating Covid Data"
     if updating_news == "news":
         update_name += " | Updating News"
-    update_reference[update_name] = s.enter(int(delay), 1,
+    scheduler.schedule(update_name, f"Update at {update_interval}", delay,
     update_data, kwargs = {"update_name": update_name,
     "repeat":repeat,
     "updating_covid":updating_covid,
-    "updating_news":updating_news}) # sets a referencable name for the update
+    "updating_news":updating_news},
+    cron=daily_schedule(update_interval) if repeat == "repeat" else None, # the same time each day
+    key=update_key(updating_covid, updating_news))
     add_scheduled_event(update_interval, update_name)
 
 def update_data(update_name: str, repeat: str,
-    updating_covid: str, updating_news: str) -> render_template:
+    updating_covid: str, updating_news: str) -> None:
     """
-    Updates the data requested by the user.
+    Updates the data requested by the user in the dashboard snapshot that the page is made from.
 
     Arguments:
-    update_interval: The time the event will take place.
     update_name: The name of the scheduled update.
     repeat: Whether the update will repeat.
     updating_covid: Whether the update will update the covid data.
     updating_news: Whether the update will update the news.
-
-    Return:
-    A newly rendered template with the updated data.
     """
     if repeat == "repeat":
-        update_reference[update_name] = s.enter(86400, 1, update_data,
-        kwargs = {"repeat":repeat,
-        "updating_covid":updating_covid,
-        "updating_news":updating_news}) # repeats the update one day later with the same name
-        logging.info("The update will be repeated tomorrow.")
+        logging.info("The update %s will be repeated tomorrow.", update_name)
     if updating_news == "news" and updating_covid != "covid-data":
-        news = update_news()
-        if repeat != "repeat": # doesn't delete the update if it is repeating
-            delete_update(update_name, False)
+        if dashboard_cache.ready.is_set():
+            dashboard_cache.update(news=update_news())
+        else: # a snapshot of only the news could not be served, so everything is requested
+            dashboard_cache.refresh()
         logging.info("News has been updated.")
-        return render_template("index.html",
-        news_articles=news)
     elif updating_news != "news" and updating_covid == "covid-data":
-        covid_data = covid_API_request()
-        (local_last7days_cases,
-        national_last7days_cases,
-        current_hospital_cases,
-        total_deaths) = process_covid_data(covid_data)
-        if repeat != "repeat":
-            delete_update(update_name, False)
+        dashboard_cache.update(**load_covid_data())
         logging.info("Covid data has been updated.")
-        return render_template('index.html',
-        local_7day_infections=(local_last7days_cases),
-        national_7day_infections=(national_last7days_cases),
-        hospital_cases=(f"Hospital Cases: {current_hospital_cases}"),
-        deaths_total=(f"Total Deaths: {total_deaths}"))
     elif updating_news == "news" and updating_covid == "covid-data":
-        covid_data = covid_API_request()
-        (local_last7days_cases,
-        national_last7days_cases,
-        current_hospital_cases,
-        total_deaths) = process_covid_data(covid_data)
-        news = update_news()
-        if repeat != "repeat":
-            delete_update(update_name, False)
+        dashboard_cache.refresh() # requests both at the same time
         logging.info("Covid data and news have been updated.")
-        return render_template('index.html',
-        news_articles=news,
-        local_7day_infections=(local_last7days_cases),
-        national_7day_infections=(national_last7days_cases),
-        hospital_cases=(f"Hospital Cases: {current_hospital_cases}"),
-        deaths_total=(f"Total Deaths: {total_deaths}"))
-    delete_update(update_name, False)
 
-def delete_update(update_to_delete: str, delete_s: bool) -> None:
+def update_key(updating_covid: str, updating_news: str) -> tuple:
+    """
+    Returns the key shared by updates that update the same data, so the scheduler only runs
+    one of them when several are due at the same time.
+
+    Arguments:
+    updating_covid: Whether the update will update the covid data.
+    updating_news: Whether the update will update the news.
+
+    Returns:
+    A tuple of whether the covid data and whether the news is updated.
+    """
+    return ("update_data", updating_covid == "covid-data", updating_news == "news")
+
+def daily_schedule(hhmm: str) -> CronSchedule:
+    """
+    Returns the recurrence of an update repeated every day, which stays at the same time of day
+    when the clocks change, unlike repeating every 24 hours.
+
+    Arguments:
+    hhmm: The time in HH:MM format.
+
+    Returns:
+    The cron recurrence of that minute and hour every day.
+
+    Raises:
+    ValueError: If the time is not in HH:MM format.
+    """
+    moment = datetime.strptime(hhmm, "%H:%M")
+    return CronSchedule(f"{moment.minute} {moment.hour} * * *")
+
+def parse_update_jobs(jobs: list) -> list:
+    """
+    Turns the updates sent to /api/updates into scheduled updates, checking all of them before
+    any are scheduled.
+
+    Each update is a dictionary with a "name", either a "time" in HH:MM format, which happens
+    once or every day if "repeat" is true, or a five field "cron" recurrence, and whether it
+    updates the "covid" data, the "news" or both.
+
+    Arguments:
+    jobs: A list of the updates.
+
+    Parameters:
+    kwargs: The keyword arguments update_data is called with.
+    run_at: The first time the update happens.
+
+    Returns:
+    A list of ScheduledUpdate.
+
+    Raises:
+    ValueError: If any of the updates is not valid.
+    """
+    if not isinstance(jobs, list):
+        raise ValueError("The updates must be a list.")
+    updates = []
+    now = datetime.now()
+    for number, job in enumerate(jobs, 1):
+        if not isinstance(job, dict) or not isinstance(job.get("name"), str) or not job["name"]:
+            raise ValueError(f"Update {number} does not have a name.")
+        if not job.get("covid") and not job.get("news"):
+            raise ValueError(f"Update {job['name']} does not update the covid data or news.")
+        if ("time" in job) == ("cron" in job):
+            raise ValueError(f"Update {job['name']} must have either a time or a cron.")
+        kwargs = {
+            "update_name": job["name"],
+            "repeat": "repeat" if job.get("repeat") and "cron" not in job else "",
+            "updating_covid": "covid-data" if job.get("covid") else "",
+            "updating_news": "news" if job.get("news") else ""}
+        cron = None
+        try:
+            if "cron" in job:
+                cron = CronSchedule(str(job["cron"]))
+                run_at = cron.next_after(now)
+                content = f"Update on {cron.expression}"
+            else:
+                run_at = datetime.combine(now.date(),
+                    datetime.strptime(str(job["time"]), "%H:%M").time())
+                if run_at < now.replace(second=0, microsecond=0): # the time has passed today
+                    run_at += timedelta(1)
+                if job.get("repeat"):
+                    cron = daily_schedule(str(job["time"]))
+                content = f"Update at {job['time']}"
+        except ValueError as error:
+            raise ValueError(f"Update {job['name']}: {error}") from None
+        updates.append(ScheduledUpdate(job["name"], content, run_at.timestamp(), update_data,
+            kwargs, cron=cron,
+            key=update_key(kwargs["updating_covid"], kwargs["updating_news"])))
+    if len({update.title for update in updates}) < len(updates):
+        raise ValueError("Two updates have the same name.")
+    return updates
+
+def schedule_update_jobs(jobs: list) -> None:
+    """
+    Schedules many updates at once, replacing any updates that already have the same names.
+
+    Arguments:
+    jobs: A list of the updates in the format parse_update_jobs takes.
+    """
+    scheduler.schedule_many(parse_update_jobs(jobs))
+    logging.info("%s updates have been scheduled.", len(jobs))
+
+def cancel_updates(titles: list) -> None:
+    """
+    Cancels many scheduled updates at once by their names.
+
+    Arguments:
+    titles: The names of the updates.
+    """
+    cancelled = scheduler.cancel_many(titles)
+    logging.info("%s of the %s updates have been cancelled.", len(cancelled), len(titles))
+
+def start_automatic_refresh() -> None:
+    """
+    Schedules the refresh of all the data every cache-ttl seconds, starting straight away.
+    """
+    if AUTOMATIC_REFRESH not in scheduler.updates:
+        scheduler.schedule(AUTOMATIC_REFRESH, f"Every {cache_ttl} seconds", 0,
+            dashboard_cache.refresh_in_background, {}, repeat_interval=cache_ttl, listed=False)
+
+def start_refreshing() -> None:
+    """
+    Starts the automatic refresh. If there is no snapshot yet, the covid data saved in the data
+    store is shown first, so the first requests after a restart do not wait for the APIs.
+    """
+    if not dashboard_cache.ready.is_set():
+        scheduler.schedule(SAVED_DATA, "Straight away", 0, load_saved_data, {}, listed=False)
+    start_automatic_refresh()
+
+def load_saved_data() -> None:
+    """
+    Makes the first snapshot from the covid data saved in the data store, if there is any and
+    the first refresh has not already finished.
+    """
+    covid_data = read_covid_store()
+    if covid_data["national"]["data"] and not dashboard_cache.ready.is_set():
+        dashboard_cache.update(**process_covid_parts(covid_data), news=displayed_news())
+        logging.info("The saved covid data is shown until the first refresh.")
+
+def configure_logging(per_process: bool = False) -> None:
+    """
+    Sends the logging to the log file set in the config.
+
+    Arguments:
+    per_process: Whether each process writes a log file of its own, with its process id added
+    to the name, as the worker processes of a production server would otherwise rotate the
+    same file under each other and lose log lines.
+
+    Parameters:
+    path: The path of the log file.
+    """
+    path = logging_path
+    if per_process:
+        base, extension = os.path.splitext(logging_path)
+        path = f"{base}-{os.getpid()}{extension}"
+    setup_logging(path, logging_level, logging_max_bytes, logging_backups,
+        structured=logging_format == "json", background=logging_background)
+
+def create_app(shared_state_path: str = None) -> Flask:
+    """
+    Gets the dashboard ready to serve requests. Importing this module only reads the config,
+    so tests and tools that import it start quickly, and nothing is written or requested
+    until this is called.
+
+    Arguments:
+    shared_state_path: The SQLite database shared with the other worker processes, or None
+    when the dashboard runs in a single process.
+
+    Returns:
+    The flask app.
+    """
+    start = time.perf_counter()
+    configure_logging(per_process=shared_state_path is not None)
+    if export_path is not None:
+        dashboard_cache.add_listener(export_changes)
+    if shared_state_path is not None:
+        enable_shared_state(shared_state_path)
+    else:
+        start_refreshing()
+    logging.info("The dashboard was set up in %.3f seconds.", time.perf_counter() - start)
+    return app
+
+def delete_update(update_to_delete: str) -> None:
     """
     Deletes the update from the template and removes it from the scheduled queue.
 
     Arguments:
     update_to_delete: The title of the update that is to be deleted.
-    delete_s: Shows whether the event has been done or if it's being cancelled before.
     """
-    for all_update in update:
-        if all_update["title"] == update_to_delete: # checks for ipdate matching an update title
-            update.remove(all_update)
-            logging.debug("The update has been removed")
-            if delete_s: # checks if the event hasn't occurred and has just been cancelled
-                s.cancel(update_reference[update_to_delete])
-                return
-            return
+    if scheduler.cancel(update_to_delete):
+        logging.debug("The update has been removed")
+
+def remove_news(news_to_delete: str) -> None:
+    """
+    Deletes the news from the displayed news and from the dashboard snapshot.
+
+    Arguments:
+    news_to_delete: The title of the news to be deleted.
+    """
+    delete_news(news_to_delete)
+    if dashboard_cache.ready.is_set(): # otherwise the first refresh leaves it out
+        dashboard_cache.update(news=displayed_news())
+    if shared_state is not None: # the news shown may be the same, but the deletion is saved
+        publish_news()
+
+COMMANDS = {"schedule": schedule_covid_updates, "cancel": delete_update, "delete_news": remove_news,
+    "schedule_many": schedule_update_jobs, "cancel_many": cancel_updates}
+
+def run_command(name: str, **arguments) -> None:
+    """
+    Makes a change to the scheduled updates or the news. When the dashboard is shared between
+    workers, only the leader makes changes, so the other workers ask it and wait.
+
+    Arguments:
+    name: The name of the change in COMMANDS.
+    arguments: The keyword arguments of the change.
+    """
+    if shared_state is None or shared_state.is_leader():
+        COMMANDS[name](**arguments)
+        if shared_state is not None:
+            publish_updates()
+        return
+    command = shared_state.submit(name, arguments)
+    if not shared_state.wait_for(command, COMMAND_TIMEOUT):
+        logging.warning("The leader has not made the change %s yet.", name)
+    sync_shared_state()
+
+def enable_shared_state(path: str) -> None:
+    """
+    Shares the dashboard between the worker processes of a production server through a SQLite
+    database, so only one worker, the leader, runs the scheduler and requests the APIs.
+
+    Arguments:
+    path: The path of the SQLite database file.
+    """
+    global shared_state
+    shared_state = SharedState(path)
+    dashboard_cache.add_listener(publish_snapshot)
+    try_to_lead()
+    if not shared_state.is_leader(): # keeps /stream up to date without waiting for a request
+        scheduler.schedule(FOLLOW_LEADER, f"Every {SHARED_POLL_SECONDS} seconds",
+            SHARED_POLL_SECONDS, follow_leader, {}, repeat_interval=SHARED_POLL_SECONDS,
+            listed=False)
+
+def try_to_lead() -> None:
+    """
+    Makes this worker the leader if no other worker is, taking over the scheduled updates
+    saved by the last leader and starting the automatic refresh.
+    """
+    global last_leader_check
+    last_leader_check = time.monotonic()
+    if shared_state.is_leader() or not shared_state.try_to_lead():
+        return
+    logging.info("Worker %s is now the leader.", os.getpid())
+    scheduler.cancel(FOLLOW_LEADER)
+    sync_shared_state() # carries on from the versions the last leader saved
+    load_shared_news() # before any news is deleted or updated
+    with scheduler.condition:
+        scheduler.version = max(scheduler.version, shared_updates[0])
+    if shared_updates[1]:
+        scheduler.schedule_many(shared_updates[1]) # any that were due are run straight away
+    command_scheduler.schedule(SHARED_COMMANDS, f"Every {SHARED_POLL_SECONDS} seconds", 0,
+        apply_shared_commands, {}, repeat_interval=SHARED_POLL_SECONDS, listed=False)
+    start_refreshing()
+
+def follow_leader() -> None:
+    """
+    Brings this worker up to date with the leader, and takes over if the leader has exited.
+    """
+    if time.monotonic() - last_leader_check > LEADER_CHECK_SECONDS:
+        try_to_lead()
+    if not shared_state.is_leader():
+        sync_shared_state()
+
+def sync_shared_state() -> None:
+    """
+    Reads the snapshot and scheduled updates saved by the leader, if they are newer.
+
+    Parameters:
+    loaded: The version and data read from the shared state.
+    """
+    global shared_updates
+    loaded = shared_state.load("snapshot", dashboard_cache.version)
+    if loaded is not None:
+        dashboard_cache.replace(loaded[1])
+    loaded = shared_state.load("updates", shared_updates[0])
+    if loaded is not None:
+        shared_updates = (loaded[0], [ScheduledUpdate(update["title"], update["content"],
+            update["run_at"], update_data, update["kwargs"], update["repeat_interval"],
+            cron=CronSchedule(update["cron"]) if update.get("cron") else None,
+            key=update_key(update["kwargs"]["updating_covid"], update["kwargs"]["updating_news"]))
+            for update in loaded[1]])
+        notify_changes()
+
+def publish_snapshot(old_snapshot: dict, new_snapshot: dict) -> None:
+    """
+    Saves each new snapshot made by the leader for the other workers, along with the news
+    received if the news has changed.
+
+    Arguments:
+    old_snapshot: The snapshot before the change, which is not used.
+    new_snapshot: The snapshot after the change.
+    """
+    if shared_state.is_leader():
+        shared_state.save("snapshot", new_snapshot["version"], new_snapshot)
+        if new_snapshot["changed"].get("news") == new_snapshot["version"]:
+            publish_news()
+
+def publish_news() -> None:
+    """
+    Saves the news received, including the titles of the news deleted, so a worker that takes
+    over as the leader carries on from it.
+    """
+    shared_state.save("news", dashboard_cache.version, news_state())
+
+def load_shared_news() -> None:
+    """
+    Carries on from the news received by the last leader. If it did not save any, the news is
+    made from the news in the snapshot, so the first change to it does not remove it all.
+    """
+    loaded = shared_state.load("news", -1)
+    dashboard = dashboard_cache.peek()
+    if loaded is not None:
+        load_news_state(loaded[1])
+    elif dashboard is not None and "news" in dashboard:
+        load_news_state({"seen": [article["title"] for article in dashboard["news"]],
+            "shown": [[article["title"], article["content"], None]
+                for article in dashboard["news"]]})
 
+def publish_updates() -> None:
+    """
+    Saves the scheduled updates for the other workers if they have changed.
+    """
+    global published_updates_version
+    version, updates = scheduler.version, scheduler.listing()
+    if version == published_updates_version:
+        return
+    shared_state.save("updates", version, [{
+        "title": update.title,
+        "content": update.content,
+        "run_at": update.run_at,
+        "kwargs": update.kwargs,
+        "repeat_interval": update.repeat_interval,
+        "cron": update.cron.expression if update.cron else None
+    } for update in updates])
+    published_updates_version = version
 
+def apply_shared_commands() -> None:
+    """
+    Makes the changes asked for by the other workers, then saves the scheduled updates, which
+    also change when an update has taken place.
+    """
+    for command, name, arguments in shared_state.take_commands():
+        try:
+            COMMANDS[name](**arguments)
+        except Exception: # a bad change must not stop the others being made
+            logging.exception("The change %s asked for by a worker failed.", name)
+        shared_state.mark_done(command)
+    publish_updates()
+
+def scheduled_updates() -> tuple[int, list]:
+    """
+    Returns the scheduled updates, which other workers read from the leader.
+
+    Returns:
+    The version of the scheduled updates and the list of them.
+    """
+    if shared_state is None or shared_state.is_leader():
+        return scheduler.version, scheduler.listing()
+    return shared_updates
 
 @app.route('/index')
-def index() -> render_template:
+def index() -> Response:
     """
     The main part of the code that is ran when the user visits the address.
 
     Parameters:
-    covid_data: This is a dictionary of the data returned from the API request.
-    local_last7days_cases: The number of local cases in the last 7 days.
-    national_last7days_cases: The number of national cases in the last 7 days.
-    current_hospital_cases: The number of current hospital cases.
-    total_deaths: The number of total deaths in The UK.
-    news: A list of all the news.
+    dashboard: The snapshot of the processed covid data and news, kept up to date by the scheduler.
+    area: The local area shown on the dashboard, which defaults to the city in the config.
     update_name: The name of the scheduled update.
     update_interval: The time the event will take place.
     repeat: Whether the update will repeat.
@@ -173,73 +556,945 @@ def index() -> render_template:
     updating_news: Whether the update will update the news.
     news_to_delete: The title of the news that is to be deleted.
     update_to_delete: The title of the update that is to be deleted.
+    versions: The epoch and versions of the snapshot and scheduled updates the page is made from.
+    page: The rendered page.
 
     Returns:
-    A rendered template with the data.
+    The rendered page, or an empty 304 response if the browser already has this version of it.
     """
-    s.run(blocking=False) # stops the scheduler from blocking the server from running
-    covid_data = covid_API_request()
-    (local_last7days_cases,
-    national_last7days_cases,
-    current_hospital_cases,
-    total_deaths) = process_covid_data(covid_data)
-    news = update_news()
+    dashboard = current_dashboard()
+    area = request.args.get("area", city)
+    if area not in dashboard["areas"]:
+        abort(404)
     update_name = request.args.get("two")
     if update_name: # checks if an update has been scheduled
         update_interval = request.args.get("update")
         repeat = request.args.get("repeat")
         updating_covid = request.args.get("covid-data")
         updating_news = request.args.get("news")
-        schedule_covid_updates(update_interval, update_name, repeat, updating_covid, updating_news)
+        run_command("schedule", update_interval=update_interval, update_name=update_name,
+            repeat=repeat, updating_covid=updating_covid, updating_news=updating_news)
     if request.args.get("notif"): # checks if news has been deleted
         news_to_delete = request.args.get("notif")
-        delete_news(news_to_delete)
+        run_command("delete_news", news_to_delete=news_to_delete)
+        dashboard = dashboard_cache.peek()
     if request.args.get("update_item"): # checks if an update has been deleted
         update_to_delete = request.args.get("update_item")
-        delete_update(update_to_delete, True)
-    return render_template('index.html',
-    title=(title),
-    news_articles=news,
-    updates=update,
-    location=(city),
-    local_7day_infections=(local_last7days_cases),
-    nation_location=("United Kingdom"),
-    national_7day_infections=(national_last7days_cases),
-    hospital_cases=(f"Hospital Cases: {current_hospital_cases}"),
-    deaths_total=(f"Total Deaths: {total_deaths}"))
+        run_command("cancel", update_to_delete=update_to_delete)
+    versions, page = render_index(dashboard, area)
+    response = Response(page, mimetype="text/html")
+    response.set_etag(versions)
+    response.headers["Cache-Control"] = "no-cache" # browsers check the version each time
+    return response.make_conditional(request)
+
+def current_dashboard() -> dict:
+    """
+    Returns the current snapshot, which the pages and API never request the APIs for themselves.
+    Workers following the leader are kept up to date by the FOLLOW_LEADER update rather than
+    on each request.
+
+    Returns:
+    The snapshot, waiting for the first refresh if the server has only just started.
+    """
+    dashboard = dashboard_cache.peek()
+    if not dashboard_cache.ready.is_set(): # the covid data has not been loaded since it started
+        if shared_state is None or shared_state.is_leader():
+            start_automatic_refresh()
+            dashboard = dashboard_cache.wait(max(upstream_timeouts.values()))
+        else:
+            dashboard = wait_for_leader(max(upstream_timeouts.values()))
+        if dashboard is None:
+            abort(503)
+    dashboard_cache.record_hit()
+    return dashboard
+
+def wait_for_leader(timeout: float) -> dict:
+    """
+    Waits for the leader to save the first snapshot.
+
+    Arguments:
+    timeout: The most seconds to wait.
 
+    Returns:
+    The snapshot, or None if the leader did not save one in time.
+    """
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        dashboard = dashboard_cache.wait(SHARED_POLL_SECONDS)
+        if dashboard is not None:
+            return dashboard
+        follow_leader()
+    return dashboard_cache.wait(0)
+
+def render_index(dashboard: dict, area: str) -> tuple[str, bytes]:
+    """
+    Renders the page for an area, reusing the last render if nothing has changed since.
+
+    Arguments:
+    dashboard: The snapshot of the processed covid data and news.
+    area: The local area shown on the dashboard.
+
+    Parameters:
+    updates_version: The version of the scheduled updates.
+    updates: The scheduled updates shown on the page.
+    versions: The epoch and version of the snapshot and the version of the scheduled updates
+    the page is made from. The epoch changes when the server restarts, so a page from before a
+    restart is never mistaken for one made since with the same version numbers.
+
+    Returns:
+    The versions and the rendered page.
+    """
+    updates_version, updates = scheduled_updates()
+    versions = f"{dashboard_cache.epoch}.{dashboard['version']}.{updates_version}"
+    rendered = rendered_pages.get(area)
+    if rendered is None or rendered[0] != versions:
+        with timer("render_template"):
+            rendered = (versions, render_template('index.html',
+            title=(title),
+            news_articles=dashboard["news"],
+            updates=updates,
+            location=(area),
+            epoch=dashboard_cache.epoch,
+            since=dashboard["version"],
+            updates_since=updates_version,
+            local_7day_infections=(dashboard["areas"][area]),
+            nation_location=("United Kingdom"),
+            national_7day_infections=(dashboard["national_7day_infections"]),
+            hospital_cases=(f"Hospital Cases: {not_available(dashboard['hospital_cases'])}"),
+            deaths_total=(f"Total Deaths: {not_available(dashboard['deaths_total'])}")
+            ).encode("utf-8"))
+        rendered_pages[area] = rendered
+    return rendered
+
+def not_available(figure: int) -> str:
+    """
+    Shows a figure on the page, which is None if the API has not given it recently.
+
+    Arguments:
+    figure: The figure.
+
+    Returns:
+    The figure, or "not available".
+    """
+    return "not available" if figure is None else str(figure)
+
+@app.route('/api/summary')
+def api_summary() -> dict:
+    """
+    Returns the figures shown on the dashboard for an area as JSON.
+
+    If a since version is given, only the figures that have changed after that version are sent.
+    A version from before the server restarted, which has another epoch or is ahead of the
+    current version, is ignored and every figure is sent.
+
+    Parameters:
+    area: The local area, which defaults to the city in the config.
+    since: The version the client already has.
+
+    Returns:
+    A dictionary of the epoch and version of the snapshot and the changed figures.
+    """
+    dashboard = current_dashboard()
+    area = request.args.get("area", city)
+    if area not in dashboard["areas"]:
+        abort(404)
+    return summary_since(dashboard, area, resumed_version(request.args.get("epoch"),
+        request.args.get("since", -1, type=int), dashboard["version"]))
+
+def summary_since(dashboard: dict, area: str, since: int) -> dict:
+    """
+    Finds the figures shown on the dashboard for an area that changed after a version.
+
+    Arguments:
+    dashboard: The snapshot of the processed covid data and news.
+    area: The local area.
+    since: The version the client already has.
+
+    Parameters:
+    figures: The figures shown on the dashboard, with the part of the snapshot they come from.
+
+    Returns:
+    A dictionary of the epoch and version of the snapshot and the changed figures.
+    """
+    figures = {
+        "local_7day_infections": (dashboard["areas"][area], "areas"),
+        "national_7day_infections": (dashboard["national_7day_infections"],
+            "national_7day_infections"),
+        "hospital_cases": (dashboard["hospital_cases"], "hospital_cases"),
+        "deaths_total": (dashboard["deaths_total"], "deaths_total")
+    }
+    return {
+        "epoch": dashboard_cache.epoch,
+        "version": dashboard["version"],
+        "area": area,
+        "summary": {name: value for name, (value, part) in figures.items()
+            if dashboard["changed"][part] > since}
+    }
+
+@app.route('/api/series')
+def api_series() -> Response:
+    """
+    Returns the daily history of the local and national covid data for charting.
+
+    The query can give the area, the first and last dates (from and to, in YYYY-MM-DD
+    format), every=week to add the days up into weeks, encoding=plain to send the numbers
+    rather than the change from the number before, and a limit on the number of days or weeks,
+    in which case "next" is the from date of the next page. The reply is gzipped if the client
+    accepts it, and is kept in memory until the stored covid data changes, including revisions
+    to past days that leave the figures on the page the same.
+
+    Parameters:
+    options: The checked options of the query.
+    version: The version of the covid data in the data store.
+    compressed: Whether the reply is gzipped.
+
+    Returns:
+    The series as JSON, an empty 304 response if the client already has this version of it,
+    or an error and 400 if the query is not valid.
+    """
+    dashboard = current_dashboard()
+    area = request.args.get("area", city)
+    if area not in dashboard["areas"]:
+        abort(404)
+    try:
+        options = series_options(request.args)
+    except ValueError as error:
+        return {"error": str(error)}, HTTPStatus.BAD_REQUEST
+    version = data_store.version()
+    compressed = request.accept_encodings["gzip"] > 0
+    response = Response(series_reply(version, area, *options, compressed),
+        mimetype="application/json")
+    if compressed:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache" # clients check the version each time
+    response.set_etag(f"{version}.{int(compressed)}")
+    return response.make_conditional(request)
+
+def series_options(args: dict) -> tuple[str, str, str, bool, int]:
+    """
+    Checks the options of a query to /api/series.
+
+    Arguments:
+    args: The query arguments.
+
+    Returns:
+    The first and last dates, "day" or "week", whether to delta encode and the limit.
+
+    Raises:
+    ValueError: If any option is not valid.
+    """
+    first, last = args.get("from"), args.get("to")
+    for date in (first, last):
+        if date is not None:
+            datetime.strptime(date, "%Y-%m-%d") # raises ValueError for a bad date
+    every = args.get("every", "day")
+    if every not in ("day", "week"):
+        raise ValueError("every must be day or week.")
+    encoding = args.get("encoding", "delta")
+    if encoding not in ("delta", "plain"):
+        raise ValueError("encoding must be delta or plain.")
+    limit = args.get("limit")
+    if limit is not None and (not limit.isdigit() or int(limit) < 1):
+        raise ValueError("limit must be a whole number above 0.")
+    return first, last, every, encoding == "delta", None if limit is None else int(limit)
+
+@lru_cache(maxsize=SERIES_CACHE_SIZE)
+def stored_series(area_type: str, area_name: str, version: int) -> Series:
+    """
+    Reads the daily series of an area from the data store, once for each version.
+
+    Arguments:
+    area_type: The type of area, such as ltla or overview.
+    area_name: The name of the area.
+    version: The version of the data store, so the series is read again when it changes.
+
+    Returns:
+    The daily series, with only the new cases for local areas.
+    """
+    names = tuple(SERIES_METRICS) if area_type == "overview" else ("new_cases",)
+    return daily_series(data_store.rows(area_type, area_name), names)
+
+@lru_cache(maxsize=SERIES_CACHE_SIZE)
+def series_reply(version: int, area: str, first: str, last: str, every: str, delta: bool,
+    limit: int, compressed: bool) -> bytes:
+    """
+    Makes the reply to /api/series, which is kept for each version and query.
+
+    Arguments:
+    version: The version of the data store.
+    area: The local area.
+    first: The first date, or None for the start of the history.
+    last: The last date, or None for the end of the history.
+    every: "day" or "week".
+    delta: Whether to delta encode the numbers.
+    limit: The most days or weeks sent, or None for all of them.
+    compressed: Whether to gzip the reply.
+
+    Parameters:
+    series: The local and national series.
+    next_from: The first date of the next page, or None if this is the last page.
+
+    Returns:
+    The body of the reply.
+    """
+    series = {"local": stored_series("ltla", area, version),
+        "national": stored_series("overview", "United Kingdom", version)}
+    series = {part: slice_series(data, first, last) for part, data in series.items()}
+    if every == "week":
+        series = {part: weekly_series(data) for part, data in series.items()}
+    next_from = None
+    if limit is not None:
+        end = min(data.start for data in series.values()) + limit * (7 if every == "week" else 1)
+        if any(data.start + data.periods() * data.step > end for data in series.values()):
+            next_from = str(end)
+        series = {part: limit_series(data, end) for part, data in series.items()}
+    body = json.dumps(dict({"version": version, "area": area, "every": every,
+        "encoding": "delta" if delta else "plain", "next": next_from},
+        **{part: encode_series(data, delta) for part, data in series.items()}),
+        separators=(",", ":")).encode("utf-8")
+    return gzip.compress(body) if compressed else body
+
+@app.route('/api/news')
+def api_news() -> dict:
+    """
+    Returns the news shown on the dashboard as JSON.
+
+    If a since version is given, and the changes after it are still remembered, only the news
+    added and removed after that version are sent, in the order they happened. A version from
+    before the server restarted is ignored and all of the news is sent.
+
+    Parameters:
+    since: The version the client already has.
+
+    Returns:
+    A dictionary of the epoch and version of the snapshot and either the changes or all of the
+    news.
+    """
+    dashboard = current_dashboard()
+    since = request.args.get("since", type=int)
+    if since is not None:
+        since = resumed_version(request.args.get("epoch"), since, dashboard["version"])
+    return news_since(since)
+
+def news_since(since: int) -> dict:
+    """
+    Finds the news added and removed after a version.
+
+    Arguments:
+    since: The version the client already has, or None for all of the news.
+
+    Returns:
+    A dictionary of the epoch and version of the snapshot and either the changes, or all of the
+    news if the changes after the version have been forgotten.
+    """
+    with dashboard_cache.lock: # the news changes are recorded while the lock is held
+        dashboard = dashboard_cache.snapshot
+        if since is None or since < news_changes_floor:
+            return {"epoch": dashboard_cache.epoch, "version": dashboard["version"],
+                "articles": dashboard["news"]}
+        return {
+            "epoch": dashboard_cache.epoch,
+            "version": dashboard["version"],
+            "changes": [{"version": version, change: article}
+                for version, change, article in news_changes if version > since]
+        }
+
+@app.route('/api/updates')
+def api_updates() -> dict:
+    """
+    Returns the scheduled updates as JSON.
+
+    The updates have their own version, and are only sent if they have changed after the since
+    version. A version from before the server restarted is ignored and the updates are sent.
+
+    Parameters:
+    since: The version of the updates the client already has.
+
+    Returns:
+    A dictionary of the epoch, the version of the updates and the updates, or None if they have
+    not changed.
+    """
+    return updates_since(resumed_version(request.args.get("epoch"),
+        request.args.get("since", -1, type=int), scheduled_updates()[0]))
+
+def updates_since(since: int) -> dict:
+    """
+    Returns the scheduled updates if they changed after a version.
+
+    Arguments:
+    since: The version of the updates the client already has.
+
+    Returns:
+    A dictionary of the epoch, the version of the updates and the updates, or None if they have
+    not changed.
+    """
+    version, listing = scheduled_updates()
+    updates = None
+    if version > since:
+        updates = [{
+            "title": update.title,
+            "content": update.content,
+            "time": datetime.fromtimestamp(update.run_at).isoformat(timespec="seconds"),
+            "repeat_interval": update.repeat_interval,
+            "cron": update.cron.expression if update.cron else None
+        } for update in listing]
+    return {"epoch": dashboard_cache.epoch, "version": version, "updates": updates}
+
+@app.route('/api/updates', methods=['POST'])
+def api_change_updates() -> tuple[dict, int]:
+    """
+    Schedules and cancels many updates at once from a JSON body with a "schedule" list of
+    updates, in the format parse_update_jobs takes, and a "cancel" list of names.
+
+    Updates that update the same data at the same time only request the APIs once.
+
+    Parameters:
+    body: The JSON body of the request.
+
+    Returns:
+    The scheduled updates as /api/updates returns them, or an error and 400 if any update is
+    not valid, in which case none are scheduled.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return {"error": "The body must be a JSON object."}, HTTPStatus.BAD_REQUEST
+    jobs = body.get("schedule", [])
+    titles = body.get("cancel", [])
+    try:
+        parse_update_jobs(jobs) # checked here so a bad update is reported to the client
+        if not isinstance(titles, list) or not all(isinstance(title, str) for title in titles):
+            raise ValueError("The updates to cancel must be a list of names.")
+    except ValueError as error:
+        return {"error": str(error)}, HTTPStatus.BAD_REQUEST
+    if titles:
+        run_command("cancel_many", titles=titles)
+    if jobs:
+        run_command("schedule_many", jobs=jobs)
+    return updates_since(-1), HTTPStatus.OK
+
+def record_news_changes(old_snapshot: dict, new_snapshot: dict) -> None:
+    """
+    Remembers which news was added and removed when the snapshot changes, for /api/news.
+
+    A worker following the leader can skip several versions at once. The news may have changed
+    in the versions skipped, so the changes cannot be worked out and clients are sent all of
+    the news instead.
+
+    Arguments:
+    old_snapshot: The snapshot before the change, or None for the first one.
+    new_snapshot: The snapshot after the change.
+
+    Parameters:
+    old_version: The version of the old snapshot.
+    old_titles: The titles of the news in the old snapshot.
+    new_titles: The titles of the news in the new snapshot.
+    """
+    global news_changes_floor
+    version = new_snapshot["version"]
+    old_version = old_snapshot["version"] if old_snapshot else 0
+    if new_snapshot["changed"].get("news", 0) <= old_version:
+        return
+    if old_snapshot is not None and version > old_version + 1:
+        news_changes.clear()
+        news_changes_floor = version
+        return
+    old_titles = {article["title"] for article in (old_snapshot or {}).get("news", [])}
+    new_titles = {article["title"] for article in new_snapshot["news"]}
+    for article in new_snapshot["news"]:
+        if article["title"] not in old_titles:
+            news_changes.append((version, "added", article))
+    for title in old_titles - new_titles:
+        news_changes.append((version, "removed", title))
+    while len(news_changes) > NEWS_CHANGES_KEPT:
+        news_changes_floor = max(news_changes_floor, news_changes.popleft()[0])
+
+def notify_changes(*_) -> None:
+    """
+    Wakes the /stream connections, as the snapshot or the scheduled updates have changed.
+    """
+    global change_count
+    with dashboard_changes:
+        change_count += 1
+        dashboard_changes.notify_all()
+
+@app.route('/stream')
+def stream() -> Response:
+    """
+    Pushes the changes to the dashboard as server-sent events over one long-lived connection,
+    so an open page stays up to date without reloading.
+
+    Each event is only sent when something has changed: "summary" has the figures for the area
+    that changed, "news" has the news added and removed, and "updates" has the scheduled
+    updates. The id of each event is the epoch of the snapshot and the version of the snapshot
+    and of the updates, which the browser sends back as Last-Event-ID when it reconnects, so
+    nothing is missed. If the server has restarted since, everything is sent again.
+
+    Parameters:
+    area: The local area, which defaults to the city in the config.
+    epoch: The epoch of the snapshot the page was made from.
+    since: The version of the snapshot the page was made from.
+    updates_since: The version of the scheduled updates the page was made from.
+
+    Returns:
+    A response that streams the events until the connection is closed, or an empty 204
+    response, which tells the browser not to reconnect, if each worker process only has one
+    thread, as the connection would take up the whole worker.
+    """
+    global stream_refused
+    if request.environ.get("wsgi.multiprocess") and not request.environ.get("wsgi.multithread"):
+        if not stream_refused:
+            logging.warning("/stream is turned off as the workers are single threaded. Run "
+                "gunicorn with --worker-class gthread --threads to use it.")
+            stream_refused = True
+        return Response(status=HTTPStatus.NO_CONTENT)
+    dashboard = current_dashboard()
+    area = request.args.get("area", city)
+    if area not in dashboard["areas"]:
+        abort(404)
+    epoch = request.args.get("epoch")
+    since = request.args.get("since", -1, type=int)
+    updates_version = request.args.get("updates_since", -1, type=int)
+    last_event = request.headers.get("Last-Event-ID", "").split(".")
+    if len(last_event) == 3 and all(part.isdigit() for part in last_event[1:]):
+        epoch, since, updates_version = last_event[0], int(last_event[1]), int(last_event[2])
+    since = resumed_version(epoch, since, dashboard["version"])
+    updates_version = resumed_version(epoch, updates_version, scheduled_updates()[0])
+    return Response(stream_events(area, since, updates_version), mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def resumed_version(epoch: str, since: int, current: int) -> int:
+    """
+    Checks a version a client already has. The versions start again from 0 when the server
+    restarts, so a version from before a restart, which has another epoch or is ahead of the
+    current version, is treated as the client having nothing.
+
+    Arguments:
+    epoch: The epoch of the snapshot the client's version is from, or None if it is not known.
+    since: The version the client already has.
+    current: The current version.
+
+    Returns:
+    The version the client has, or -1 if it has nothing.
+    """
+    if since > current or (epoch is not None and epoch != dashboard_cache.epoch):
+        return -1
+    return since
+
+def stream_events(area: str, since: int, updates_version: int):
+    """
+    Waits for the dashboard to change and yields the changes as server-sent events.
+
+    Arguments:
+    area: The local area.
+    since: The version of the snapshot the client already has.
+    updates_version: The version of the scheduled updates the client already has.
+
+    Parameters:
+    seen: The number of changes there had been before the dashboard was last checked.
+    events: The events sent for the latest changes, by name.
+
+    Returns:
+    An iterator of the events as text.
+    """
+    yield f"retry: {RECONNECT_MILLISECONDS}\n\n" # also sends the headers straight away
+    while True:
+        seen = change_count
+        dashboard = dashboard_cache.peek()
+        events = {}
+        if dashboard["version"] > since:
+            summary = summary_since(dashboard, area, since)
+            if summary["summary"]:
+                events["summary"] = summary
+            if dashboard["changed"].get("news", 0) > since:
+                events["news"] = news_since(since)
+            since = dashboard["version"]
+        updates = updates_since(updates_version)
+        if updates["updates"] is not None:
+            events["updates"] = updates
+            updates_version = updates["version"]
+        for event, data in events.items():
+            yield (f"id: {dashboard_cache.epoch}.{since}.{updates_version}\nevent: {event}\n"
+                f"data: {json.dumps(data)}\n\n")
+        with dashboard_changes:
+            dashboard_changes.wait_for(lambda: change_count != seen, KEEPALIVE_SECONDS)
+        if change_count == seen:
+            yield ": keepalive\n\n"
+
+@app.route('/metrics')
+def metrics() -> Response:
+    """
+    Shows how long the slow parts of the dashboard take, in the Prometheus text format.
+
+    Parameters:
+    stats: The statistics of the snapshot cache.
+
+    Returns:
+    The metrics as plain text.
+    """
+    stats = dashboard_cache.statistics()
+    return Response(render_metrics({
+        "dashboard_snapshot_version": ("Version of the dashboard snapshot.", stats["version"]),
+        "dashboard_snapshot_age_seconds": ("Seconds since the snapshot was refreshed.",
+            stats["age"]),
+        "dashboard_cache_hits_total": ("Number of requests served from the snapshot.",
+            stats["hits"]),
+        "dashboard_refreshes_total": ("Number of refreshes of the snapshot.", stats["refreshes"]),
+        "dashboard_refresh_failures_total": ("Number of refreshes that failed.",
+            stats["refresh_failures"]),
+        "dashboard_last_refresh_seconds": ("Time the last refresh took.",
+            stats["last_refresh_seconds"]),
+        "dashboard_covid_circuit_open": ("Whether the covid API is not being called.",
+            covid_upstream.is_open()),
+        "dashboard_news_circuit_open": ("Whether the news API is not being called.",
+            news_upstream.is_open()),
+        "dashboard_is_leader": ("Whether this worker runs the scheduler and requests the APIs.",
+            shared_state is None or shared_state.is_leader())
+    }), mimetype="text/plain; version=0.0.4")
+
+@app.before_request
+def start_request_timer() -> None:
+    """
+    Notes when the request started, and starts profiling it if profiling is turned on in the
+    config and the request has a profile argument.
+    """
+    g.request_start = time.perf_counter()
+    if profiling and request.args.get("profile"):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def stop_request_timer(response: Response) -> Response:
+    """
+    Records how long the request took, logs it, and saves its profile if it was profiled.
+
+    Arguments:
+    response: The response to the request.
+
+    Parameters:
+    duration: The number of seconds the request took.
+    filename: The file the profile is saved in, which can be opened with pstats or snakeviz.
+
+    Returns:
+    The response, unchanged.
+    """
+    duration = time.perf_counter() - g.request_start
+    observe(request_seconds, request.endpoint or "not_found", duration)
+    logging.info("%s %s %s %.1f ms", request.method, request.full_path, response.status_code,
+        duration * 1000, extra={"method": request.method, "url": request.full_path,
+        "endpoint": request.endpoint, "status": response.status_code,
+        "duration_ms": round(duration * 1000, 3)}) # the extra fields are kept in JSON logs
+    if "profiler" in g:
+        g.profiler.disable()
+        os.makedirs(profile_path, exist_ok=True)
+        filename = os.path.join(profile_path,
+            f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{request.endpoint}.prof")
+        g.profiler.dump_stats(filename)
+        logging.info("The profile of %s has been saved to %s.", request.full_path, filename)
+    return response
+
+@app.route('/cache_statistics')
+def cache_statistics() -> dict:
+    """
+    Shows how often the dashboard snapshot was served from the cache and how long refreshes take.
+
+    Returns:
+    A dictionary of the cache statistics, which flask returns as JSON.
+    """
+    return dashboard_cache.statistics()
+
+def load_dashboard_data() -> dict:
+    """
+    Requests the covid data and the news at the same time and processes them into a snapshot.
+
+    If either API fails or is too slow, the last good data from it is used instead, so the
+    other can still be updated.
+
+    Parameters:
+    results: The processed covid data and the news.
+
+    Returns:
+    A dictionary of the processed covid data, with the local cases for every area, and the news.
+    """
+    results = run_concurrently({"covid": load_covid_data, "news": update_news},
+        upstream_timeouts, {"covid": last_good_covid_data, "news": displayed_news})
+    return dict(results["covid"], news=results["news"])
+
+def load_covid_data() -> dict:
+    """
+    Requests the covid data and processes it into the covid part of the snapshot.
+
+    Returns:
+    A dictionary of the processed covid data, with the local cases for every area.
+    """
+    return process_covid_parts(covid_API_request())
+
+def last_good_covid_data() -> dict:
+    """
+    Returns the covid part of the current snapshot, for when the covid API cannot be reached.
+    If the server has only just started, it is worked out from the data saved in the data store.
+
+    Parameters:
+    dashboard: The current snapshot.
+
+    Returns:
+    A dictionary of the processed covid data, with the local cases for every area.
+    """
+    dashboard = dashboard_cache.peek()
+    if dashboard_cache.ready.is_set():
+        return {part: dashboard[part] for part in COVID_PARTS}
+    covid_data = read_covid_store()
+    if not covid_data["national"]["data"]:
+        raise LookupError("No covid data has been saved to fall back on.")
+    return process_covid_parts(covid_data)
+
+def process_covid_parts(covid_data: dict) -> dict:
+    """
+    Processes the covid data into the covid part of the snapshot.
+
+    Arguments:
+    covid_data: This is a dictionary of the data returned from the API request.
+
+    Returns:
+    A dictionary of the processed covid data, with the local cases for every area.
+    """
+    (_,
+    national_last7days_cases,
+    current_hospital_cases,
+    total_deaths) = process_covid_data(covid_data)
+    return {
+        "areas": process_areas_covid_data(covid_data["areas"]),
+        "national_7day_infections": national_last7days_cases,
+        "hospital_cases": current_hospital_cases,
+        "deaths_total": total_deaths
+    }
+
+dashboard_cache = SnapshotCache(load_dashboard_data, cache_ttl, required=COVID_PARTS)
+dashboard_cache.add_listener(record_news_changes)
+dashboard_cache.add_listener(notify_changes)
+scheduler.add_listener(notify_changes)
+
+@timed("covid_API_request")
 def covid_API_request() -> dict:
     """
     Retrieves the data from the covid API using location and location type.
 
+    The local and national data are brought up to date in the data store at the same time,
+    then read back from it. When more than one area is served, every local authority is
+    requested together instead of one request per area. The full history of a few areas that
+    are missing their history is requested separately, or of every local authority together if
+    more than MAX_HISTORY_REQUESTS are missing it.
+
     Parameters:
-    data: A dictionary including all the data that is retrieved from the API.
-    covid_location: The templates for the filter of the API.
-    cases_and_deaths: The structures that are used for the API.
-    api: The data the API returns.
+    timeout: The number of seconds the covid API is given to respond.
+    local_area: The area the local data is filtered to, or None for every area.
+    local_structure: The structure of the local data wanted from the API.
+    tasks: The requests made at the same time, by name.
+    missing: The areas missing their history.
 
     Returns:
-    A dictionary of the data retrieved from the API.
+    A dictionary of the data retrieved from the API, with the data for each area under "areas".
     """
     logging.debug("Data is being requested from the API")
-    data = {}
-    covid_location = (f'areaName={city}','areaType=ltla') # first checks for local cases
-    cases_and_deaths = {"date": "date",
-    "areaName": "areaName",
-    "newCasesBySpecimenDate": "newCasesBySpecimenDate"}
-    api = Cov19API(filters=covid_location, structure=cases_and_deaths)
-    data["local"] = api.get_json()
-    covid_location = ('areaName=United Kingdom','areaType=overview') # then checks national cases
-    cases_and_deaths = {"date": "date",
-    "areaName": "areaName",
-    "newCasesBySpecimenDate": "newCasesBySpecimenDate",
-    "cumDailyNsoDeathsByDeathDate": "cumDailyNsoDeathsByDeathDate",
-    "hospitalCases": "hospitalCases"}
-    api = Cov19API(filters=covid_location, structure=cases_and_deaths)
-    data["national"] = api.get_json()
+    timeout = upstream_timeouts.get("covid")
+    local_area = city if areas == [city] else None
+    local_structure = {
+        "date": "date",
+        "areaName": "areaName",
+        "newCasesBySpecimenDate": "newCasesBySpecimenDate"}
+    tasks = {
+        "local": lambda: update_covid_store("ltla", local_area, local_structure), # local cases
+        "national": lambda: update_covid_store("overview", "United Kingdom", {
+            "date": "date",
+            "areaName": "areaName",
+            "newCasesBySpecimenDate": "newCasesBySpecimenDate",
+            "cumDailyNsoDeathsByDeathDate": "cumDailyNsoDeathsByDeathDate",
+            "hospitalCases": "hospitalCases"}) # then national cases
+    }
+    missing = areas_missing_history() if local_area is None else []
+    if len(missing) > MAX_HISTORY_REQUESTS:
+        tasks["local"] = lambda: update_covid_store("ltla", None, local_structure,
+            full_history=True)
+    else:
+        for area_name in missing:
+            tasks[f"history of {area_name}"] = (lambda area_name=area_name:
+                update_covid_store("ltla", area_name, local_structure, full_history=True))
+    run_concurrently(tasks, dict.fromkeys(tasks, timeout))
+    data = read_covid_store()
     logging.debug("The api has returned the data.")
     return data
 
+def read_covid_store() -> dict:
+    """
+    Reads the covid data of the served areas from the data store.
+
+    Returns:
+    A dictionary of the data in the same format as covid_API_request returns.
+    """
+    data = {
+        "national": {"data": data_store.rows("overview", "United Kingdom")},
+        "areas": {area_name: {"data": rows} for area_name, rows
+            in data_store.rows_by_area("ltla", areas).items()}
+    }
+    data["local"] = data["areas"].get(city, {"data": []})
+    return data
+
+def areas_missing_history() -> list:
+    """
+    Finds the served areas whose history has not been stored, such as areas added since the
+    last refresh. Requesting the newest days of every area together only gives these areas
+    the last few days, so their whole history has to be requested on its own.
+
+    Parameters:
+    date_ranges: The oldest and newest stored date of each local area.
+    earliest: The oldest date an area is expected to have, allowing for areas whose
+    history starts a little later.
+
+    Returns:
+    A list of the names of the areas, which is empty if nothing is stored yet, as the
+    history of every area is then requested together. When every local authority is served,
+    these are the stored areas whose history is short.
+    """
+    date_ranges = data_store.date_ranges("ltla")
+    if not date_ranges:
+        return []
+    earliest = (datetime.strptime(min(first for first, _ in date_ranges.values()), "%Y-%m-%d")
+        + timedelta(MAX_DELTA_DAYS)).strftime("%Y-%m-%d")
+    return [area_name for area_name in (date_ranges if areas is None else areas)
+        if area_name not in date_ranges or date_ranges[area_name][0] > earliest]
+
+def update_covid_store(area_type: str, area_name: str, structure: dict,
+    full_history: bool = False) -> None:
+    """
+    Requests the days that are newer than the ones in the data store and adds them to it.
+
+    The last few stored days are requested again as the API still revises them. If nothing is
+    stored, or the store is too far behind, the whole history is requested instead.
+
+    Arguments:
+    area_type: The type of area, such as ltla or overview.
+    area_name: The name of the area, or None to request every area of the type at once.
+    structure: The structure of the data wanted from the API.
+    full_history: Whether to request the whole history, whatever is stored.
+
+    Parameters:
+    latest_date: The newest date in the data store for the area.
+    dates: The dates that are requested from the API.
+    """
+    filters = ((f'areaName={area_name}',) if area_name else ()) + (f'areaType={area_type}',)
+    timeout = upstream_timeouts.get("covid")
+    latest_date = data_store.latest_date(area_type, area_name)
+    today = datetime.now()
+    if latest_date is not None:
+        first_date = datetime.strptime(latest_date, "%Y-%m-%d") - timedelta(REVISED_DAYS)
+    if full_history or latest_date is None or (today - first_date).days > MAX_DELTA_DAYS:
+        logging.debug("The full history of %s is being requested.", area_name or area_type)
+        rows = get_covid_json(Cov19API(filters=filters, structure=structure), timeout)["data"]
+    else:
+        dates = [(first_date + timedelta(i)).strftime("%Y-%m-%d")
+            for i in range((today - first_date).days + 1)]
+        logging.debug("%s days of %s are being requested.", len(dates), area_name or area_type)
+        pages = run_concurrently({date: (lambda date=date: get_covid_json(
+            Cov19API(filters=filters + (f'date={date}',), structure=structure), timeout))
+            for date in dates}, {})
+        rows = [row for page in pages.values() for row in page["data"]]
+    data_store.add_rows(area_type, rows)
+
+def get_covid_json(api: Cov19API, timeout: float) -> dict:
+    """
+    Requests every page of the data for an API request over the shared session, retrying
+    pages that fail.
+
+    Arguments:
+    api: The API request, which holds the filters and structure.
+    timeout: The number of seconds each page is given to respond.
+
+    Parameters:
+    api_params: The parameters sent to the API, including the page number.
+
+    Returns:
+    A dictionary of the data in the same format as Cov19API.get_json.
+    """
+    api_params = dict(api.api_params, format="json", page=1)
+    data = {"data": [], "lastUpdate": None}
+    while True:
+        response = covid_upstream.call(request_covid_page, api_params, timeout)
+        if response.status_code == HTTPStatus.NO_CONTENT: # there are no more pages
+            break
+        data["lastUpdate"] = response.headers.get("Last-Modified")
+        data["data"].extend(response.json()["data"])
+        api_params["page"] += 1
+    data["length"] = len(data["data"])
+    data["totalPages"] = api_params["page"] - 1
+    return data
+
+def request_covid_page(api_params: dict, timeout: float) -> requests.Response:
+    """
+    Requests one page of data from the covid API.
+
+    Arguments:
+    api_params: The parameters sent to the API, including the page number.
+    timeout: The number of seconds the page is given to respond.
+
+    Returns:
+    The response, which has no content if there are no more pages.
+    """
+    response = session.get(Cov19API.endpoint, params=api_params, timeout=timeout)
+    if response.status_code >= HTTPStatus.BAD_REQUEST:
+        raise FailedRequestError(response=response, params=api_params)
+    return response
+
+def index_by_date(rows, date_key: str = "date") -> dict:
+    """
+    Indexes the rows of covid data by their date in a single pass.
+
+    Arguments:
+    rows: An iterable of dictionaries, each one being the data for one day.
+    date_key: The name of the column holding the date.
+
+    Returns:
+    A dictionary mapping each date in YYYY-MM-DD format to its row.
+    """
+    return {row[date_key]: row for row in rows}
+
+def last7days_cases(data_by_date: dict, today: datetime) -> int:
+    """
+    Adds up the cases of the 7 days before the last 4, which are not yet complete.
+
+    Arguments:
+    data_by_date: The covid data of an area indexed by date.
+    today: The date the calculation is relative to.
+
+    Returns:
+    The number of cases in the last 7 days.
+    """
+    cases = 0
+    for i in range(7):
+        date = (today - timedelta(i+4)).strftime("%Y-%m-%d")
+        if data_by_date.get(date, {}).get('newCasesBySpecimenDate') is not None:
+            cases += int(data_by_date[date]['newCasesBySpecimenDate'])
+    return cases
+
+def latest_value(data_by_date: dict, day: datetime, key: str) -> int:
+    """
+    Finds a value on a day, or on the closest day before it that has one if the API has not
+    given it yet.
+
+    Arguments:
+    data_by_date: The covid data of an area indexed by date.
+    day: The day the value is wanted for.
+    key: The name of the value.
+
+    Returns:
+    The value, or None if none of the LOOKBACK_DAYS days up to the day have it.
+    """
+    for i in range(LOOKBACK_DAYS):
+        row = data_by_date.get((day - timedelta(i)).strftime("%Y-%m-%d"), {})
+        if row.get(key) is not None:
+            return int(row[key])
+    return None
+
+@timed("process_covid_data")
 def process_covid_data(covid_data: dict) -> tuple[int, int, int, int]:
     """
     Processes the covid data and performs the calculations to return the data needed.
@@ -249,33 +1504,41 @@ def process_covid_data(covid_data: dict) -> tuple[int, int, int, int]:
 
     Parameters:
     covid_data: This is a dictionary of the data returned from the API request.
+    national_by_date: The national data indexed by date.
+    today: The date the calculations are relative to.
     local_last7days_cases: The number of local cases in the last 7 days.
     national_last7days_cases: The number of national cases in the last 7 days.
     current_hospital_cases: The number of current hospital cases.
     total_deaths: The number of total deaths in The UK.
 
     Returns:
-    4 integers of the data wanted from the API
+    4 integers of the data wanted from the API, with None for the hospital cases or deaths if
+    the API has not given them for over a week.
     """
-    local_last7days_cases = 0
-    national_last7days_cases = 0
-    local_covid_data = covid_data["local"]
-    national_covid_data = covid_data["national"]
-    for i in range(7):
-        for data in local_covid_data["data"]:
-            if data['date'] == (datetime.now() - timedelta(i+4)).strftime("%Y-%m-%d"):
-                local_last7days_cases += int(data['newCasesBySpecimenDate'])
-        for data in national_covid_data["data"]:
-            if data['date'] == (datetime.now() - timedelta(i+4)).strftime("%Y-%m-%d"):
-                national_last7days_cases += int(data['newCasesBySpecimenDate'])
-    for data in national_covid_data["data"]:
-        if data['date'] == (datetime.now() - timedelta(2)).strftime("%Y-%m-%d"):
-            current_hospital_cases = int(data['hospitalCases'])
-        if data['date'] == (datetime.now() - timedelta(14)).strftime("%Y-%m-%d"):
-            total_deaths = int(data['cumDailyNsoDeathsByDeathDate'])
+    national_by_date = index_by_date(covid_data["national"]["data"])
+    today = datetime.now()
+    local_last7days_cases = last7days_cases(index_by_date(covid_data["local"]["data"]), today)
+    national_last7days_cases = last7days_cases(national_by_date, today)
+    current_hospital_cases = latest_value(national_by_date, today - timedelta(2), 'hospitalCases')
+    total_deaths = latest_value(national_by_date, today - timedelta(14),
+        'cumDailyNsoDeathsByDeathDate')
     logging.info("The data has been processed.")
     return local_last7days_cases, national_last7days_cases, current_hospital_cases, total_deaths
 
+def process_areas_covid_data(areas_data: dict) -> dict:
+    """
+    Works out the local cases in the last 7 days for every area.
+
+    Arguments:
+    areas_data: A dictionary of the data of each area, by the name of the area.
+
+    Returns:
+    A dictionary of the number of cases in the last 7 days, by the name of the area.
+    """
+    today = datetime.now()
+    return {area_name: last7days_cases(index_by_date(area_data["data"]), today)
+        for area_name, area_data in areas_data.items()}
+
 def process_covid_csv_data(covid_csv_data: csv) -> tuple[int, int, int]:
     """
     (For Test) Processes covid data from a csv file.
@@ -285,27 +1548,23 @@ def process_covid_csv_data(covid_csv_data: csv) -> tuple[int, int, int]:
 
     Parameters:
     last7days_cases: The number of cases in the last 7 days with a default value of 0.
-    dict_reader: The csv file converted into a dictionary.
-    list_of_dict: The dictionary converted into a list.
+    csv_by_date: The rows of the csv file indexed by date.
     date: The date used for the test.
 
     Returns:
     3 integers of the data wanted from the CSV file.
     """
     last7days_cases = 0
-    dict_reader = DictReader(covid_csv_data) # converts csv file into a dictionary
-    list_of_dict = list(dict_reader) # then a list of llists in the dictionary
+    csv_by_date = index_by_date(DictReader(covid_csv_data), "current_date")
     date = ("2021-10-28")
     date = datetime.strptime(date, '%Y-%m-%d')
     for i in range(7):
-        for each_line in list_of_dict:
-            if each_line['current_date'] == (date - timedelta(i+2)).strftime("%Y-%m-%d"):
-                last7days_cases += int(each_line['newCasesBySpecimenDate'])
-    for each_line in list_of_dict:
-        if each_line['current_date'] == date.strftime("%Y-%m-%d"):
-            current_hospital_cases = int(each_line['hospitalCases'])
-        if each_line['current_date'] == (date - timedelta(13)).strftime("%Y-%m-%d"):
-            total_deaths = int(each_line['cumDailyNsoDeathsByDeathDate'])
+        day = (date - timedelta(i+2)).strftime("%Y-%m-%d")
+        if day in csv_by_date:
+            last7days_cases += int(csv_by_date[day]['newCasesBySpecimenDate'])
+    current_hospital_cases = int(csv_by_date[date.strftime("%Y-%m-%d")]['hospitalCases'])
+    total_deaths = int(
+        csv_by_date[(date - timedelta(13)).strftime("%Y-%m-%d")]['cumDailyNsoDeathsByDeathDate'])
     return last7days_cases, current_hospital_cases, total_deaths
 
 def parse_csv_data (csv_filename: str) -> list[str]:
@@ -364,5 +1623,72 @@ def hhmm_to_seconds(hhmm: str) -> int:
     return minutes_to_seconds(hours_to_minutes(hhmm.split(':')[0])) + \
         minutes_to_seconds(hhmm.split(':')[1])
 
+def export_static(path: str) -> None:
+    """
+    Exports the current snapshot as static files, so a static file server or CDN can serve
+    the pages and the flask app only has to schedule updates and delete news.
+
+    The export holds the page (index.html) and JSON (summary.json) of the city, and for every
+    area a page and JSON under areas/, named by area_slug. areas.json lists the files of each
+    area by its name. The JSON has the figures of /api/summary and the news.
+
+    Arguments:
+    path: The path the export is served from.
+
+    Parameters:
+    dashboard: The snapshot that is exported.
+    files: The contents of each file, by its path in the export.
+    """
+    dashboard = dashboard_cache.peek()
+    if not dashboard_cache.ready.is_set():
+        raise LookupError("There is no dashboard to export yet.")
+    start = time.perf_counter()
+    files = {}
+    listing = {}
+    with app.app_context():
+        for area in dashboard["areas"]:
+            page = render_index(dashboard, area)[1]
+            summary = json.dumps(dict(summary_since(dashboard, area, -1),
+                news=dashboard["news"])).encode("utf-8")
+            slug = area_slug(area)
+            listing[area] = {"page": f"areas/{slug}.html", "summary": f"areas/{slug}.json"}
+            files[listing[area]["page"]] = page
+            files[listing[area]["summary"]] = summary
+            if area == city:
+                files["index.html"] = page
+                files["summary.json"] = summary
+    files["areas.json"] = json.dumps(listing).encode("utf-8")
+    export_files(path, files)
+    logging.info("Version %s of the dashboard was exported in %.3f seconds.",
+        dashboard["version"], time.perf_counter() - start)
+
+def export_changes(old_snapshot: dict, new_snapshot: dict) -> None:
+    """
+    Exports each new snapshot to export-path. The export is done by the scheduler rather than
+    while the snapshot is being changed, and only by the leader when workers share the dashboard.
+
+    Arguments:
+    old_snapshot: The snapshot before the change, which is not used.
+    new_snapshot: The snapshot after the change, which is not used.
+    """
+    if dashboard_cache.ready.is_set() and (shared_state is None or shared_state.is_leader()):
+        scheduler.schedule(STATIC_EXPORT, "Export the dashboard", 0, export_static,
+            {"path": export_path}, listed=False)
+
+def main() -> None:
+    """
+    Serves the dashboard, or with --export requests the data once, exports it and exits.
+    """
+    parser = argparse.ArgumentParser(description="The covid dashboard.")
+    parser.add_argument("--export", metavar="DIRECTORY",
+        help="request the data, export the pages and JSON to the directory and exit")
+    arguments = parser.parse_args()
+    if arguments.export is None:
+        create_app().run()
+        return
+    configure_logging()
+    dashboard_cache.refresh()
+    export_static(arguments.export)
+
 if __name__ == "__main__":
-    app.run()
+    main()
@@ -0,0 +1,223 @@
+"""
+This module stores the covid data on disk so only the newest days need to be requested from the API.
+"""
+import sqlite3
+import sys
+import threading
+
+METRICS = ("newCasesBySpecimenDate", "cumDailyNsoDeathsByDeathDate", "hospitalCases")
+ROW_FIELDS = {
+    "date": "date",
+    "areaName": "area_name",
+    "newCasesBySpecimenDate": "new_cases",
+    "cumDailyNsoDeathsByDeathDate": "deaths",
+    "hospitalCases": "hospital_cases"
+} # the attribute of a CovidRow holding each column of the API
+
+class CovidRow:
+    """
+    The covid data of one area on one day.
+
+    The values are kept in slots rather than in a dictionary for each row, which takes a
+    fraction of the memory, and the dates and area names are interned so every row of the same
+    day or area shares one string. A row can still be read like the dictionaries the API
+    returns, so row["date"] and row.get("hospitalCases") work on either.
+
+    Arguments:
+    date: The date in YYYY-MM-DD format.
+    area_name: The name of the area.
+    new_cases: The new cases by specimen date, or None if not given.
+    deaths: The cumulative deaths by death date, or None if not given.
+    hospital_cases: The hospital cases, or None if not given.
+    """
+    __slots__ = tuple(ROW_FIELDS.values())
+
+    def __init__(self, date: str, area_name: str, new_cases: int = None, deaths: int = None,
+        hospital_cases: int = None) -> None:
+        self.date = sys.intern(date)
+        self.area_name = sys.intern(area_name)
+        self.new_cases = new_cases
+        self.deaths = deaths
+        self.hospital_cases = hospital_cases
+
+    def __getitem__(self, key: str):
+        if key not in ROW_FIELDS:
+            raise KeyError(key)
+        return getattr(self, ROW_FIELDS[key])
+
+    def __repr__(self) -> str:
+        return (f"CovidRow({self.date!r}, {self.area_name!r}, {self.new_cases!r}, "
+            f"{self.deaths!r}, {self.hospital_cases!r})")
+
+    def get(self, key: str, default=None):
+        """
+        Returns the value of a column of the API, like dict.get.
+
+        Arguments:
+        key: The name of the column, such as newCasesBySpecimenDate.
+        default: What is returned if there is no such column.
+
+        Returns:
+        The value of the column.
+        """
+        return getattr(self, ROW_FIELDS[key]) if key in ROW_FIELDS else default
+
+class CovidDataStore:
+    """
+    A SQLite table of the daily covid data for each area, in the same format the API returns it.
+    The rows are read back as CovidRow.
+
+    Arguments:
+    path: The path of the SQLite database file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock() # SQLite only allows one writer at a time
+        self.created = False
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Opens a connection to the database, creating the table the first time.
+
+        Returns:
+        The connection.
+        """
+        connection = sqlite3.connect(self.path)
+        if not self.created:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS covid_data ("
+                "areaType TEXT NOT NULL, areaName TEXT NOT NULL, date TEXT NOT NULL, "
+                + ", ".join(f"{metric} INTEGER" for metric in METRICS) +
+                ", PRIMARY KEY (areaType, areaName, date))")
+            connection.commit()
+            self.created = True
+        return connection
+
+    def latest_date(self, area_type: str, area_name: str = None) -> str:
+        """
+        Finds the most recent date stored for an area.
+
+        Arguments:
+        area_type: The type of area, such as ltla or overview.
+        area_name: The name of the area, or None for the most recent date of any area of the type.
+
+        Returns:
+        The date in YYYY-MM-DD format, or None if nothing is stored for the area.
+        """
+        connection = self.connect()
+        try:
+            if area_name is None:
+                row = connection.execute(
+                    "SELECT MAX(date) FROM covid_data WHERE areaType = ?", (area_type,)).fetchone()
+            else:
+                row = connection.execute(
+                    "SELECT MAX(date) FROM covid_data WHERE areaType = ? AND areaName = ?",
+                    (area_type, area_name)).fetchone()
+        finally:
+            connection.close()
+        return row[0]
+
+    def version(self) -> int:
+        """
+        Returns a number that goes up every time rows are added, including rows that replace
+        revised days, so data read from the store can be cached until it changes. Replacing a
+        row gives it a new rowid, so this is the largest rowid.
+
+        Returns:
+        The version of the stored data, which is 0 if nothing is stored.
+        """
+        connection = self.connect()
+        try:
+            return connection.execute("SELECT MAX(rowid) FROM covid_data").fetchone()[0] or 0
+        finally:
+            connection.close()
+
+    def date_ranges(self, area_type: str) -> dict:
+        """
+        Finds the oldest and newest dates stored for each area of a type.
+
+        Arguments:
+        area_type: The type of area, such as ltla or overview.
+
+        Returns:
+        A dictionary of the oldest and newest date of each area in YYYY-MM-DD format, by the
+        name of the area.
+        """
+        connection = self.connect()
+        try:
+            return {area_name: (first, last) for area_name, first, last in connection.execute(
+                "SELECT areaName, MIN(date), MAX(date) FROM covid_data WHERE areaType = ? "
+                "GROUP BY areaName", (area_type,))}
+        finally:
+            connection.close()
+
+    def add_rows(self, area_type: str, rows: list) -> None:
+        """
+        Adds rows returned by the API, replacing any that are already stored for the same day.
+
+        Arguments:
+        area_type: The type of area the rows are for.
+        rows: A list of dictionaries, each one being the data for one day in one area.
+        """
+        with self.lock:
+            connection = self.connect()
+            try:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO covid_data VALUES (?, ?, ?, ?, ?, ?)",
+                    [(area_type, row["areaName"], row["date"])
+                    + tuple(row.get(metric) for metric in METRICS) for row in rows])
+                connection.commit()
+            finally:
+                connection.close()
+
+    def rows(self, area_type: str, area_name: str) -> list:
+        """
+        Reads all the stored rows for an area, newest first like the API.
+
+        Arguments:
+        area_type: The type of area.
+        area_name: The name of the area.
+
+        Returns:
+        A list of CovidRow, each one being the data for one day.
+        """
+        connection = self.connect()
+        try:
+            cursor = connection.execute(
+                "SELECT date, areaName, " + ", ".join(METRICS) + " FROM covid_data "
+                "WHERE areaType = ? AND areaName = ? ORDER BY date DESC",
+                (area_type, area_name))
+            return [CovidRow(*row) for row in cursor]
+        finally:
+            connection.close()
+
+    def rows_by_area(self, area_type: str, area_names: list = None) -> dict:
+        """
+        Reads the stored rows of many areas at once, newest first like the API.
+
+        Arguments:
+        area_type: The type of area.
+        area_names: The names of the areas, or None for every stored area of the type.
+
+        Parameters:
+        names_filter: The condition on the area names, which is empty for every area.
+        by_area: The rows grouped by the name of their area.
+
+        Returns:
+        A dictionary of the list of CovidRow of each area, by the name of the area.
+        """
+        names_filter = "" if area_names is None else (
+            " AND areaName IN (" + ", ".join("?" for _ in area_names) + ")")
+        connection = self.connect()
+        try:
+            cursor = connection.execute(
+                "SELECT date, areaName, " + ", ".join(METRICS) + " FROM covid_data "
+                "WHERE areaType = ?" + names_filter + " ORDER BY areaName, date DESC",
+                (area_type, *(area_names or ())))
+            by_area = {} if area_names is None else {area_name: [] for area_name in area_names}
+            for row in cursor:
+                by_area.setdefault(row[1], []).append(CovidRow(*row))
+            return by_area
+        finally:
+            connection.close()
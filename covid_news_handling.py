@@ -1,29 +1,80 @@
 """
 This module handles the news and the news API.
 """
-import json
 import logging
+import threading
+import requests
 from newsapi.newsapi_client import NewsApiClient
+from newsapi.newsapi_exception import NewsAPIException
+from upstream import session, Upstream, TimeoutSession
+from dashboard_metrics import timed
+from dashboard_config import load_config
+from news_ranking import NewsIndex
 
-news = []
-list_of_news = []
+news = {} # the news shown on the server, by title, oldest first
+list_of_news = {} # the titles of all news received, least recently seen first
+news_lock = threading.Lock()
 
-with open("config.json","r", encoding="utf-8") as information:
-    config = json.load(information)
-    api_key = config["API-key"]
-    covid_terms = config["covid-terms"]
+config = load_config()
+api_key = config["API-key"]
+covid_terms = config["covid-terms"]
+news_history_size = config.get("news-history-size", 1000)
+news_top_k = config.get("news-top-k") # the number of stories shown, or None for all of them
+news_timeout = config.get("upstream-timeouts", {}).get("news", 10)
+retries = config.get("upstream-retries", {})
+news_client = None # created the first time the news is requested
+news_query = f"{covid_terms} {config['city']}" # the news is ranked by how relevant it is to this
+news_index = NewsIndex(news_query) # ranks the news in news
+
+news_upstream = Upstream("news", news_timeout, retries.get("attempts", 3),
+    retries.get("backoff", 0.5), retries.get("failure-threshold", 5),
+    retries.get("reset-timeout", 30), retry_on=(requests.RequestException, NewsAPIException))
+
+class NewsArticle:
+    """
+    A news article shown on the server, kept in slots rather than a dictionary of its own.
+
+    Arguments:
+    title: The title of the article.
+    content: The description of the article.
+    source: The name of the source of the article, or None if it is not known.
+    """
+    __slots__ = ("title", "content", "source")
+
+    def __init__(self, title: str, content: str, source: str = None) -> None:
+        self.title = title
+        self.content = content
+        self.source = source
+
+    def __repr__(self) -> str:
+        return f"NewsArticle({self.title!r}, {self.content!r})"
+
+    def as_dict(self) -> dict:
+        """
+        Returns the article in the format used by the template and the JSON API.
+
+        Returns:
+        A dictionary of the title and content.
+        """
+        return {"title": self.title, "content": self.content}
 
 def add_news_to_list(headlines: dict) -> None:
     """
     Adds the news to the list of all news, so that we can see all the news, even the deleted ones.
     This is to make sure no news is repeated during an update.
 
+    The list only remembers the most recently seen news, so once it is full the news that has
+    not been returned by the API for the longest is forgotten and stops being shown.
+
     Arguments:
     headlines: All of the headlines in a dictionary.
     """
-    list_of_news.append({
-        "title": headlines["title"]
-    }) # adds the new news to the list of news already received
+    list_of_news[headlines["title"]] = None # adds the new news to the list of news already received
+    while len(list_of_news) > news_history_size:
+        oldest_title = next(iter(list_of_news)) # a plain dict keeps the order titles were added
+        del list_of_news[oldest_title]
+        news.pop(oldest_title, None)
+        news_index.remove(oldest_title)
     logging.debug("News has been added to the list.")
 
 def add_news_article(headlines: dict) -> None:
@@ -33,26 +84,75 @@ def add_news_article(headlines: dict) -> None:
     Arguments:
     headlines: All of the headlines in a dictionary.
     """
-    news.append({
-        "title": headlines["title"],
-        "content": headlines["description"],
-    }) # adds the news to the list of news to go on the server
+    article = NewsArticle(headlines["title"], headlines["description"],
+        (headlines.get("source") or {}).get("name"))
+    news[article.title] = article # adds the news to the list of news to go on the server
+    news_index.remove(article.title) # in case the same title was added before
+    news_index.add(article.title, article.content, article.source)
     logging.debug("News has been added to the server.")
 
 def delete_news(news_to_delete: str) -> None:
     """
-    Delete the news from the displayed news.
+    Delete the news from the displayed news, along with the other articles about the same story
+    so they do not take its place.
 
     Arguments:
     news_to_delete: The title of the news to be deleted.
     """
-    for all_news in news:
-        if all_news["title"] == news_to_delete: # checks the news title against all news titles
-            news.remove(all_news)
+    with news_lock:
+        if news_to_delete in news:
+            for title in news_index.cluster(news_to_delete):
+                del news[title]
+                news_index.remove(title)
             logging.debug("News has been deleted.")
             return
     logging.warning("Could not delete the news.")
 
+def displayed_news() -> list:
+    """
+    Returns the news that is shown on the server, ranked by how relevant it is to the covid
+    terms and the city, with one article for each story.
+
+    Returns:
+    A list of dictionaries of the title and content of the news_top_k most relevant stories,
+    most relevant first, with equally relevant news oldest first.
+    """
+    with news_lock:
+        return [news[title].as_dict() for title in news_index.top(news_top_k)]
+
+def news_state() -> dict:
+    """
+    Returns the news that has been received, so another worker can carry on from it.
+
+    Returns:
+    A dictionary of the titles of all news received, least recently seen first, and the
+    title, content and source of the news shown, oldest first. The titles received but not
+    shown are the deleted ones.
+    """
+    with news_lock:
+        return {"seen": list(list_of_news),
+            "shown": [[article.title, article.content, article.source]
+                for article in news.values()]}
+
+def load_news_state(state: dict) -> None:
+    """
+    Replaces the news with the news received by another worker, so deleted news stays deleted.
+
+    Arguments:
+    state: A dictionary in the format returned by news_state.
+    """
+    global news_index
+    with news_lock:
+        list_of_news.clear()
+        list_of_news.update(dict.fromkeys(state["seen"]))
+        news.clear()
+        news_index = NewsIndex(news_query)
+        for title, content, source in state["shown"]:
+            news[title] = NewsArticle(title, content, source)
+            news_index.add(title, content, source)
+    logging.debug("%s articles have been loaded from another worker.", len(news))
+
+@timed("update_news")
 def update_news() -> list:
     """
     Updates the list of news to all the top headlines.
@@ -60,36 +160,51 @@ def update_news() -> list:
     Parameters:
     top_headlines: A dictionary of a ll the top headlines.
     articles: All of the articles in the top_headlines dictionary.
-    in_list: A boolean that tells you whether the news has been displayed before.
+    seen: The number of articles that had already been received.
 
     Returns:
     A list of all the news that is to be displayed.
     """
     top_headlines = news_API_request()
     articles = top_headlines["articles"]
-    for headlines in articles:
-        in_list = False # list is deafult not in list but checks whether to display it
-        for all_news in list_of_news:
-            if all_news["title"] == headlines["title"]:
-                in_list = True
-                logging.debug("News that has already been posted is in the list.")
-        if in_list is not True:
-            add_news_to_list(headlines)
-            add_news_article(headlines)
-    return news
+    seen = 0
+    with news_lock:
+        for headlines in articles:
+            if headlines["title"] in list_of_news: # checks whether it has been displayed before
+                list_of_news[headlines["title"]] = list_of_news.pop(headlines["title"]) # newest last
+                seen += 1 # logged once below rather than once per article
+            else:
+                add_news_to_list(headlines)
+                add_news_article(headlines)
+    logging.debug("%s of the %s articles had already been posted.", seen, len(articles))
+    return displayed_news()
 
+@timed("news_API_request")
 def news_API_request() -> dict:
     """
     Makes a request from the API.
 
+    The request is retried if it fails, and is not made at all while the news API keeps failing.
+
     Parameters:
-    newsapi: Stores what the API returns.
     top_headlines: A dictionary of all the top headlines.
 
     Returns:
     The top headlines in dictionary format.
     """
-    newsapi = NewsApiClient(api_key) # uses the client to recieve the api
-    top_headlines = (newsapi.get_top_headlines(q=covid_terms)) # checks the top headlines for news
+    top_headlines = news_upstream.call(get_news_client().get_top_headlines,
+        q=covid_terms) # checks the top headlines for news
     logging.debug("News has been succesfully retrieved.")
     return top_headlines
+
+def get_news_client() -> NewsApiClient:
+    """
+    Returns the client for the news API, creating it the first time so it is reused.
+
+    Returns:
+    The client, which uses the open connections to the api with the timeout from the config.
+    """
+    global news_client
+    if news_client is None:
+        news_client = NewsApiClient(api_key, session=TimeoutSession(session, news_timeout))
+    return news_client
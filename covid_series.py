@@ -0,0 +1,188 @@
+"""
+This module turns the stored covid history into compact daily or weekly series for charting.
+"""
+from typing import NamedTuple
+import numpy as np
+
+SERIES_METRICS = {
+    "new_cases": "newCasesBySpecimenDate",
+    "hospital_cases": "hospitalCases",
+    "cum_deaths": "cumDailyNsoDeathsByDeathDate"
+} # the name of each series, with the column of the API it comes from
+SUMMED = {"new_cases"} # the series that are added up over a week, rather than taking its last day
+
+class Series(NamedTuple):
+    """
+    Daily or weekly covid data of an area as arrays with one entry per period, oldest first.
+    Periods with no data are NaN.
+
+    Arguments:
+    start: The first day, or the Monday of the first week, as a numpy datetime64 day.
+    step: The number of days in each period, which is 1 or 7.
+    columns: The array of each series, by its name in SERIES_METRICS.
+    """
+    start: np.datetime64
+    step: int
+    columns: dict
+
+    def periods(self) -> int:
+        """
+        Returns the number of days or weeks in the series.
+
+        Returns:
+        The length of the arrays.
+        """
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+def daily_series(rows: list, names: tuple) -> Series:
+    """
+    Loads rows of covid data into arrays covering every day from the first to the last.
+
+    Arguments:
+    rows: A list of CovidRow or dictionaries, each one being the data for one day, in any order.
+    names: The names of the series wanted, from SERIES_METRICS.
+
+    Parameters:
+    days: The number of days from the first date of each row.
+
+    Returns:
+    The daily series.
+    """
+    if not rows:
+        return Series(np.datetime64("today", "D"), 1,
+            {name: np.array([], dtype=float) for name in names})
+    row_dates = np.array([row["date"] for row in rows], dtype="datetime64[D]")
+    start = row_dates.min()
+    days = (row_dates - start).astype(int)
+    columns = {}
+    for name in names:
+        column = np.full(int(days.max()) + 1, np.nan)
+        column[days] = [np.nan if row.get(SERIES_METRICS[name]) is None
+            else row.get(SERIES_METRICS[name]) for row in rows]
+        columns[name] = column
+    return Series(start, 1, columns)
+
+def slice_series(series: Series, first: str = None, last: str = None) -> Series:
+    """
+    Keeps the days of a daily series between two dates.
+
+    Arguments:
+    series: The daily series.
+    first: The first day kept in YYYY-MM-DD format, or None to keep from the start.
+    last: The last day kept in YYYY-MM-DD format, or None to keep to the end.
+
+    Returns:
+    The daily series of the days kept, which is empty if none are.
+    """
+    begin = 0 if first is None else max(0, (np.datetime64(first, "D") - series.start).astype(int))
+    end = (series.periods() if last is None
+        else max(0, (np.datetime64(last, "D") - series.start).astype(int) + 1))
+    return Series(series.start + begin, 1,
+        {name: column[begin:end] for name, column in series.columns.items()})
+
+def weekly_series(series: Series) -> Series:
+    """
+    Aggregates a daily series into weeks from Monday to Sunday. New cases are added up and
+    the other series take the last day of the week that has a value, so a week that is only
+    partly in the series covers the days that are.
+
+    Arguments:
+    series: The daily series.
+
+    Parameters:
+    before: The number of days from the Monday of the first week to the first day.
+    weeks: The values of each series as a row of 7 days for each week.
+
+    Returns:
+    The weekly series.
+    """
+    if not series.periods():
+        return Series(series.start, 7, dict(series.columns))
+    before = (series.start - np.datetime64("1970-01-05")).astype(int) % 7 # 1970-01-05 was a Monday
+    count = -(-(before + series.periods()) // 7)
+    columns = {}
+    for name, column in series.columns.items():
+        weeks = np.full(count * 7, np.nan)
+        weeks[before:before + len(column)] = column
+        weeks = weeks.reshape(count, 7)
+        present = ~np.isnan(weeks)
+        if name in SUMMED:
+            values = np.nansum(weeks, axis=1)
+        else:
+            last = 6 - np.argmax(present[:, ::-1], axis=1)
+            values = weeks[np.arange(count), last]
+        values[~present.any(axis=1)] = np.nan
+        columns[name] = values
+    return Series(series.start - before, 7, columns)
+
+def limit_series(series: Series, end: np.datetime64) -> Series:
+    """
+    Keeps the periods of a series that start before a date, for splitting it into pages.
+
+    Arguments:
+    series: The series.
+    end: The first day that is not kept.
+
+    Returns:
+    The series of the periods kept.
+    """
+    count = max(0, -(-(end - series.start).astype(int) // series.step))
+    return Series(series.start, series.step,
+        {name: column[:count] for name, column in series.columns.items()})
+
+def encode_column(values: np.ndarray, delta: bool) -> list:
+    """
+    Converts a series into whole numbers for JSON, with null for missing periods.
+
+    Delta encoding gives the first value and then the change from the value before, which
+    are small numbers that compress well. Missing periods are skipped over, so each value
+    is the change from the last period that had one.
+
+    Arguments:
+    values: The values of the series.
+    delta: Whether to delta encode the values.
+
+    Returns:
+    A list of the numbers, with None for missing periods.
+    """
+    present = ~np.isnan(values)
+    numbers = values[present].astype(np.int64)
+    if delta:
+        numbers = np.diff(numbers, prepend=0)
+    encoded = [None] * len(values)
+    for position, number in zip(np.flatnonzero(present).tolist(), numbers.tolist()):
+        encoded[position] = number
+    return encoded
+
+def decode_column(encoded: list) -> list:
+    """
+    Reverses the delta encoding of encode_column.
+
+    Arguments:
+    encoded: The delta encoded numbers, with None for missing periods.
+
+    Returns:
+    A list of the numbers, with None for missing periods.
+    """
+    total = 0
+    decoded = []
+    for number in encoded:
+        if number is not None:
+            total += number
+        decoded.append(None if number is None else total)
+    return decoded
+
+def encode_series(series: Series, delta: bool) -> dict:
+    """
+    Converts a series into a dictionary that can be sent as JSON.
+
+    Arguments:
+    series: The series.
+    delta: Whether to delta encode the values.
+
+    Returns:
+    A dictionary of the first date, the number of days in each period and the numbers of
+    each series.
+    """
+    return dict({"start": str(series.start), "step": series.step},
+        **{name: encode_column(column, delta) for name, column in series.columns.items()})
@@ -0,0 +1,225 @@
+"""
+This module caches the dashboard data so the APIs are not requested on every page view.
+"""
+import logging
+import secrets
+import threading
+import time
+from typing import Callable
+
+
+class SnapshotCache:
+    """
+    Holds the latest snapshot of the dashboard data, which is refreshed every TTL seconds.
+
+    The refreshes happen on a background thread while the old snapshot is still served, so only
+    the very first request ever has to wait for the APIs. Scheduled updates can also
+    replace parts of the snapshot, and each new snapshot is given the next version number under
+    its "version" key. The "changed" key holds the version each part last changed in, and the
+    listeners are called with the old and new snapshot whenever it is replaced.
+
+    The versions start again from 0 when the process restarts, so each snapshot also has the
+    random "epoch" of the cache that made it. A version is only comparable with versions of the
+    same epoch.
+
+    Arguments:
+    loader: The function that requests and processes the data for a new snapshot.
+    ttl: The number of seconds a snapshot is fresh for.
+    required: The parts a snapshot must have before it is served, so a snapshot made by
+    replacing only some parts before the first refresh is not served.
+    """
+
+    def __init__(self, loader: Callable[[], dict], ttl: float, required: tuple = ()) -> None:
+        self.loader = loader
+        self.ttl = ttl
+        self.required = tuple(required)
+        self.snapshot = None
+        self.fetched_at = 0.0
+        self.refreshing = False
+        self.version = 0
+        self.epoch = secrets.token_hex(4) # a new one each time the process starts
+        self.ready = threading.Event() # set once there is a snapshot with the required parts
+        self.listeners = []
+        self.lock = threading.RLock() # re-entrant so the first load can refresh while holding it
+        self.stats = {
+            "hits": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "last_refresh_seconds": None,
+            "total_refresh_seconds": 0.0,
+        }
+
+    def peek(self) -> dict:
+        """
+        Returns the current snapshot without ever requesting the APIs.
+
+        Returns:
+        The snapshot, or None if the first one has not been loaded yet.
+        """
+        with self.lock:
+            return self.snapshot
+
+    def record_hit(self) -> None:
+        """
+        Counts a request served from the snapshot, which is only done for requests rather than
+        for every time the snapshot is read.
+        """
+        with self.lock:
+            self.stats["hits"] += 1
+
+    def wait(self, timeout: float = None) -> dict:
+        """
+        Waits for the first snapshot to be loaded.
+
+        Arguments:
+        timeout: The number of seconds to wait for, or None to wait until it is loaded.
+
+        Returns:
+        The snapshot, or None if one with the required parts was not loaded in time.
+        """
+        if not self.ready.wait(timeout):
+            return None
+        return self.peek()
+
+    def update(self, **parts) -> None:
+        """
+        Replaces parts of the snapshot with a new snapshot, leaving the rest as it was.
+
+        Arguments:
+        parts: The parts of the snapshot to replace, by name.
+        """
+        with self.lock:
+            self.swap(parts)
+
+    def add_listener(self, listener: Callable[[dict, dict], None]) -> None:
+        """
+        Adds a function that is called with the old and new snapshot every time it is replaced.
+
+        Arguments:
+        listener: The function, which is given None as the old snapshot the first time.
+        """
+        with self.lock:
+            self.listeners.append(listener)
+
+    def swap(self, parts: dict) -> None:
+        """
+        Swaps in a new snapshot made of the current one with some of its parts replaced.
+        The caller must hold the lock.
+
+        Arguments:
+        parts: The parts of the snapshot to replace, by name.
+
+        Parameters:
+        changed: The version each part of the snapshot last changed in.
+        """
+        old_snapshot = self.snapshot
+        self.version += 1
+        changed = dict(old_snapshot["changed"]) if old_snapshot else {}
+        for name, value in parts.items():
+            if old_snapshot is None or old_snapshot.get(name) != value:
+                changed[name] = self.version
+        self.snapshot = {**(old_snapshot or {}), **parts,
+            "version": self.version, "changed": changed,
+            "epoch": self.epoch} # readers keep the old one
+        self.check_ready()
+        self.notify(old_snapshot)
+
+    def replace(self, snapshot: dict) -> None:
+        """
+        Replaces the whole snapshot with one made somewhere else, such as by another worker
+        process, keeping its version and epoch.
+
+        Arguments:
+        snapshot: The new snapshot, with its "version", "changed" and "epoch" keys.
+        """
+        with self.lock:
+            old_snapshot = self.snapshot
+            self.snapshot = snapshot
+            self.version = snapshot["version"]
+            self.epoch = snapshot.get("epoch", self.epoch)
+            self.fetched_at = time.monotonic()
+            self.check_ready()
+            self.notify(old_snapshot)
+
+    def check_ready(self) -> None:
+        """
+        Marks the cache as ready once the snapshot has all the required parts. The caller must
+        hold the lock.
+        """
+        if all(part in self.snapshot for part in self.required):
+            self.ready.set()
+
+    def notify(self, old_snapshot: dict) -> None:
+        """
+        Calls the listeners with the old and new snapshot. The caller must hold the lock.
+
+        Arguments:
+        old_snapshot: The snapshot before the change.
+        """
+        for listener in self.listeners:
+            try:
+                listener(old_snapshot, self.snapshot)
+            except Exception: # a listener failing must not stop the snapshot changing
+                logging.exception("A dashboard snapshot listener failed.")
+
+    def refresh_in_background(self) -> None:
+        """
+        Starts a refresh on a thread of its own, unless one is already running, so the caller
+        is not held up by the APIs.
+        """
+        with self.lock:
+            if self.refreshing: # only one refresh runs at a time
+                return
+            self.refreshing = True
+        threading.Thread(target=self.refresh_logged, daemon=True).start()
+
+    def refresh_logged(self) -> None:
+        """
+        Refreshes the snapshot on a background thread, where a failure has nowhere to be raised
+        to and has already been logged by refresh.
+        """
+        try:
+            self.refresh()
+        except Exception: # the first refresh raises its error, which is logged already
+            pass
+
+    def refresh(self) -> None:
+        """
+        Requests a new snapshot from the loader and stores it with the time it took.
+        """
+        start = time.perf_counter()
+        try:
+            snapshot = self.loader()
+        except Exception: # keeps serving the old snapshot if the APIs fail
+            logging.exception("The dashboard data could not be refreshed.")
+            with self.lock:
+                self.refreshing = False
+                self.stats["refresh_failures"] += 1
+            if self.snapshot is None:
+                raise
+            return
+        duration = time.perf_counter() - start
+        with self.lock:
+            self.swap(snapshot)
+            self.fetched_at = time.monotonic()
+            self.refreshing = False
+            self.stats["refreshes"] += 1
+            self.stats["last_refresh_seconds"] = duration
+            self.stats["total_refresh_seconds"] += duration
+        logging.info("The dashboard data was refreshed in %.3f seconds.", duration)
+
+    def statistics(self) -> dict:
+        """
+        Returns the hit and refresh counts and timings of the cache.
+
+        Returns:
+        A dictionary of the cache statistics.
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["ttl"] = self.ttl
+            stats["age"] = (time.monotonic() - self.fetched_at
+                if self.snapshot is not None else None)
+            stats["refreshing"] = self.refreshing
+            stats["version"] = self.version
+        return stats
@@ -0,0 +1,21 @@
+"""
+This module reads config.json once for all the modules that need it.
+"""
+import json
+from functools import lru_cache
+
+CONFIG_PATH = "config.json"
+
+@lru_cache(maxsize=None)
+def load_config(path: str = CONFIG_PATH) -> dict:
+    """
+    Reads the config file, which is only opened the first time.
+
+    Arguments:
+    path: The path of the config file.
+
+    Returns:
+    The settings in the config file.
+    """
+    with open(path, "r", encoding="utf-8") as information:
+        return json.load(information)
@@ -0,0 +1,83 @@
+"""
+This module sets up the logging so log records are written to a rotating file on a background thread.
+"""
+import atexit
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+FORMAT = '%(levelname)s: %(asctime)s: %(message)s' # format of the logging
+RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each log record as one line of JSON, including any extra fields given to it, such as
+    the details of a request.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Formats a log record.
+
+        Arguments:
+        record: The log record.
+
+        Parameters:
+        entry: The fields of the record that are written out.
+
+        Returns:
+        The record as JSON.
+        """
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage()
+        }
+        entry.update((key, value) for key, value in vars(record).items()
+            if key not in RECORD_FIELDS)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def setup_logging(path: str, level: str = "INFO", max_bytes: int = 1048576, backups: int = 3,
+    structured: bool = False, background: bool = True,
+    logger: logging.Logger = None) -> QueueListener:
+    """
+    Sends the logging to a file that is rotated once it reaches a size, so it cannot keep growing.
+
+    When it is written in the background, logging only puts the record on a queue and a
+    separate thread writes it to the file, so slow disks do not hold up the requests.
+
+    Arguments:
+    path: The path of the log file.
+    level: The lowest level that is logged, such as DEBUG or INFO.
+    max_bytes: The size the file is rotated at.
+    backups: The number of old log files kept.
+    structured: Whether each record is written as a line of JSON rather than as text.
+    background: Whether the file is written on a background thread.
+    logger: The logger to set up, which is the root logger if not given.
+
+    Parameters:
+    file_handler: The handler that writes to the file.
+
+    Returns:
+    The listener writing the queued records to the file, or None if they are written directly.
+    """
+    logger = logger or logging.getLogger()
+    file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+        encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter() if structured else logging.Formatter(FORMAT))
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+        handler.close()
+    logger.setLevel(level)
+    if not background:
+        logger.addHandler(file_handler)
+        return None
+    records = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(records))
+    listener = QueueListener(records, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop) # writes out anything still queued when the program exits
+    return listener
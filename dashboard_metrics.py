@@ -0,0 +1,129 @@
+"""
+This module times the slow parts of the dashboard and shows the timings in the Prometheus text format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) # upper bounds in seconds
+
+class Histogram:
+    """
+    Counts how many timings fell into each bucket, along with their total and number.
+    """
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Adds a timing to the histogram. The caller must hold the metrics lock.
+
+        Arguments:
+        seconds: The time taken.
+        """
+        for position, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[position] += 1
+                break
+        self.total += seconds
+        self.count += 1
+
+metrics_lock = threading.Lock()
+operation_seconds = {} # the histogram of each timed operation, by name
+operation_errors = {} # the number of times each timed operation raised an exception, by name
+request_seconds = {} # the histogram of each flask endpoint, by name
+
+def observe(histograms: dict, name: str, seconds: float) -> None:
+    """
+    Adds a timing to the histogram with the given name, creating it the first time.
+
+    Arguments:
+    histograms: The histograms the timing belongs to.
+    name: The name of the operation or endpoint.
+    seconds: The time taken.
+    """
+    with metrics_lock:
+        if name not in histograms:
+            histograms[name] = Histogram()
+        histograms[name].observe(seconds)
+
+@contextmanager
+def timer(operation: str):
+    """
+    Times the code inside the with block as the given operation, counting it as an error if it raises.
+
+    Arguments:
+    operation: The name of the operation.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        with metrics_lock:
+            operation_errors[operation] = operation_errors.get(operation, 0) + 1
+        raise
+    finally:
+        observe(operation_seconds, operation, time.perf_counter() - start)
+
+def timed(operation: str) -> Callable:
+    """
+    Decorates a function so every call to it is timed as the given operation.
+
+    Arguments:
+    operation: The name of the operation.
+
+    Returns:
+    The decorator.
+    """
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            with timer(operation):
+                return function(*args, **kwargs)
+        return timed_function
+    return decorator
+
+def render_metrics(gauges: dict = None) -> str:
+    """
+    Writes out all the histograms and counters in the Prometheus text format.
+
+    Arguments:
+    gauges: Any other values to include, as a dictionary of name to (help text, value).
+
+    Returns:
+    The metrics as text.
+    """
+    lines = []
+    with metrics_lock:
+        for metric, label, histograms, description in (
+            ("dashboard_operation_seconds", "operation", operation_seconds,
+                "Time spent in each slow operation of the dashboard."),
+            ("dashboard_request_seconds", "endpoint", request_seconds,
+                "Time spent answering each kind of request.")):
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, histogram in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.buckets):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {histogram.total}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {histogram.count}')
+        lines.append("# HELP dashboard_operation_errors_total "
+            "Number of times each operation raised an exception.")
+        lines.append("# TYPE dashboard_operation_errors_total counter")
+        for name, count in sorted(operation_errors.items()):
+            lines.append(f'dashboard_operation_errors_total{{operation="{name}"}} {count}')
+    for name, (description, value) in (gauges or {}).items():
+        if value is None:
+            continue
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {float(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,279 @@
+"""
+This module ranks the news by how relevant it is to the covid terms and the city, showing each story only once.
+"""
+import heapq
+import math
+import random
+import re
+import zlib
+
+WORD = re.compile(r"[a-z0-9]+") # the words that are indexed, after lowercasing
+TITLE_WEIGHT = 2 # a word in the title counts as much as this many in the description
+K1 = 1.2 # how quickly repeating a word stops adding to the score
+B = 0.75 # how much longer articles are marked down
+SIGNATURE_SIZE = 32 # the number of hashes in the MinHash signature of each title
+BANDS = 8 # the signature is split into this many bands, and titles sharing a band are compared
+DUPLICATE_SIMILARITY = 0.6 # titles estimated to share this fraction of words are the same story
+PRIME = (1 << 61) - 1
+
+def permutations(count: int, seed: int = 0) -> list:
+    """
+    Draws the random hash functions of the MinHash signature, the same in every process,
+    unlike hash().
+
+    Arguments:
+    count: The number of hash functions.
+    seed: The seed of the random numbers.
+
+    Returns:
+    A list of the multiplier and offset of each hash function, all drawn from one generator
+    so no two are related.
+    """
+    generator = random.Random(seed)
+    return [(generator.randrange(1, PRIME), generator.randrange(PRIME)) for _ in range(count)]
+
+PERMUTATIONS = permutations(SIGNATURE_SIZE)
+
+def words(text: str) -> list:
+    """
+    Splits text into the lowercase words that are indexed.
+
+    Arguments:
+    text: The text, or None.
+
+    Returns:
+    A list of the words.
+    """
+    return WORD.findall(text.lower()) if text else []
+
+def minhash(title: str, source: str = None) -> tuple:
+    """
+    Works out the MinHash signature of a title, whose positions agree with another title's
+    about as often as the two titles share words. The name of the source that the news API
+    puts at the end of titles, such as " - BBC News", is left out.
+
+    Arguments:
+    title: The title.
+    source: The name of the source of the article, or None if it is not known.
+
+    Parameters:
+    headline: The title without the name of the source.
+    hashes: The hash of each different word of the title.
+
+    Returns:
+    A tuple of SIGNATURE_SIZE hashes.
+    """
+    headline = title
+    if source and title.endswith(f" - {source}"):
+        headline = title[:-len(f" - {source}")]
+    hashes = {zlib.crc32(word.encode("utf-8")) for word in words(headline) or [title]}
+    return tuple(min((a * value + b) % PRIME for value in hashes) for a, b in PERMUTATIONS)
+
+class NewsIndex:
+    """
+    An inverted index of the words in the news that is kept up to date as articles are added
+    and removed, so the news can be ranked without reading every article again.
+
+    Articles are scored with BM25 against the query words, counting words in the title more
+    than words in the description. Articles whose titles are near duplicates, such as the same
+    story syndicated by different papers, are put in the same cluster by comparing their MinHash
+    signatures, and only the best scoring article of each cluster is shown.
+
+    Arguments:
+    query: The text the news is ranked against, such as the covid terms and the city.
+    """
+
+    def __init__(self, query: str) -> None:
+        self.query = set(words(query))
+        self.postings = {} # each word, to the weighted count of it in each article it is in
+        self.lengths = {} # the weighted number of words in each article, by title
+        self.article_words = {} # the different words of each article, for removing it
+        self.total_length = 0
+        self.order = {} # the number of each article, in the order they were added
+        self.added = 0
+        self.buckets = {} # each band of a signature, to the titles whose signature has it
+        self.signatures = {}
+        self.clusters = {} # each cluster number, to the titles in it
+        self.cluster_of = {}
+        self.next_cluster = 0
+        self.version = 0
+        self.ranked = (None, None, []) # the version and number of the last ranking, and the ranking
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __contains__(self, title: str) -> bool:
+        return title in self.lengths
+
+    def add(self, title: str, content: str, source: str = None) -> None:
+        """
+        Adds an article to the index and to the cluster of any article with a similar title.
+
+        Arguments:
+        title: The title of the article, which must not already be in the index.
+        content: The description of the article.
+        source: The name of the source of the article, or None if it is not known.
+
+        Parameters:
+        counts: The weighted count of each word in the article.
+        signature: The MinHash signature of the title.
+        """
+        counts = {}
+        for word in words(title):
+            counts[word] = counts.get(word, 0) + TITLE_WEIGHT
+        for word in words(content):
+            counts[word] = counts.get(word, 0) + 1
+        for word, count in counts.items():
+            self.postings.setdefault(word, {})[title] = count
+        self.article_words[title] = tuple(counts)
+        self.lengths[title] = sum(counts.values())
+        self.total_length += self.lengths[title]
+        self.order[title] = self.added
+        self.added += 1
+        signature = minhash(title, source)
+        self.signatures[title] = signature
+        cluster = self.find_cluster(signature)
+        if cluster is None:
+            cluster = self.next_cluster
+            self.next_cluster += 1
+            self.clusters[cluster] = []
+        self.clusters[cluster].append(title)
+        self.cluster_of[title] = cluster
+        for band in self.bands(signature):
+            self.buckets.setdefault(band, set()).add(title)
+        self.version += 1
+
+    def remove(self, title: str) -> None:
+        """
+        Removes an article from the index, if it is in it.
+
+        Arguments:
+        title: The title of the article.
+        """
+        if title not in self.lengths:
+            return
+        for word in self.article_words.pop(title):
+            postings = self.postings[word]
+            del postings[title]
+            if not postings:
+                del self.postings[word]
+        self.total_length -= self.lengths.pop(title)
+        del self.order[title]
+        signature = self.signatures.pop(title)
+        for band in self.bands(signature):
+            self.buckets[band].discard(title)
+            if not self.buckets[band]:
+                del self.buckets[band]
+        cluster = self.cluster_of.pop(title)
+        self.clusters[cluster].remove(title)
+        if not self.clusters[cluster]:
+            del self.clusters[cluster]
+        self.version += 1
+
+    def cluster(self, title: str) -> list:
+        """
+        Finds the articles that are the same story as an article.
+
+        Arguments:
+        title: The title of the article.
+
+        Returns:
+        A list of the titles in its cluster, including itself, or an empty list if it is not
+        in the index.
+        """
+        if title not in self.cluster_of:
+            return []
+        return list(self.clusters[self.cluster_of[title]])
+
+    def find_cluster(self, signature: tuple) -> int:
+        """
+        Finds the cluster of the most similar article whose title is a near duplicate.
+
+        Only the articles sharing a band of the signature are compared, so adding an article
+        does not compare it with every other one.
+
+        Arguments:
+        signature: The MinHash signature of the new title.
+
+        Parameters:
+        candidates: The titles sharing at least one band of the signature.
+
+        Returns:
+        The number of the cluster, or None if no title is similar enough.
+        """
+        candidates = set()
+        for band in self.bands(signature):
+            candidates.update(self.buckets.get(band, ()))
+        best, best_similarity = None, DUPLICATE_SIMILARITY
+        for candidate in candidates:
+            similarity = sum(mine == theirs for mine, theirs
+                in zip(signature, self.signatures[candidate])) / SIGNATURE_SIZE
+            if similarity >= best_similarity:
+                best, best_similarity = self.cluster_of[candidate], similarity
+        return best
+
+    @staticmethod
+    def bands(signature: tuple) -> list:
+        """
+        Splits a signature into its bands.
+
+        Arguments:
+        signature: The MinHash signature.
+
+        Returns:
+        A list of the position and hashes of each band.
+        """
+        rows = SIGNATURE_SIZE // BANDS
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+
+    def scores(self) -> dict:
+        """
+        Scores the articles that contain any of the query words with BM25.
+
+        Parameters:
+        average_length: The average weighted number of words in an article.
+
+        Returns:
+        A dictionary of the score of each article that has one, by title.
+        """
+        scores = {}
+        if not self.lengths:
+            return scores
+        average_length = self.total_length / len(self.lengths)
+        for word in self.query:
+            postings = self.postings.get(word, {})
+            idf = math.log(1 + (len(self.lengths) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for title, count in postings.items():
+                norm = K1 * (1 - B + B * self.lengths[title] / average_length)
+                scores[title] = scores.get(title, 0) + idf * count * (K1 + 1) / (count + norm)
+        return scores
+
+    def top(self, count: int = None) -> list:
+        """
+        Ranks the news, showing one article from each cluster.
+
+        The ranking is only worked out again after the index has changed, so asking for it
+        again costs nothing.
+
+        Arguments:
+        count: The number of articles wanted, or None for every cluster.
+
+        Parameters:
+        best: The best article of each cluster with its sort key.
+
+        Returns:
+        A list of the titles, most relevant first, with articles of equal relevance in the
+        order they were added.
+        """
+        version, ranked_count, ranked = self.ranked
+        if version == self.version and ranked_count == count:
+            return list(ranked)
+        scores = self.scores()
+        best = [min(((-scores.get(title, 0), self.order[title]), title) for title in titles)
+            for titles in self.clusters.values()]
+        if count is None:
+            ranked = [title for _, title in sorted(best)]
+        else:
+            ranked = [title for _, title in heapq.nsmallest(count, best)]
+        self.ranked = (self.version, count, ranked)
+        return list(ranked)
@@ -0,0 +1,190 @@
+"""
+This module shares the dashboard between the worker processes of a production server, so only one of them requests the APIs.
+"""
+import fcntl
+import json
+import os
+import sqlite3
+import time
+
+class SharedState:
+    """
+    A SQLite database holding the dashboard snapshot, the scheduled updates, the news received
+    and the changes asked for by the workers, with a lock file that makes one worker the leader.
+
+    The leader is the only worker that runs the scheduler and requests the APIs. It saves every
+    new snapshot, list of scheduled updates and news received for the others to read, and
+    carries out the
+    changes, such as scheduling an update or deleting news, that the others ask for.
+
+    Arguments:
+    path: The path of the SQLite database file, which also names the lock file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock_file = None # held open for as long as this worker is the leader
+        self.created = False
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Opens a connection to the database, creating the tables the first time.
+
+        Returns:
+        The connection.
+        """
+        connection = sqlite3.connect(self.path, timeout=10)
+        if not self.created:
+            connection.execute("PRAGMA journal_mode=WAL") # readers do not wait for the leader
+            connection.executescript(
+                "CREATE TABLE IF NOT EXISTS snapshot ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER, data TEXT);"
+                "CREATE TABLE IF NOT EXISTS updates ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER, data TEXT);"
+                "CREATE TABLE IF NOT EXISTS news ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER, data TEXT);"
+                "CREATE TABLE IF NOT EXISTS commands ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+                "arguments TEXT NOT NULL, applied INTEGER NOT NULL DEFAULT 0);")
+            connection.commit()
+            self.created = True
+        return connection
+
+    def try_to_lead(self) -> bool:
+        """
+        Tries to become the leader, which only one process can be until it exits.
+
+        Returns:
+        Whether this process is the leader.
+        """
+        if self.lock_file is not None:
+            return True
+        lock_file = open(f"{self.path}.lock", "w", encoding="utf-8")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError: # another worker is the leader
+            lock_file.close()
+            return False
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self.lock_file = lock_file
+        return True
+
+    def is_leader(self) -> bool:
+        """
+        Returns whether this process is the leader.
+
+        Returns:
+        Whether this process holds the lock.
+        """
+        return self.lock_file is not None
+
+    def save(self, table: str, version: int, data) -> None:
+        """
+        Saves the snapshot, the scheduled updates or the news received.
+
+        Arguments:
+        table: Either "snapshot", "updates" or "news".
+        version: The version of the data.
+        data: The data, which must be able to be saved as JSON.
+        """
+        connection = self.connect()
+        try:
+            connection.execute(f"INSERT OR REPLACE INTO {table} VALUES (0, ?, ?)",
+                (version, json.dumps(data)))
+            connection.commit()
+        finally:
+            connection.close()
+
+    def load(self, table: str, since: int):
+        """
+        Loads the snapshot, the scheduled updates or the news received if they are newer than a
+        version.
+
+        Arguments:
+        table: Either "snapshot", "updates" or "news".
+        since: The version already held.
+
+        Returns:
+        The version and data, or None if there is nothing newer.
+        """
+        connection = self.connect()
+        try:
+            row = connection.execute(f"SELECT version, data FROM {table} WHERE version > ?",
+                (since,)).fetchone()
+        finally:
+            connection.close()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def submit(self, name: str, arguments: dict) -> int:
+        """
+        Asks the leader to make a change.
+
+        Arguments:
+        name: The name of the change.
+        arguments: The keyword arguments of the change.
+
+        Returns:
+        The number of the change, for waiting on it.
+        """
+        connection = self.connect()
+        try:
+            cursor = connection.execute("INSERT INTO commands (name, arguments) VALUES (?, ?)",
+                (name, json.dumps(arguments)))
+            connection.commit()
+            return cursor.lastrowid
+        finally:
+            connection.close()
+
+    def wait_for(self, command: int, timeout: float) -> bool:
+        """
+        Waits for the leader to make a change.
+
+        Arguments:
+        command: The number of the change.
+        timeout: The most seconds to wait.
+
+        Returns:
+        Whether the change was made in time.
+        """
+        end = time.monotonic() + timeout
+        while True:
+            connection = self.connect()
+            try:
+                row = connection.execute("SELECT applied FROM commands WHERE id = ?",
+                    (command,)).fetchone()
+            finally:
+                connection.close()
+            if row is None or row[0] or time.monotonic() >= end:
+                return row is None or bool(row[0])
+            time.sleep(0.05)
+
+    def take_commands(self) -> list:
+        """
+        Takes the changes that have not been made yet, oldest first.
+
+        Returns:
+        A list of the number, name and keyword arguments of each change.
+        """
+        connection = self.connect()
+        try:
+            return [(command, name, json.loads(arguments)) for command, name, arguments
+                in connection.execute(
+                    "SELECT id, name, arguments FROM commands WHERE applied = 0 ORDER BY id")]
+        finally:
+            connection.close()
+
+    def mark_done(self, command: int) -> None:
+        """
+        Marks a change as made, forgetting the changes made before it.
+
+        Arguments:
+        command: The number of the change.
+        """
+        connection = self.connect()
+        try:
+            connection.execute("UPDATE commands SET applied = 1 WHERE id = ?", (command,))
+            connection.execute("DELETE FROM commands WHERE applied = 1 AND id < ?", (command,))
+            connection.commit()
+        finally:
+            connection.close()
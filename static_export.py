@@ -0,0 +1,60 @@
+"""
+This module writes the exported dashboard to a directory that is swapped in all at once, so a static file server never serves half an export.
+"""
+import os
+import re
+import shutil
+import time
+
+def area_slug(area: str) -> str:
+    """
+    Turns the name of an area into a file name that needs no escaping in a url.
+
+    Arguments:
+    area: The name of the area, such as "Bristol, City of".
+
+    Returns:
+    The lowercase letters and numbers of the name joined by dashes, such as "bristol-city-of".
+    """
+    return re.sub(r"[^a-z0-9]+", "-", area.lower()).strip("-")
+
+def export_files(path: str, files: dict) -> str:
+    """
+    Writes files to a new directory, then points path at it in one step.
+
+    path is a symbolic link to the latest export. The files are written to a new directory
+    beside it, and a new link is renamed over the old one, which is atomic, so readers see
+    either the whole of the old export or the whole of the new one. The old directory is
+    then deleted.
+
+    Arguments:
+    path: The path the export is served from, which must not exist or be a link made by an
+    earlier export.
+    files: The contents of each file in bytes, by its path relative to the export.
+
+    Parameters:
+    export: The new directory the files are written to.
+    previous: The directory of the last export, if there was one.
+
+    Returns:
+    The directory the files were written to.
+
+    Raises:
+    FileExistsError: If path exists and is not a symbolic link.
+    """
+    path = os.path.abspath(path)
+    if os.path.exists(path) and not os.path.islink(path):
+        raise FileExistsError(f"{path} is not a link made by an earlier export.")
+    export = f"{os.path.dirname(path)}/.{os.path.basename(path)}-{time.time_ns()}"
+    for name, contents in files.items():
+        file_path = os.path.join(export, name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as export_file:
+            export_file.write(contents)
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    os.symlink(os.path.basename(export), f"{export}.link") # relative, so the folder can move
+    os.replace(f"{export}.link", path)
+    if previous is not None and os.path.basename(previous).startswith(
+        f".{os.path.basename(path)}-"): # only deletes directories made by an export
+        shutil.rmtree(previous, ignore_errors=True)
+    return export
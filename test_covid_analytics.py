@@ -0,0 +1,33 @@
+import math
+import numpy as np
+from covid_analytics import load_series, load_csv_series, rolling_sum, week_on_week_growth
+from covid_analytics import doubling_time, trends
+
+def test_load_csv_series():
+    series = load_csv_series('nation_2021-10-28.csv')
+    assert len(series.dates) == 638
+    assert str(series.dates[-1]) == "2021-10-28"
+    assert series.hospital_cases[-1] == 7_019
+
+def test_load_series_fills_missing_days():
+    series = load_series([{"date": "2021-10-03", "newCasesBySpecimenDate": 3},
+        {"date": "2021-10-01", "newCasesBySpecimenDate": 1}])
+    assert len(series.dates) == 3
+    assert math.isnan(series.new_cases[1])
+
+def test_rolling_sum():
+    values = np.arange(1, 11, dtype=float)
+    totals = rolling_sum(values, 7)
+    assert math.isnan(totals[5])
+    assert totals[6] == sum(range(1, 8))
+    assert totals[9] == sum(range(4, 11))
+
+def test_last7days_cases_trend():
+    table = trends(load_csv_series('nation_2021-10-28.csv'))
+    assert table["cases_7day"][-3] == 240_299 # matches process_covid_csv_data
+
+def test_doubling_time():
+    values = np.array([1.0] * 7 + [2.0] * 7)
+    assert week_on_week_growth(values)[-1] == 1.0
+    assert doubling_time(values)[-1] == 7.0
+    assert math.isnan(doubling_time(values[::-1])[-1])
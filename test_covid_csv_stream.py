@@ -0,0 +1,21 @@
+from covid_csv_stream import stream_csv_columns, process_covid_csv_file, MISSING
+
+def test_process_covid_csv_file():
+    last7days_cases, current_hospital_cases, total_deaths = \
+        process_covid_csv_file('nation_2021-10-28.csv')
+    assert last7days_cases == 240_299
+    assert current_hospital_cases == 7_019
+    assert total_deaths == 141_544
+
+def test_stream_csv_columns_chunks():
+    chunks = list(stream_csv_columns('nation_2021-10-28.csv', chunk_rows=100))
+    assert len(chunks) == 7
+    assert sum(len(chunk[0]) for chunk in chunks) == 638
+    assert chunks[0][1][0] == MISSING # the newest day has no cases yet
+
+def test_stream_csv_columns_area(tmp_path):
+    csv_file = tmp_path / "ltla.csv"
+    csv_file.write_text("areaName,current_date,newCasesBySpecimenDate,hospitalCases,"
+        "cumDailyNsoDeathsByDeathDate\nExeter,2021-10-28,5,,\nLeeds,2021-10-28,7,,\n")
+    chunks = list(stream_csv_columns(str(csv_file), area_name="Leeds"))
+    assert list(chunks[0][1]) == [7]
@@ -1,4 +1,10 @@
+import gzip
+import json
 import logging
+import os
+import time
+from unittest.mock import patch
+from datetime import datetime, timedelta
 from covid_data_handler import parse_csv_data
 from covid_data_handler import process_covid_csv_data
 from covid_data_handler import covid_API_request
@@ -6,6 +12,22 @@ from covid_data_handler import schedule_covid_updates
 from covid_data_handler import add_scheduled_event
 from covid_data_handler import process_covid_data
 from covid_data_handler import hhmm_to_seconds
+from covid_data_handler import index_by_date
+from covid_data_handler import process_areas_covid_data
+from covid_data_handler import app, city, dashboard_cache, load_dashboard_data
+from shared_state import SharedState
+from dashboard_cache import SnapshotCache
+from covid_data_store import CovidDataStore
+from covid_data_handler import load_saved_data
+from covid_data_handler import export_static
+from covid_data_handler import update_data
+from covid_data_handler import news_since
+from covid_data_handler import areas_missing_history
+from covid_data_handler import publish_news, load_shared_news, follow_leader
+from covid_data_handler import configure_logging
+from covid_data_handler import daily_schedule
+from covid_data_handler import scheduler
+from covid_data_handler import COVID_PARTS
 
 LOGGER = logging.getLogger(__name__)
 
@@ -28,6 +50,22 @@ def test_covid_API_request():
 def test_schedule_covid_updates():
     schedule_covid_updates(update_interval=10, update_name='update test', repeat='', updating_covid='',updating_news='')
 
+def test_repeating_updates_keep_their_time_of_day():
+    schedule_covid_updates(update_interval="08:05", update_name='daily test', repeat='repeat',
+        updating_covid='covid-data', updating_news='')
+    title = 'daily test | Repeating | Updating Covid Data'
+    assert scheduler.updates[title].cron.expression == "5 8 * * *"
+    scheduler.cancel(title)
+    try:
+        with patch.dict(os.environ, {"TZ": "Europe/London"}):
+            time.tzset()
+            before = datetime(2021, 3, 27, 8, 5) # the clocks go forward the next night
+            after = daily_schedule("08:05").next_after(before)
+            assert after == datetime(2021, 3, 28, 8, 5)
+            assert after.timestamp() - before.timestamp() == 23 * 3600
+    finally:
+        time.tzset() # back to the time zone from before
+
 def test_add_scheduled_event(caplog):
     caplog.set_level(logging.DEBUG)
     add_scheduled_event("00:00","Scheduled Update")
@@ -44,6 +82,320 @@ def test_process_covid_data():
     assert current_hospital_cases > 0
     assert total_deaths > 0
 
+def test_index_by_date():
+    rows = [{"date": "2021-10-28", "newCasesBySpecimenDate": 1},
+        {"date": "2021-10-27", "newCasesBySpecimenDate": 2}]
+    data = index_by_date(rows)
+    assert data["2021-10-27"]["newCasesBySpecimenDate"] == 2
+
+def test_process_covid_data_offline():
+    rows = []
+    for day in range(30):
+        rows.append({"date": (datetime.now() - timedelta(day)).strftime("%Y-%m-%d"),
+            "newCasesBySpecimenDate": day,
+            "hospitalCases": 100 + day,
+            "cumDailyNsoDeathsByDeathDate": 1000 + day})
+    api_data = {"local": {"data": rows}, "national": {"data": rows}}
+    (local_last7days_cases,
+    national_last7days_cases,
+    current_hospital_cases,
+    total_deaths) = process_covid_data(api_data)
+    assert local_last7days_cases == sum(range(4, 11))
+    assert national_last7days_cases == sum(range(4, 11))
+    assert current_hospital_cases == 102
+    assert total_deaths == 1014
+
+def test_process_covid_data_missing_days():
+    rows = []
+    for day in range(4, 30):
+        rows.append({"date": (datetime.now() - timedelta(day)).strftime("%Y-%m-%d"),
+            "newCasesBySpecimenDate": None if day == 5 else day,
+            "hospitalCases": 100 + day,
+            "cumDailyNsoDeathsByDeathDate": None})
+    api_data = {"local": {"data": rows}, "national": {"data": rows}}
+    (_, national_last7days_cases,
+    current_hospital_cases,
+    total_deaths) = process_covid_data(api_data)
+    assert national_last7days_cases == sum(range(4, 11)) - 5
+    assert current_hospital_cases == 104
+    assert total_deaths is None
+
+def test_process_areas_covid_data():
+    areas_data = {}
+    for area, cases in (("Exeter", 1), ("Leeds", 2)):
+        areas_data[area] = {"data": [{"date": (datetime.now() - timedelta(day)).strftime("%Y-%m-%d"),
+            "newCasesBySpecimenDate": cases} for day in range(30)]}
+    assert process_areas_covid_data(areas_data) == {"Exeter": 7, "Leeds": 14}
+
+def test_index_not_modified():
+    dashboard_cache.update(areas={city: 1}, national_7day_infections=2, hospital_cases=3,
+        deaths_total=4, news=[])
+    client = app.test_client()
+    response = client.get('/index')
+    assert response.status_code == 200
+    assert b"Hospital Cases: 3" in response.data
+    etag = response.headers["ETag"]
+    assert client.get('/index', headers={"If-None-Match": etag}).status_code == 304
+    dashboard_cache.update(hospital_cases=5)
+    response = client.get('/index', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert b"Hospital Cases: 5" in response.data
+    etag = response.headers["ETag"]
+    with patch.object(dashboard_cache, "epoch", "restarted"): # same versions, another process
+        assert client.get('/index', headers={"If-None-Match": etag}).status_code == 200
+
+def test_api_summary_since():
+    dashboard_cache.update(areas={city: 1}, national_7day_infections=2, hospital_cases=3,
+        deaths_total=4, news=[])
+    client = app.test_client()
+    data = client.get('/api/summary').get_json()
+    assert data["summary"]["hospital_cases"] == 3
+    dashboard_cache.update(deaths_total=6)
+    data = client.get(f'/api/summary?since={data["version"]}').get_json()
+    assert data["summary"] == {"deaths_total": 6}
+
+def test_api_news_since():
+    dashboard_cache.update(news=[{"title": "First", "content": ""}])
+    client = app.test_client()
+    data = client.get('/api/news').get_json()
+    assert [article["title"] for article in data["articles"]] == ["First"]
+    dashboard_cache.update(news=[{"title": "Second", "content": ""}])
+    data = client.get(f'/api/news?since={data["version"]}').get_json()
+    assert data["changes"][0]["added"]["title"] == "Second"
+    assert data["changes"][1]["removed"] == "First"
+
+def test_news_since_after_skipped_versions():
+    dashboard_cache.update(news=[{"title": "old", "content": ""}])
+    old = dashboard_cache.peek()
+    version = old["version"]
+    dashboard_cache.replace(dict(old, news=[{"title": "new", "content": ""}],
+        version=version + 2, changed=dict(old["changed"], news=version + 1)))
+    data = news_since(version)
+    assert [article["title"] for article in data["articles"]] == ["new"]
+    assert news_since(version + 2)["changes"] == []
+
+def test_api_since_after_a_restart():
+    dashboard_cache.update(areas={city: 1}, national_7day_infections=2, hospital_cases=3,
+        deaths_total=4, news=[{"title": "Kept", "content": ""}])
+    client = app.test_client()
+    data = client.get('/api/summary').get_json()
+    epoch, ahead = data["epoch"], data["version"] + 100 # held from before a restart
+    data = client.get(f'/api/summary?since={ahead}').get_json()
+    assert data["summary"]["hospital_cases"] == 3
+    data = client.get(f'/api/summary?since={data["version"]}&epoch=old').get_json()
+    assert data["summary"]["hospital_cases"] == 3
+    data = client.get(f'/api/summary?since={data["version"]}&epoch={epoch}').get_json()
+    assert data["summary"] == {}
+    data = client.get(f'/api/news?since={ahead}').get_json()
+    assert [article["title"] for article in data["articles"]] == ["Kept"]
+    updates = client.get('/api/updates').get_json()["version"]
+    assert client.get(f'/api/updates?since={updates + 100}').get_json()["updates"] is not None
+    assert client.get(f'/api/updates?since={updates}&epoch=old').get_json()["updates"] is not None
+    assert client.get(f'/api/updates?since={updates}&epoch={epoch}').get_json()["updates"] is None
+
+def test_areas_missing_history(tmp_path):
+    store = CovidDataStore(str(tmp_path / "covid_data.db"))
+    store.add_rows("ltla", [{"date": f"2021-{month:02}-01", "areaName": "Exeter"}
+        for month in range(1, 11)] + [{"date": "2021-10-01", "areaName": "Leeds"}])
+    with patch("covid_data_handler.data_store", store), \
+        patch("covid_data_handler.areas", ["Exeter", "Leeds", "York"]):
+        assert areas_missing_history() == ["Leeds", "York"]
+    with patch("covid_data_handler.data_store", store), \
+        patch("covid_data_handler.areas", None): # every local authority is served
+        assert areas_missing_history() == ["Leeds"]
+
+def test_covid_API_request_batches_missing_history():
+    calls = []
+    def record(area_type, area_name, structure, full_history=False):
+        calls.append((area_type, area_name, full_history))
+    served = [city] + [f"Area {number}" for number in range(10)]
+    with patch("covid_data_handler.update_covid_store", record), \
+        patch("covid_data_handler.areas_missing_history", lambda: served[1:]), \
+        patch("covid_data_handler.read_covid_store", dict), \
+        patch("covid_data_handler.areas", served):
+        covid_API_request()
+    assert sorted(calls) == [("ltla", None, True), ("overview", "United Kingdom", False)]
+
 def test_hhmm_to_seconds():
     data = hhmm_to_seconds("01:30")
     assert data == 5400
+
+def test_metrics():
+    dashboard_cache.update(areas={city: 1}, national_7day_infections=2, hospital_cases=3,
+        deaths_total=4, news=[])
+    client = app.test_client()
+    hits = dashboard_cache.statistics()["hits"]
+    client.get('/api/summary')
+    assert dashboard_cache.statistics()["hits"] == hits + 1 # once for the request
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'dashboard_request_seconds_count{endpoint="api_summary"}' in text
+    assert "dashboard_snapshot_version" in text
+    assert "stale_hits" not in text
+
+def test_load_dashboard_data_falls_back():
+    dashboard_cache.update(areas={city: 1}, national_7day_infections=2, hospital_cases=3,
+        deaths_total=4, news=[])
+    def failing():
+        raise ConnectionError
+    with patch("covid_data_handler.load_covid_data", failing), \
+        patch("covid_data_handler.update_news", failing):
+        data = load_dashboard_data()
+    assert data["national_7day_infections"] == 2
+    assert data["news"] == []
+
+def test_follower_reads_leader_snapshot(tmp_path):
+    leader = SharedState(str(tmp_path / "state.db"))
+    assert leader.try_to_lead()
+    dashboard_cache.update(news=[])
+    snapshot = dict(dashboard_cache.peek(), hospital_cases=42,
+        version=dashboard_cache.version + 10)
+    leader.save("snapshot", snapshot["version"], snapshot)
+    with patch("covid_data_handler.shared_state", SharedState(str(tmp_path / "state.db"))), \
+        patch("covid_data_handler.last_leader_check", float("inf")):
+        follow_leader() # as the FOLLOW_LEADER update does
+        data = app.test_client().get('/api/summary').get_json()
+    assert data["summary"]["hospital_cases"] == 42
+    assert data["version"] == snapshot["version"]
+
+def test_new_leader_carries_on_with_the_news(tmp_path):
+    shared = SharedState(str(tmp_path / "state.db"))
+    state = {"seen": ["Kept", "Deleted"], "shown": [["Kept", "", None]]}
+    with patch("covid_data_handler.shared_state", shared), \
+        patch("covid_data_handler.news_state", lambda: state):
+        publish_news()
+    loaded = []
+    with patch("covid_data_handler.shared_state", shared), \
+        patch("covid_data_handler.load_news_state", loaded.append):
+        load_shared_news()
+    assert loaded == [state]
+
+def test_workers_log_to_their_own_files():
+    paths = []
+    with patch("covid_data_handler.setup_logging", lambda path, *_, **__: paths.append(path)), \
+        patch("covid_data_handler.logging_path", "logs/system.log"):
+        configure_logging()
+        configure_logging(per_process=True)
+    assert paths == ["logs/system.log", f"logs/system-{os.getpid()}.log"]
+
+def test_load_saved_data(tmp_path):
+    store = CovidDataStore(str(tmp_path / "covid_data.db"))
+    store.add_rows("overview", [{"date": (datetime.now() - timedelta(day)).strftime("%Y-%m-%d"),
+        "areaName": "United Kingdom", "newCasesBySpecimenDate": 1, "hospitalCases": 2,
+        "cumDailyNsoDeathsByDeathDate": 3} for day in range(30)])
+    cache = SnapshotCache(lambda: {}, 300)
+    with patch("covid_data_handler.data_store", store), \
+        patch("covid_data_handler.dashboard_cache", cache):
+        load_saved_data()
+    assert cache.peek()["national_7day_infections"] == 7
+    assert cache.peek()["hospital_cases"] == 2
+
+def test_news_update_before_covid_data():
+    covid = {"areas": {city: 1}, "national_7day_infections": 2, "hospital_cases": 3,
+        "deaths_total": 4}
+    cache = SnapshotCache(lambda: dict(covid, news=[]), 300, required=COVID_PARTS)
+    with patch("covid_data_handler.dashboard_cache", cache), \
+        patch("covid_data_handler.start_automatic_refresh"), \
+        patch("covid_data_handler.upstream_timeouts", {"covid": 0}):
+        cache.update(news=[{"title": "old", "content": ""}])
+        assert app.test_client().get('/api/summary').status_code == 503
+        update_data("update", None, None, "news") # refreshes everything instead
+        assert app.test_client().get('/api/summary').get_json()["summary"]["hospital_cases"] == 3
+
+def test_stream_refused_on_single_threaded_workers():
+    response = app.test_client().get('/stream',
+        environ_overrides={"wsgi.multiprocess": True, "wsgi.multithread": False})
+    assert response.status_code == 204
+
+def test_stream_pushes_changes():
+    dashboard_cache.update(areas={city: 1}, national_7day_infections=2, hospital_cases=3,
+        deaths_total=4, news=[])
+    since = dashboard_cache.version
+    updates = scheduler.version
+    response = app.test_client().get(f'/stream?since={since}&updates_since={updates}')
+    assert response.mimetype == "text/event-stream"
+    events = iter(response.response)
+    assert next(events) == b"retry: 3000\n\n"
+    dashboard_cache.update(hospital_cases=5)
+    event = next(events).decode("utf-8")
+    assert event.startswith(f"id: {dashboard_cache.epoch}.{since + 1}.{updates}\nevent: summary\n")
+    assert '"summary": {"hospital_cases": 5}' in event
+    response.close()
+
+def test_stream_resends_everything_after_a_restart():
+    dashboard_cache.update(areas={city: 1}, national_7day_infections=2, hospital_cases=3,
+        deaths_total=4, news=[])
+    since = dashboard_cache.version
+    response = app.test_client().get('/stream',
+        headers={"Last-Event-ID": f"0ld3p0ch.{since}.{scheduler.version}"})
+    events = iter(response.response)
+    next(events)
+    event = next(events).decode("utf-8")
+    assert "event: summary\n" in event
+    assert '"hospital_cases": 3' in event
+    response.close()
+
+def test_api_schedules_many_updates():
+    client = app.test_client()
+    response = client.post('/api/updates', json={"schedule": [
+        {"name": "bulk test 1", "cron": "0 0 1 1 *", "covid": True},
+        {"name": "bulk test 2", "time": "00:00", "repeat": True, "news": True}]})
+    assert response.status_code == 200
+    updates = {update["title"]: update for update in response.get_json()["updates"]}
+    assert updates["bulk test 1"]["cron"] == "0 0 1 1 *"
+    assert updates["bulk test 1"]["time"].endswith("-01-01T00:00:00")
+    assert updates["bulk test 2"]["repeat_interval"] is None
+    assert updates["bulk test 2"]["cron"] == "0 0 * * *" # the same time after the clocks change
+    response = client.post('/api/updates', json={"cancel": ["bulk test 1", "bulk test 2"]})
+    titles = [update["title"] for update in response.get_json()["updates"]]
+    assert "bulk test 1" not in titles and "bulk test 2" not in titles
+
+def test_api_rejects_invalid_updates():
+    client = app.test_client()
+    response = client.post('/api/updates', json={"schedule": [
+        {"name": "bulk test 3", "cron": "0 0 1 1 *", "covid": True},
+        {"name": "bulk test 4", "cron": "61 * * * *", "covid": True}]})
+    assert response.status_code == 400
+    assert "bulk test 4" in response.get_json()["error"]
+    titles = [update["title"] for update in client.get('/api/updates').get_json()["updates"]]
+    assert "bulk test 3" not in titles
+
+def test_export_static(tmp_path):
+    dashboard_cache.update(areas={city: 1}, national_7day_infections=2, hospital_cases=3,
+        deaths_total=4, news=[{"title": "Exported", "content": ""}])
+    export_static(str(tmp_path / "site"))
+    summary = json.loads((tmp_path / "site" / "summary.json").read_text())
+    assert summary["summary"]["hospital_cases"] == 3
+    assert summary["news"] == [{"title": "Exported", "content": ""}]
+    assert b"Exported" in (tmp_path / "site" / "index.html").read_bytes()
+    areas = json.loads((tmp_path / "site" / "areas.json").read_text())
+    assert (tmp_path / "site" / areas[city]["page"]).exists()
+
+def test_api_series(tmp_path):
+    store = CovidDataStore(str(tmp_path / "covid_data.db"))
+    store.add_rows("overview", [{"date": f"2021-10-{day:02d}", "areaName": "United Kingdom",
+        "newCasesBySpecimenDate": day, "hospitalCases": 5, "cumDailyNsoDeathsByDeathDate": day}
+        for day in range(1, 29)])
+    store.add_rows("ltla", [{"date": f"2021-10-{day:02d}", "areaName": city,
+        "newCasesBySpecimenDate": 1} for day in range(1, 29)])
+    dashboard_cache.update(areas={city: 1}, national_7day_infections=2, hospital_cases=3,
+        deaths_total=4, news=[])
+    client = app.test_client()
+    with patch("covid_data_handler.data_store", store):
+        response = client.get('/api/series?every=week&from=2021-10-04&limit=2&encoding=plain')
+        data = response.get_json()
+        assert data["local"] == {"start": "2021-10-04", "step": 7, "new_cases": [7, 7]}
+        assert data["national"]["cum_deaths"] == [10, 17]
+        assert data["next"] == "2021-10-18"
+        response = client.get('/api/series', headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        data = json.loads(gzip.decompress(response.data))
+        assert data["national"]["new_cases"][:3] == [1, 1, 1] # delta encoded
+        etag = client.get('/api/series?encoding=plain').headers["ETag"]
+        assert client.get('/api/series?encoding=plain',
+            headers={"If-None-Match": etag}).status_code == 304
+        store.add_rows("ltla", [{"date": "2021-10-28", "areaName": city,
+            "newCasesBySpecimenDate": 2}]) # a revision that leaves the snapshot the same
+        response = client.get('/api/series?encoding=plain', headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.get_json()["local"]["new_cases"][-1] == 2
+    assert client.get('/api/series?every=month').status_code == 400
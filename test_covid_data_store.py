@@ -0,0 +1,42 @@
+from covid_data_store import CovidDataStore, CovidRow
+
+def test_covid_data_store_rows(tmp_path):
+    store = CovidDataStore(str(tmp_path / "covid_data.db"))
+    assert store.latest_date("ltla", "Exeter") is None
+    store.add_rows("ltla", [
+        {"date": "2021-10-27", "areaName": "Exeter", "newCasesBySpecimenDate": 10},
+        {"date": "2021-10-28", "areaName": "Exeter", "newCasesBySpecimenDate": 20}])
+    assert store.latest_date("ltla", "Exeter") == "2021-10-28"
+    rows = store.rows("ltla", "Exeter")
+    assert [row["date"] for row in rows] == ["2021-10-28", "2021-10-27"]
+    assert rows[0]["newCasesBySpecimenDate"] == 20
+
+def test_covid_data_store_rows_by_area(tmp_path):
+    store = CovidDataStore(str(tmp_path / "covid_data.db"))
+    store.add_rows("ltla", [
+        {"date": "2021-10-28", "areaName": "Exeter", "newCasesBySpecimenDate": 20},
+        {"date": "2021-10-28", "areaName": "Leeds", "newCasesBySpecimenDate": 30},
+        {"date": "2021-10-29", "areaName": "York", "newCasesBySpecimenDate": 40}])
+    assert store.latest_date("ltla") == "2021-10-29"
+    by_area = store.rows_by_area("ltla", ["Exeter", "Leeds", "Bath"])
+    assert by_area["Leeds"][0]["newCasesBySpecimenDate"] == 30
+    assert by_area["Bath"] == []
+    assert "York" not in by_area
+    assert set(store.rows_by_area("ltla")) == {"Exeter", "Leeds", "York"}
+    assert store.date_ranges("ltla")["York"] == ("2021-10-29", "2021-10-29")
+
+def test_covid_data_store_replaces_revised_days(tmp_path):
+    store = CovidDataStore(str(tmp_path / "covid_data.db"))
+    store.add_rows("ltla", [{"date": "2021-10-28", "areaName": "Exeter", "newCasesBySpecimenDate": 20}])
+    store.add_rows("ltla", [{"date": "2021-10-28", "areaName": "Exeter", "newCasesBySpecimenDate": 25}])
+    rows = store.rows("ltla", "Exeter")
+    assert len(rows) == 1
+    assert rows[0]["newCasesBySpecimenDate"] == 25
+
+def test_covid_row_reads_like_a_dictionary():
+    row = CovidRow("2021-10-28", "Exeter", 20)
+    assert row["date"] == "2021-10-28"
+    assert row["newCasesBySpecimenDate"] == 20
+    assert row.get("hospitalCases") is None
+    assert row.get("unknown", 0) == 0
+    assert row.area_name is CovidRow("2021-10-27", "".join(["Exe", "ter"])).area_name
@@ -0,0 +1,33 @@
+import numpy as np
+from covid_series import (daily_series, slice_series, weekly_series, limit_series,
+    encode_column, decode_column, encode_series)
+
+ROWS = [{"date": f"2021-10-{day:02d}", "newCasesBySpecimenDate": day, "hospitalCases": day * 10}
+    for day in range(1, 29) if day != 5]
+
+def test_daily_series_fills_missing_days():
+    series = daily_series(ROWS, ("new_cases", "hospital_cases"))
+    assert str(series.start) == "2021-10-01"
+    assert series.periods() == 28
+    assert np.isnan(series.columns["new_cases"][4])
+
+def test_slice_series():
+    series = slice_series(daily_series(ROWS, ("new_cases",)), "2021-10-03", "2021-10-20")
+    assert str(series.start) == "2021-10-03"
+    assert series.columns["new_cases"][-1] == 20
+    assert slice_series(series, "2022-01-01").periods() == 0
+
+def test_weekly_series():
+    series = weekly_series(slice_series(daily_series(ROWS, ("new_cases", "hospital_cases")),
+        "2021-10-03", "2021-10-20"))
+    assert str(series.start) == "2021-09-27" # the Monday before the first day
+    assert series.columns["new_cases"].tolist() == [3, 44, 98, 57]
+    assert series.columns["hospital_cases"].tolist() == [30, 100, 170, 200]
+    assert limit_series(series, np.datetime64("2021-10-11")).periods() == 2
+
+def test_delta_encoding():
+    values = np.array([100, np.nan, 105, 103])
+    assert encode_column(values, True) == [100, None, 5, -2]
+    assert decode_column(encode_column(values, True)) == [100, None, 105, 103]
+    assert encode_series(daily_series(ROWS[:2], ("new_cases",)), False) == {
+        "start": "2021-10-01", "step": 1, "new_cases": [1, 2]}
@@ -0,0 +1,90 @@
+import threading
+import time
+from dashboard_cache import SnapshotCache
+
+def counting_loader():
+    counting_loader.calls += 1
+    return {"calls": counting_loader.calls}
+counting_loader.calls = 0
+
+def test_snapshot_cache_counts_hits_and_refreshes():
+    counting_loader.calls = 0
+    cache = SnapshotCache(counting_loader, 60)
+    cache.refresh()
+    assert cache.peek()["calls"] == 1
+    assert cache.peek()["calls"] == 1
+    cache.record_hit()
+    stats = cache.statistics()
+    assert stats["hits"] == 1 # reading the snapshot is not a hit
+    assert stats["refreshes"] == 1
+
+def test_snapshot_cache_serves_old_snapshot_while_refreshing():
+    release = threading.Event()
+    def blocking_loader():
+        release.wait(1)
+        return counting_loader()
+    counting_loader.calls = 0
+    cache = SnapshotCache(counting_loader, 60)
+    cache.refresh()
+    cache.loader = blocking_loader
+    cache.refresh_in_background()
+    assert cache.peek()["calls"] == 1 # the old snapshot is served straight away
+    release.set()
+    for _ in range(100):
+        if not cache.statistics()["refreshing"]:
+            break
+        time.sleep(0.01)
+    assert cache.peek()["calls"] == 2
+
+def test_snapshot_cache_keeps_snapshot_when_refresh_fails():
+    def failing_loader():
+        raise ConnectionError("API is down")
+    cache = SnapshotCache(counting_loader, 60)
+    cache.refresh()
+    cache.loader = failing_loader
+    cache.refresh()
+    assert cache.peek() is not None
+    assert cache.statistics()["refresh_failures"] == 1
+
+def test_snapshot_cache_update_replaces_part():
+    counting_loader.calls = 0
+    cache = SnapshotCache(lambda: {"covid": 1, "news": ["old"]}, 60)
+    assert cache.peek() is None
+    cache.refresh()
+    version = cache.statistics()["version"]
+    cache.update(news=["new"])
+    assert cache.peek()["news"] == ["new"]
+    assert cache.peek()["changed"] == {"covid": version, "news": version + 1}
+    assert cache.statistics()["version"] == version + 1
+    assert cache.wait(0) is not None
+
+def test_snapshot_cache_waits_for_required_parts():
+    cache = SnapshotCache(lambda: {"covid": 1, "news": ["old"]}, 60, required=("covid",))
+    cache.update(news=["new"])
+    assert not cache.ready.is_set()
+    assert cache.wait(0) is None
+    cache.refresh()
+    assert cache.wait(0)["news"] == ["old"]
+
+def test_snapshot_cache_refreshes_in_background():
+    release = threading.Event()
+    def blocking_loader():
+        release.wait(1)
+        return counting_loader()
+    counting_loader.calls = 0
+    cache = SnapshotCache(blocking_loader, 60)
+    cache.refresh_in_background()
+    cache.refresh_in_background() # already refreshing, so does nothing
+    release.set()
+    assert cache.wait(1)["calls"] == 1
+    time.sleep(0.05)
+    assert counting_loader.calls == 1
+
+def test_snapshot_cache_epoch():
+    leader = SnapshotCache(lambda: {"covid": 1}, 60)
+    follower = SnapshotCache(lambda: {"covid": 2}, 60)
+    assert leader.epoch != follower.epoch
+    leader.refresh()
+    assert leader.peek()["epoch"] == leader.epoch
+    follower.replace(leader.peek())
+    assert follower.epoch == leader.epoch
@@ -0,0 +1,10 @@
+import json
+from dashboard_config import load_config
+
+def test_load_config_once(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"city": "Exeter"}), encoding="utf-8")
+    config = load_config(str(path))
+    path.write_text(json.dumps({"city": "Leeds"}), encoding="utf-8")
+    assert load_config(str(path)) is config
+    assert config["city"] == "Exeter"
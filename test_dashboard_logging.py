@@ -0,0 +1,36 @@
+import atexit
+import json
+import logging
+from dashboard_logging import setup_logging
+
+def test_background_logging(tmp_path):
+    logger = logging.getLogger("test background")
+    listener = setup_logging(str(tmp_path / "test.log"), "INFO", logger=logger)
+    logger.debug("Not logged")
+    logger.info("Logged %s", "later")
+    listener.stop()
+    atexit.unregister(listener.stop)
+    text = (tmp_path / "test.log").read_text(encoding="utf-8")
+    assert "INFO: " in text and "Logged later" in text
+    assert "Not logged" not in text
+
+def test_structured_logging(tmp_path):
+    logger = logging.getLogger("test structured")
+    listener = setup_logging(str(tmp_path / "test.log"), "DEBUG", structured=True, logger=logger)
+    logger.info("GET /index 200", extra={"status": 200, "endpoint": "index"})
+    listener.stop()
+    atexit.unregister(listener.stop)
+    entry = json.loads((tmp_path / "test.log").read_text(encoding="utf-8"))
+    assert entry["message"] == "GET /index 200"
+    assert entry["level"] == "INFO"
+    assert entry["status"] == 200 and entry["endpoint"] == "index"
+
+def test_logging_rotates(tmp_path):
+    logger = logging.getLogger("test rotation")
+    assert setup_logging(str(tmp_path / "test.log"), "INFO", max_bytes=200, backups=2,
+        background=False, logger=logger) is None
+    for number in range(50):
+        logger.info("Line %s of the log", number)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["test.log", "test.log.1",
+        "test.log.2"]
+    assert (tmp_path / "test.log").stat().st_size <= 200
@@ -0,0 +1,26 @@
+import pytest
+from dashboard_metrics import timed, timer, render_metrics, operation_seconds, operation_errors
+
+def test_timed_records_calls():
+    @timed("test operation")
+    def add(a, b):
+        return a + b
+    before = operation_seconds["test operation"].count if "test operation" in operation_seconds else 0
+    assert add(1, 2) == 3
+    assert operation_seconds["test operation"].count == before + 1
+
+def test_timer_counts_errors():
+    with pytest.raises(ValueError):
+        with timer("test failure"):
+            raise ValueError
+    assert operation_errors["test failure"] >= 1
+    assert operation_seconds["test failure"].count >= 1
+
+def test_render_metrics():
+    with timer("test render"):
+        pass
+    text = render_metrics({"test_gauge": ("A test gauge.", 3), "test_missing": ("Not set.", None)})
+    assert 'dashboard_operation_seconds_bucket{operation="test render",le="+Inf"} 1' in text
+    assert 'dashboard_operation_seconds_count{operation="test render"} 1' in text
+    assert "# TYPE test_gauge gauge\ntest_gauge 3.0" in text
+    assert "test_missing" not in text
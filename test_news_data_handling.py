@@ -1,8 +1,12 @@
 import logging
+import covid_news_handling
 from covid_news_handling import add_news_article
+from covid_news_handling import delete_news
+from covid_news_handling import displayed_news
 from covid_news_handling import news_API_request
 from covid_news_handling import update_news
 from covid_news_handling import add_news_to_list
+from news_ranking import NewsIndex
 
 LOGGER = logging.getLogger(__name__)
 
@@ -27,3 +31,50 @@ def test_add_news_article(caplog):
     })
     add_news_article(dictionary)
     assert "News has been added to the server." in caplog.text
+
+def test_update_news_deduplicates(monkeypatch):
+    articles = {"articles": [{"title": "Duplicate Title", "description": "First"},
+        {"title": "Duplicate Title", "description": "Second"}]}
+    monkeypatch.setattr(covid_news_handling, "news_API_request", lambda: articles)
+    update_news()
+    data = update_news()
+    assert [news["title"] for news in data].count("Duplicate Title") == 1
+
+def test_delete_news():
+    add_news_article({"title": "Deleted Title", "description": "News Content"})
+    delete_news("Deleted Title")
+    assert "Deleted Title" not in [news["title"] for news in displayed_news()]
+
+def test_news_history_is_bounded(monkeypatch):
+    monkeypatch.setattr(covid_news_handling, "news_history_size", 3)
+    for number in range(5):
+        add_news_to_list({"title": f"Bounded Title {number}"})
+    assert len(covid_news_handling.list_of_news) == 3
+    assert "Bounded Title 0" not in covid_news_handling.list_of_news
+
+def test_displayed_news_is_dictionaries():
+    add_news_article({"title": "Record Title", "description": "Record Content"})
+    assert {"title": "Record Title", "content": "Record Content"} in displayed_news()
+    assert isinstance(covid_news_handling.news["Record Title"], covid_news_handling.NewsArticle)
+
+def test_delete_news_removes_the_whole_story():
+    add_news_article({"title": "Booster jabs offered to everyone over 40 - BBC", "description": ""})
+    add_news_article({"title": "Booster jabs offered to everyone over 40 - ITV", "description": ""})
+    delete_news("Booster jabs offered to everyone over 40 - BBC")
+    assert not [news for news in displayed_news() if news["title"].startswith("Booster jabs")]
+
+def test_news_state_keeps_deleted_news(monkeypatch):
+    monkeypatch.setattr(covid_news_handling, "news", {})
+    monkeypatch.setattr(covid_news_handling, "list_of_news", {})
+    monkeypatch.setattr(covid_news_handling, "news_index", NewsIndex("covid"))
+    for title in ("Kept Title", "Deleted Title"):
+        add_news_to_list({"title": title})
+        add_news_article({"title": title, "description": "", "source": {"name": "BBC"}})
+    delete_news("Deleted Title")
+    state = covid_news_handling.news_state()
+    covid_news_handling.load_news_state({"seen": [], "shown": []})
+    assert displayed_news() == []
+    covid_news_handling.load_news_state(state)
+    assert displayed_news() == [{"title": "Kept Title", "content": ""}]
+    assert "Deleted Title" in covid_news_handling.list_of_news
+    assert covid_news_handling.news["Kept Title"].source == "BBC"
@@ -0,0 +1,42 @@
+from news_ranking import NewsIndex, minhash, permutations, words, PERMUTATIONS
+
+def test_words():
+    assert words("Covid-19: Exeter cases RISE") == ["covid", "19", "exeter", "cases", "rise"]
+    assert words(None) == []
+
+def test_minhash_matches_the_same_words():
+    assert minhash("Cases rise in Exeter") == minhash("exeter: cases RISE in")
+    assert minhash("Cases rise - BBC News", "BBC News") == minhash("Cases rise")
+    assert minhash("Cases rise - in Exeter", "BBC News") != minhash("Cases rise")
+
+def test_permutations_are_unrelated():
+    assert permutations(len(PERMUTATIONS)) == PERMUTATIONS # the same in every process
+    assert not [multiplier for multiplier, offset in PERMUTATIONS if offset == multiplier - 1]
+
+def test_news_index_ranks_by_relevance():
+    index = NewsIndex("covid Exeter")
+    index.add("Football results", "The scores from the weekend.")
+    index.add("Covid cases rise", "Covid cases are rising across the country.")
+    index.add("Exeter covid centre opens", "A covid vaccine centre opens in Exeter.")
+    assert index.top() == ["Exeter covid centre opens", "Covid cases rise", "Football results"]
+    assert index.top(1) == ["Exeter covid centre opens"]
+
+def test_news_index_clusters_near_duplicates():
+    index = NewsIndex("covid")
+    index.add("Covid: UK cases rise again as winter nears - BBC News", "", "BBC News")
+    index.add("Covid: UK cases rise again as winter nears - The Guardian", "Covid cases.",
+        "The Guardian")
+    index.add("Covid vaccine boosters offered to over 50s", "")
+    assert index.top() == ["Covid: UK cases rise again as winter nears - The Guardian",
+        "Covid vaccine boosters offered to over 50s"]
+    assert len(index.cluster("Covid: UK cases rise again as winter nears - BBC News")) == 2
+
+def test_news_index_remove():
+    index = NewsIndex("covid")
+    index.add("Covid cases rise", "")
+    index.add("Football results", "")
+    index.remove("Covid cases rise")
+    index.remove("Not in the index")
+    assert index.top() == ["Football results"]
+    assert "covid" not in index.postings
+    assert len(index) == 1
@@ -0,0 +1,24 @@
+from shared_state import SharedState
+
+def test_only_one_leader(tmp_path):
+    first = SharedState(str(tmp_path / "state.db"))
+    second = SharedState(str(tmp_path / "state.db"))
+    assert first.try_to_lead()
+    assert not second.try_to_lead()
+    assert first.is_leader() and not second.is_leader()
+
+def test_save_and_load(tmp_path):
+    state = SharedState(str(tmp_path / "state.db"))
+    assert state.load("snapshot", 0) is None
+    state.save("snapshot", 2, {"hospital_cases": 3})
+    assert state.load("snapshot", 1) == (2, {"hospital_cases": 3})
+    assert state.load("snapshot", 2) is None
+
+def test_commands(tmp_path):
+    state = SharedState(str(tmp_path / "state.db"))
+    command = state.submit("cancel", {"update_to_delete": "Test"})
+    assert not state.wait_for(command, 0.1)
+    assert state.take_commands() == [(command, "cancel", {"update_to_delete": "Test"})]
+    state.mark_done(command)
+    assert state.wait_for(command, 0.1)
+    assert state.take_commands() == []
@@ -0,0 +1,22 @@
+import os
+import pytest
+from static_export import area_slug, export_files
+
+def test_area_slug():
+    assert area_slug("Bristol, City of") == "bristol-city-of"
+    assert area_slug("King's Lynn and West Norfolk") == "king-s-lynn-and-west-norfolk"
+
+def test_export_files_swaps_the_whole_export(tmp_path):
+    path = tmp_path / "site"
+    first = export_files(str(path), {"index.html": b"first", "areas/exeter.json": b"{}"})
+    assert (path / "areas" / "exeter.json").read_bytes() == b"{}"
+    second = export_files(str(path), {"index.html": b"second"})
+    assert (path / "index.html").read_bytes() == b"second"
+    assert not (path / "areas").exists()
+    assert not os.path.exists(first)
+    assert os.path.realpath(path) == os.path.realpath(second)
+
+def test_export_files_keeps_other_directories(tmp_path):
+    (tmp_path / "site").mkdir()
+    with pytest.raises(FileExistsError):
+        export_files(str(tmp_path / "site"), {"index.html": b""})
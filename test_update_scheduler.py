@@ -0,0 +1,81 @@
+import time
+from datetime import datetime
+import pytest
+from update_scheduler import UpdateScheduler, ScheduledUpdate, CronSchedule
+
+def wait_for(condition, timeout=2):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+def recorder(ran):
+    return lambda **kwargs: ran.append(kwargs["object"])
+
+def test_schedule_runs_update():
+    ran = []
+    scheduler = UpdateScheduler()
+    scheduler.schedule("update test", "Update at 00:00", 0.05, recorder(ran), {"object": "done"})
+    assert wait_for(lambda: ran == ["done"])
+    assert scheduler.listing() == []
+
+def test_cancel_update():
+    ran = []
+    scheduler = UpdateScheduler()
+    scheduler.schedule("update test", "Update at 00:00", 0.1, recorder(ran), {"object": "done"})
+    assert [update.title for update in scheduler.listing()] == ["update test"]
+    assert scheduler.cancel("update test")
+    assert not scheduler.cancel("update test")
+    time.sleep(0.2)
+    assert ran == []
+
+def test_repeating_update_keeps_its_name():
+    ran = []
+    scheduler = UpdateScheduler()
+    scheduler.schedule("repeat test", "Update at 00:00", 0, recorder(ran), {"object": "done"},
+        repeat_interval=0.05)
+    assert wait_for(lambda: len(ran) >= 3)
+    assert [update.title for update in scheduler.listing()] == ["repeat test"]
+    scheduler.cancel("repeat test")
+
+def test_listeners_called_on_change():
+    changes = []
+    scheduler = UpdateScheduler()
+    scheduler.add_listener(lambda: changes.append(scheduler.version))
+    scheduler.schedule("update test", "Update at 00:00", 60, recorder([]), {"object": "done"})
+    scheduler.cancel("update test")
+    assert changes == [1, 2]
+
+def test_cron_schedule_next_after():
+    cron = CronSchedule("*/15 8-9 * * 1-5")
+    assert cron.next_after(datetime(2021, 10, 29, 9, 50)) == datetime(2021, 11, 1, 8, 0)
+    assert cron.next_after(datetime(2021, 11, 1, 8, 0)) == datetime(2021, 11, 1, 8, 15)
+    assert CronSchedule("0 0 29 2 *").next_after(datetime(2021, 3, 1)) == datetime(2024, 2, 29)
+    assert CronSchedule("0 12 13 * 5").next_after(datetime(2021, 10, 28)) == \
+        datetime(2021, 10, 29, 12, 0) # the day of the month or the day of the week
+
+def test_cron_schedule_rejects_invalid_fields():
+    for expression in ("* * * *", "60 * * * *", "*/0 * * * *", "a * * * *"):
+        with pytest.raises(ValueError):
+            CronSchedule(expression)
+
+def test_identical_updates_are_coalesced():
+    ran = []
+    scheduler = UpdateScheduler()
+    run_at = time.time() + 0.1
+    scheduler.schedule_many([ScheduledUpdate(f"update {number}", "Update at 00:00", run_at,
+        recorder(ran), {"object": number}, key="same") for number in range(3)]
+        + [ScheduledUpdate("other update", "Update at 00:00", run_at, recorder(ran),
+        {"object": "other"})])
+    assert wait_for(lambda: len(ran) == 2)
+    time.sleep(0.1)
+    assert ran == [0, "other"]
+    assert scheduler.listing() == []
+
+def test_cancel_many_updates():
+    scheduler = UpdateScheduler()
+    for number in range(3):
+        scheduler.schedule(f"update {number}", "Update at 00:00", 60, recorder([]), {})
+    assert scheduler.cancel_many(["update 0", "update 2", "missing"]) == ["update 0", "update 2"]
+    assert [update.title for update in scheduler.listing()] == ["update 1"]
+    scheduler.cancel("update 1")
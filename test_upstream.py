@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import pytest
+import requests
+from upstream import run_concurrently, session, Upstream, CircuitOpenError
+
+def test_run_concurrently():
+    def slow_task():
+        time.sleep(0.2)
+        return "done"
+    start = time.monotonic()
+    results = run_concurrently({"local": slow_task, "national": slow_task, "news": slow_task}, {})
+    assert results == {"local": "done", "national": "done", "news": "done"}
+    assert time.monotonic() - start < 0.5
+
+def test_run_concurrently_timeout():
+    with pytest.raises(FutureTimeoutError):
+        run_concurrently({"news": lambda: time.sleep(1)}, {"news": 0.1})
+
+def test_session_pools_connections():
+    assert session.get_adapter("https://api.coronavirus.data.gov.uk")._pool_maxsize >= 2
+
+def test_run_concurrently_fallback():
+    def failing_task():
+        raise ConnectionError
+    results = run_concurrently({"news": failing_task, "covid": lambda: "new"}, {},
+        {"news": lambda: "last good"})
+    assert results == {"news": "last good", "covid": "new"}
+
+def test_upstream_retries():
+    calls = []
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise requests.ConnectionError
+        return "done"
+    upstream = Upstream("test", 5, attempts=3, backoff=0.01)
+    assert upstream.call(flaky) == "done"
+    assert len(calls) == 3
+
+def test_upstream_circuit_breaker():
+    calls = []
+    def failing():
+        calls.append(1)
+        raise requests.ConnectionError
+    upstream = Upstream("test", 5, attempts=1, failure_threshold=2, reset_timeout=0.1)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            upstream.call(failing)
+    assert upstream.is_open()
+    with pytest.raises(CircuitOpenError):
+        upstream.call(failing)
+    assert len(calls) == 2
+    time.sleep(0.15)
+    assert upstream.call(lambda: "recovered") == "recovered"
+    assert not upstream.is_open()
+
+def test_upstream_circuit_reopens_after_other_errors():
+    def failing():
+        raise requests.ConnectionError
+    def unreadable():
+        raise ValueError("not JSON")
+    upstream = Upstream("test", 5, attempts=1, failure_threshold=1, reset_timeout=0.1)
+    with pytest.raises(requests.ConnectionError):
+        upstream.call(failing)
+    time.sleep(0.15)
+    with pytest.raises(ValueError):
+        upstream.call(unreadable)
+    assert not upstream.trying
+    with pytest.raises(CircuitOpenError):
+        upstream.call(failing)
+    time.sleep(0.15)
+    assert upstream.call(lambda: "recovered") == "recovered"
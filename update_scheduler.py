@@ -0,0 +1,371 @@
+"""
+This module runs the scheduled updates on their own thread, so they happen on time without anyone visiting the page.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+from dashboard_metrics import timer
+
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7)) # minute, hour, day, month, weekday
+CRON_SEARCH_DAYS = 366 * 8 # far enough ahead to find the next 29th of February
+
+
+class CronSchedule:
+    """
+    A cron-like recurrence of five fields: minute, hour, day of the month, month and day of the
+    week (0 or 7 is Sunday). Each field is *, a number, a range such as 9-17, any of these
+    followed by a step such as */15, or a comma separated list of them. As in cron, when both
+    the day of the month and the day of the week are given, either one matching is enough.
+
+    Arguments:
+    expression: The five fields separated by spaces, such as "0 8,20 * * 1-5".
+    """
+
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError(f"'{expression}' does not have {len(CRON_FIELDS)} fields.")
+        self.expression = " ".join(fields)
+        (self.minutes, self.hours, self.days, self.months, weekdays) = (
+            sorted(self.parse_field(field, low, high))
+            for field, (low, high) in zip(fields, CRON_FIELDS))
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def __repr__(self) -> str:
+        return f"CronSchedule({self.expression!r})"
+
+    @staticmethod
+    def parse_field(field: str, low: int, high: int) -> set:
+        """
+        Finds the values a field of the expression allows.
+
+        Arguments:
+        field: The field, such as */15 or 1-5.
+        low: The lowest value of the field.
+        high: The highest value of the field.
+
+        Returns:
+        A set of the values.
+        """
+        values = set()
+        for part in field.split(","):
+            span, _, step = part.partition("/")
+            try:
+                step = int(step) if step else 1
+                if span == "*":
+                    first, last = low, high
+                elif "-" in span:
+                    first, last = (int(value) for value in span.split("-", 1))
+                else:
+                    first = last = int(span)
+            except ValueError:
+                raise ValueError(f"'{part}' is not a valid cron field.") from None
+            if step < 1 or not low <= first <= last <= high:
+                raise ValueError(f"'{part}' is outside {low}-{high}.")
+            values.update(range(first, last + 1, step))
+        return values
+
+    def matches_day(self, day: datetime) -> bool:
+        """
+        Returns whether the recurrence happens on a day.
+
+        Arguments:
+        day: The day.
+
+        Returns:
+        Whether the day matches the day of the month, month and day of the week fields.
+        """
+        if day.month not in self.months:
+            return False
+        day_matches = day.day in self.days
+        weekday_matches = (day.weekday() + 1) % 7 in self.weekdays # cron counts from Sunday
+        if self.any_day or self.any_weekday:
+            return day_matches and weekday_matches
+        return day_matches or weekday_matches
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        Finds the first time the recurrence happens after a moment.
+
+        Arguments:
+        moment: The moment.
+
+        Parameters:
+        start: The first whole minute after the moment.
+
+        Returns:
+        The time, to the minute.
+        """
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(CRON_SEARCH_DAYS):
+            if self.matches_day(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(1)
+        raise ValueError(f"'{self.expression}' never happens.")
+
+
+class ScheduledUpdate:
+    """
+    An update that has been scheduled, as shown in the list of scheduled updates.
+
+    Arguments:
+    title: The name of the update.
+    content: The description of the update shown under its name.
+    run_at: The time the update will take place, in seconds since the epoch.
+    action: The function that performs the update.
+    kwargs: The keyword arguments the action is called with.
+    repeat_interval: The number of seconds between repeats, or None if it only happens once.
+    listed: Whether the update is shown in the list of scheduled updates.
+    cron: The recurrence the update repeats on instead of an interval, or None.
+    key: Updates with the same key that are due at the same time only run the action once,
+    or None if the update is always run.
+    """
+    __slots__ = ("title", "content", "run_at", "action", "kwargs", "repeat_interval", "listed",
+        "cron", "key", "cancelled")
+
+    def __init__(self, title: str, content: str, run_at: float, action: Callable,
+        kwargs: dict, repeat_interval: float = None, listed: bool = True,
+        cron: CronSchedule = None, key: tuple = None) -> None:
+        self.title = title
+        self.content = content
+        self.run_at = run_at
+        self.action = action
+        self.kwargs = kwargs
+        self.repeat_interval = repeat_interval
+        self.listed = listed
+        self.cron = cron
+        self.key = key
+        self.cancelled = False
+
+    def repeats(self) -> bool:
+        """
+        Returns whether the update happens again after it has run.
+
+        Returns:
+        Whether it has a repeat interval or a cron recurrence.
+        """
+        return self.repeat_interval is not None or self.cron is not None
+
+    def next_run(self) -> float:
+        """
+        Works out when a repeating update next happens after its current time.
+
+        Returns:
+        The time in seconds since the epoch.
+        """
+        if self.cron is not None:
+            return self.cron.next_after(datetime.fromtimestamp(self.run_at)).timestamp()
+        return self.run_at + self.repeat_interval
+
+
+class UpdateScheduler:
+    """
+    Keeps the scheduled updates in a queue ordered by time and runs each one on a worker thread
+    when it is due. The updates are also kept by name, so they can be cancelled straight away.
+
+    Updates with the same key that are due at the same time are coalesced, so the action is
+    only run once for all of them.
+    """
+
+    def __init__(self) -> None:
+        self.queue = [] # a heap of (run_at, order added, update)
+        self.updates = {} # the scheduled updates by name, in the order they were added
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.version = 0 # goes up whenever the list of scheduled updates changes
+        self.listeners = []
+
+    def start(self) -> None:
+        """
+        Starts the worker thread if it is not already running.
+        """
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="update-scheduler",
+                    daemon=True)
+                self.thread.start()
+
+    def schedule(self, title: str, content: str, delay: float, action: Callable,
+        kwargs: dict, repeat_interval: float = None, listed: bool = True,
+        cron: CronSchedule = None, key: tuple = None) -> ScheduledUpdate:
+        """
+        Schedules an update, replacing any update that already has the same name.
+
+        Arguments:
+        title: The name of the update.
+        content: The description of the update shown under its name.
+        delay: The number of seconds until the update takes place.
+        action: The function that performs the update.
+        kwargs: The keyword arguments the action is called with.
+        repeat_interval: The number of seconds between repeats, or None if it only happens once.
+        listed: Whether the update is shown in the list of scheduled updates.
+        cron: The recurrence the update repeats on instead of an interval, or None.
+        key: The key identical updates share so they are coalesced, or None.
+
+        Returns:
+        The scheduled update.
+        """
+        return self.schedule_many([ScheduledUpdate(title, content, time.time() + delay, action,
+            kwargs, repeat_interval, listed, cron, key)])[0]
+
+    def schedule_many(self, updates: list) -> list:
+        """
+        Schedules many updates at once, replacing any updates that already have the same names.
+        The list of scheduled updates only changes version once for all of them.
+
+        Arguments:
+        updates: A list of ScheduledUpdate.
+
+        Returns:
+        The list of scheduled updates.
+        """
+        with self.condition:
+            for update in updates:
+                replaced = self.updates.pop(update.title, None)
+                if replaced is not None:
+                    replaced.cancelled = True
+                self.updates[update.title] = update
+                heapq.heappush(self.queue, (update.run_at, next(self.counter), update))
+            self.changed()
+            self.condition.notify() # wakes the worker in case an update is the next one due
+        self.start()
+        return updates
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Adds a function that is called every time the list of scheduled updates changes.
+
+        Arguments:
+        listener: The function, which is called while the scheduler's lock is held, so it
+        must not wait on anything that could be waiting on the scheduler.
+        """
+        with self.condition:
+            self.listeners.append(listener)
+
+    def changed(self) -> None:
+        """
+        Moves on the version of the list of scheduled updates and calls the listeners.
+        The caller must hold the lock.
+        """
+        self.version += 1
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception: # a listener failing must not stop the update being scheduled
+                logging.exception("A scheduled updates listener failed.")
+
+    def cancel(self, title: str) -> bool:
+        """
+        Cancels a scheduled update by its name.
+
+        Arguments:
+        title: The name of the update.
+
+        Returns:
+        Whether there was an update with that name.
+        """
+        with self.condition:
+            update = self.updates.pop(title, None)
+            if update is None:
+                return False
+            update.cancelled = True # it is skipped when it reaches the front of the queue
+            self.changed()
+            return True
+
+    def listing(self) -> list:
+        """
+        Returns the listed scheduled updates in the order they were added.
+
+        Returns:
+        A list of the scheduled updates.
+        """
+        with self.condition:
+            return [update for update in self.updates.values() if update.listed]
+
+    def cancel_many(self, titles: list) -> list:
+        """
+        Cancels many scheduled updates by their names at once.
+
+        Arguments:
+        titles: The names of the updates.
+
+        Returns:
+        A list of the names that had an update.
+        """
+        with self.condition:
+            cancelled = []
+            for title in titles:
+                update = self.updates.pop(title, None)
+                if update is not None:
+                    update.cancelled = True
+                    cancelled.append(title)
+            if cancelled:
+                self.changed()
+            return cancelled
+
+    def take_due(self) -> list:
+        """
+        Waits for the next update to be due, then takes every update that is due, scheduling
+        the repeating ones again.
+
+        Returns:
+        A list of the updates that are due, in the order they were due.
+        """
+        with self.condition:
+            while True:
+                while not self.queue or self.queue[0][0] > time.time():
+                    self.condition.wait(self.queue[0][0] - time.time() if self.queue else None)
+                now = time.time()
+                due = []
+                finished = False
+                while self.queue and self.queue[0][0] <= now:
+                    _, _, update = heapq.heappop(self.queue)
+                    if update.cancelled:
+                        continue
+                    if update.repeats():
+                        update.run_at = update.next_run()
+                        heapq.heappush(self.queue, (update.run_at, next(self.counter), update))
+                    else:
+                        del self.updates[update.title]
+                        finished = True
+                    due.append(update)
+                if finished:
+                    self.changed()
+                if due:
+                    return due
+
+    def run(self) -> None:
+        """
+        Waits for the updates to be due and runs them, running the action of updates with the
+        same key only once.
+        """
+        while True:
+            due = self.take_due()
+            coalesced = {}
+            for update in due:
+                if update.key is None:
+                    coalesced[id(update)] = [update]
+                else:
+                    coalesced.setdefault(update.key, []).append(update)
+            for updates in coalesced.values():
+                update = updates[0]
+                if len(updates) > 1:
+                    logging.info("%s identical updates were coalesced into %s.", len(updates),
+                        update.title)
+                try:
+                    with timer("scheduled_update"):
+                        update.action(**update.kwargs)
+                except Exception: # an update failing must not stop the other updates
+                    logging.exception("The scheduled update %s failed.", update.title)
@@ -0,0 +1,235 @@
+"""
+This module holds the shared HTTP session used for the covid and news APIs and runs their requests at the same time.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 10 # connections kept alive per host
+
+def create_session() -> requests.Session:
+    """
+    Creates a session that keeps its connections to the APIs open between requests.
+
+    Parameters:
+    adapter: The connection pool that is mounted on the session.
+
+    Returns:
+    The session.
+    """
+    new_session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    new_session.mount("https://", adapter)
+    new_session.mount("http://", adapter)
+    return new_session
+
+session = create_session()
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an API that has been failing, until it is given another try.
+    """
+
+
+class Upstream:
+    """
+    Calls one of the APIs, retrying failed calls after a random backoff and stopping calling it
+    altogether for a while once it keeps failing (a circuit breaker), so a struggling API is
+    not kept busy and the dashboard does not wait on it.
+
+    Arguments:
+    name: The name of the API.
+    timeout: The number of seconds each call is given, and that all the retries must fit in.
+    attempts: The most times a call is tried.
+    backoff: The number of seconds the longest wait before the first retry can be, doubling
+    for every retry after.
+    failure_threshold: The number of failures in a row that open the circuit.
+    reset_timeout: The number of seconds the circuit stays open before a call is tried again.
+    retry_on: The exceptions that count as the API failing.
+    """
+
+    def __init__(self, name: str, timeout: float, attempts: int = 3, backoff: float = 0.5,
+        failure_threshold: int = 5, reset_timeout: float = 30,
+        retry_on: tuple = (requests.RequestException,)) -> None:
+        self.name = name
+        self.timeout = timeout
+        self.attempts = attempts
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.retry_on = retry_on
+        self.lock = threading.Lock()
+        self.failures = 0 # failures in a row
+        self.opened_at = None # when the circuit was opened, or None while it is closed
+        self.trying = False # whether a call is testing if the API has recovered
+
+    def is_open(self) -> bool:
+        """
+        Returns whether calls to the API are currently being refused.
+
+        Returns:
+        Whether the circuit is open.
+        """
+        with self.lock:
+            return self.opened_at is not None
+
+    def allow(self) -> None:
+        """
+        Checks whether the API can be called, letting a single call through to test it once
+        the circuit has been open for reset_timeout seconds.
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if self.trying or time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(
+                    f"The {self.name} API is not being called as it keeps failing.")
+            self.trying = True
+
+    def succeeded(self) -> None:
+        """
+        Records a successful call, which closes the circuit.
+        """
+        with self.lock:
+            if self.opened_at is not None:
+                logging.info("The %s API has recovered.", self.name)
+            self.failures = 0
+            self.opened_at = None
+            self.trying = False
+
+    def failed(self) -> None:
+        """
+        Records a failed call, opening the circuit if there have been too many in a row.
+        """
+        with self.lock:
+            self.failures += 1
+            if self.trying or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logging.warning("The %s API has failed %s times in a row and will not be called "
+                    "for %s seconds.", self.name, self.failures, self.reset_timeout)
+                self.opened_at = time.monotonic()
+            self.trying = False
+
+    def interrupted(self) -> None:
+        """
+        Records a call that raised an error retrying would not fix, such as a response that
+        could not be read. A test call that does this reopens the circuit, so the API is tested
+        again later rather than never.
+        """
+        with self.lock:
+            if self.trying:
+                self.opened_at = time.monotonic()
+                self.trying = False
+
+    def call(self, function: Callable, *args, **kwargs):
+        """
+        Calls a function that requests the API, retrying it if it fails.
+
+        Arguments:
+        function: The function, which should use the timeout of the API for its requests.
+        args: The positional arguments of the function.
+        kwargs: The keyword arguments of the function.
+
+        Parameters:
+        deadline: The time after which no more retries are started.
+        delay: The random number of seconds waited before the next retry.
+
+        Returns:
+        What the function returns.
+        """
+        deadline = time.monotonic() + self.timeout
+        for attempt in range(1, self.attempts + 1):
+            self.allow()
+            try:
+                result = function(*args, **kwargs)
+            except self.retry_on as error:
+                self.failed()
+                delay = random.uniform(0, self.backoff * 2 ** (attempt - 1))
+                if attempt == self.attempts or time.monotonic() + delay >= deadline:
+                    raise
+                logging.warning("The %s API failed (%s) and will be tried again in %.2f seconds.",
+                    self.name, error, delay)
+                time.sleep(delay)
+            except BaseException:
+                self.interrupted()
+                raise
+            else:
+                self.succeeded()
+                return result
+        return None # not reached, as the last attempt either returns or raises
+
+
+class TimeoutSession:
+    """
+    Passes requests on to a session with the given timeout, for clients such as the news API
+    client that otherwise set their own.
+
+    Arguments:
+    session: The session the requests are made with.
+    timeout: The number of seconds each request is given.
+    """
+
+    def __init__(self, session: requests.Session, timeout: float) -> None:
+        self.session = session
+        self.timeout = timeout
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Makes a GET request with the timeout.
+
+        Arguments:
+        url: The url requested.
+        kwargs: The other arguments of the request.
+
+        Returns:
+        The response.
+        """
+        kwargs["timeout"] = self.timeout
+        return self.session.get(url, **kwargs)
+
+def run_concurrently(tasks: dict[str, Callable], timeouts: dict[str, float],
+    fallbacks: dict[str, Callable] = None) -> dict:
+    """
+    Runs each of the tasks in its own thread and waits for all of them to finish.
+
+    Arguments:
+    tasks: The functions to run, by the name of their source.
+    timeouts: The number of seconds each source is given before it is abandoned.
+    fallbacks: Functions that give the result of a source instead if its task fails or is
+    abandoned, such as the last result it gave, by the name of the source.
+
+    Parameters:
+    start: The time the tasks were started.
+    futures: The running tasks by the name of their source.
+
+    Returns:
+    A dictionary of what each task returned, by the name of its source.
+    """
+    executor = ThreadPoolExecutor(max_workers=len(tasks))
+    start = time.monotonic()
+    futures = {name: executor.submit(task) for name, task in tasks.items()}
+    try:
+        results = {}
+        for name, future in futures.items():
+            remaining = timeouts.get(name)
+            if remaining is not None:
+                remaining = max(0.0, remaining - (time.monotonic() - start))
+            try:
+                results[name] = future.result(timeout=remaining)
+            except Exception: # the task failed or timed out
+                if not fallbacks or name not in fallbacks:
+                    raise
+                logging.exception("%s could not be retrieved so the last good %s is used.",
+                    name, name)
+                results[name] = fallbacks[name]()
+                continue
+            logging.debug("%s has been retrieved after %.3f seconds.", name,
+                time.monotonic() - start)
+        return results
+    finally:
+        executor.shutdown(wait=False) # a timed out request can't hold up the others
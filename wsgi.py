@@ -0,0 +1,16 @@
+"""
+The entry point for running the dashboard on a production WSGI server with several worker processes, for example:
+
+gunicorn --workers 4 --worker-class gthread --threads 100 --bind 0.0.0.0:5000 wsgi:app
+
+Each worker imports this module, and the workers share the dashboard through the SQLite database
+set by shared-state in config.json. Only one of them, the leader, runs the scheduled updates and
+requests the APIs. The --preload option must not be used, as the workers would then share the
+leader's lock. Each worker logs to its own file, with its process id added to logging-path.
+
+Every open page holds a connection to /stream, so the workers need threads. With gunicorn's
+default sync workers, /stream is turned off and the pages only change when they are reloaded.
+"""
+from covid_data_handler import config, create_app
+
+app = create_app(config.get("shared-state", "dashboard_state.db"))